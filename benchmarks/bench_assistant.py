@@ -0,0 +1,299 @@
+"""
+Benchmark de ponta a ponta do SQLAIAssistant, sem Ollama nem SQL Server
+
+Uso:
+    python benchmarks/bench_assistant.py [--requests 40] [--concurrency 8] [--compare resultados.json]
+
+O assistente real (seleção de esquema, poda, prompt, validação, execução e
+leitura em lotes) roda contra:
+- um Ollama simulado (benchmarks/fake_ollama.py) com latência de avaliação
+  do prompt, de geração por token e cache do prefixo por slot;
+- um banco SQLite (benchmarks/sqlite_db.py) com tabelas largas de ERP.
+
+Cenários: "single" (uma solicitação por vez), "concurrent" (N threads) e
+"batch" (pipeline de src/batch.py). Para cada um são medidos vazão,
+latência por solicitação (p50/p95/p99), latência por etapa (rastreamento de
+src/utils/tracing.py) e pico de memória (tracemalloc).
+
+Os resultados são gravados em benchmarks/results/<data>_<commit>.json;
+--compare mostra a variação em relação a uma execução anterior.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_ollama import FakeOllama  # noqa: E402
+from sqlite_db import SQLiteDatabaseManager, seed_erp_database  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# (pergunta, tabelas, SQL devolvido pelo modelo simulado); {ref}, {lote}, ... variam por solicitação
+TEMPLATES = [
+    ("Quais os lotes do artigo {ref} e o stock em cada armazém?", ["se", "sal"],
+     "SELECT se.lote, sal.armazem, sal.stock FROM se JOIN sal ON sal.lote = se.lote WHERE se.ref = '{ref}';"),
+    ("Total faturado por cliente na zona zona {zona}", ["ft", "cl"],
+     "SELECT cl.nome, SUM(ft.etotal) AS total FROM ft JOIN cl ON cl.no = ft.no "
+     "WHERE cl.zona = 'zona {zona}' GROUP BY cl.nome ORDER BY total DESC;"),
+    ("Artigos e quantidades da fatura {ftstamp}", ["fi", "ft", "st"],
+     "SELECT st.ref, st.design, fi.qtt, fi.etiliquido FROM fi JOIN ft ON ft.ftstamp = fi.ftstamp "
+     "JOIN st ON st.ref = fi.ref WHERE ft.ftstamp = '{ftstamp}';"),
+    ("Stock total por família de artigo no armazém {armazem}", ["st", "sal"],
+     "SELECT st.familia, SUM(sal.stock) AS stock FROM sal JOIN st ON st.ref = sal.ref "
+     "WHERE sal.armazem = {armazem} GROUP BY st.familia ORDER BY stock DESC;"),
+    ("Lotes do fornecedor {fornecedor} ordenados pela validade", ["se", "fl"],
+     "SELECT se.lote, se.ref, se.validade, fl.nome FROM se JOIN fl ON fl.no = se.fornecedor "
+     "WHERE fl.no = {fornecedor} ORDER BY se.validade;"),
+    ("Quantidade vendida do artigo {ref} por lote", ["fi", "se"],
+     "SELECT se.lote, SUM(fi.qtt) AS quantidade FROM fi JOIN se ON se.lote = fi.lote "
+     "WHERE fi.ref = '{ref}' GROUP BY se.lote;"),
+    ("Linhas de venda com preço acima de {preco}", ["fi", "st"],
+     "SELECT fi.ref, st.design, fi.epv, fi.qtt FROM fi JOIN st ON st.ref = fi.ref WHERE fi.epv > {preco};"),
+]
+
+STAGES = ("request", "schema", "prompt", "generation", "llm.generate", "candidate", "validation", "execution",
+          "db.query", "ollama.prompt_eval_ms", "ollama.ttft_ms", "ollama.prompt_eval_count", "db.execute_ms", "db.fetch_ms",
+          "batch.generate", "batch.execute")
+
+
+def build_workload(count: int, seed: int, scale: float) -> List[Dict[str, Any]]:
+    """Perguntas distintas (parâmetros aleatórios) com o SQL esperado de cada uma"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        question, tables, sql = TEMPLATES[i % len(TEMPLATES)]
+        params = {
+            "ref": f"ST{rng.randint(1, int(2000 * scale)):06d}",
+            "zona": rng.randint(1, 500),
+            "ftstamp": f"FT{rng.randint(1, int(3000 * scale)):06d}",
+            "armazem": rng.randint(1, 10),
+            "fornecedor": rng.randint(1, int(200 * scale)),
+            "preco": rng.randint(900, 999),
+        }
+        items.append({"id": str(i), "question": question.format(**params), "tables": tables,
+                      "sql": sql.format(**params)})
+    return items
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    from src.utils.tracing import percentile
+    return {
+        "p50": round(percentile(values, 0.50), 2),
+        "p95": round(percentile(values, 0.95), 2),
+        "p99": round(percentile(values, 0.99), 2),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+    }
+
+
+def run_scenario(name: str, func: Callable[[], Dict[str, Any]], model: FakeOllama,
+                 measure_memory: bool) -> Dict[str, Any]:
+    """Executa um cenário com os histogramas zerados e mede tempo total e pico de memória"""
+    from src.utils.tracing import tracer
+    tracer.reset()
+    before = dict(model.stats)
+    if measure_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if measure_memory else 0
+        if measure_memory:
+            tracemalloc.stop()
+    latencies = result.pop("latencies_ms", [])
+    stages = tracer.stats()
+    result.update(
+        wall_s=round(wall, 3),
+        throughput_rps=round(result["requests"] / wall, 3) if wall else 0.0,
+        latency_ms=_summary(latencies),
+        stages_ms={stage: stages[stage] for stage in STAGES if stage in stages},
+        memory_peak_mb=round(peak / 2 ** 20, 2) if measure_memory else None,
+        ollama={key: model.stats[key] - before.get(key, 0) for key in model.stats},
+    )
+    print(f"{name:<11} {result['requests']:>5} solic. {result['errors']:>3} erro(s) "
+          f"{result['throughput_rps']:>8.2f} solic./s  p50 {result['latency_ms']['p50']:>8.1f}ms  "
+          f"p95 {result['latency_ms']['p95']:>8.1f}ms  memória {result['memory_peak_mb']} MB")
+    return result
+
+
+def _timed_request(assistant, item: Dict[str, Any]) -> Tuple[float, bool]:
+    start = time.perf_counter()
+    try:
+        list(assistant.stream_nl_request(item["question"], item["tables"]))
+        failed = False
+    except Exception:
+        failed = True
+    return (time.perf_counter() - start) * 1000, failed
+
+
+def scenario_single(assistant, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    results = [_timed_request(assistant, item) for item in items]
+    return {"requests": len(results), "errors": sum(failed for _, failed in results),
+            "latencies_ms": [elapsed for elapsed, _ in results]}
+
+
+def scenario_concurrent(assistant, items: List[Dict[str, Any]], concurrency: int) -> Dict[str, Any]:
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda item: _timed_request(assistant, item), items))
+    return {"requests": len(results), "errors": sum(failed for _, failed in results),
+            "latencies_ms": [elapsed for elapsed, _ in results], "concurrency": concurrency}
+
+
+def scenario_batch(assistant, items: List[Dict[str, Any]], workdir: str) -> Dict[str, Any]:
+    from src.batch import BatchRunner
+    output = os.path.join(workdir, f"batch_{time.time_ns()}.jsonl")
+    runner = BatchRunner(assistant, output)
+    report = runner.run(iter({k: item[k] for k in ("id", "question", "tables")} for item in items), set())
+    with open(output, "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    latencies = [(r.get("generation_s", 0) + r.get("execution_s", 0)) * 1000 for r in records]
+    return {"requests": len(records), "errors": sum(r["status"] != "ok" for r in records),
+            "latencies_ms": latencies, "pipeline": report["etapas"]}
+
+
+def git_revision() -> Dict[str, Any]:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=root, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=root, text=True).strip())
+    except (OSError, subprocess.CalledProcessError):
+        sha, dirty = "unknown", False
+    return {"sha": sha, "dirty": dirty}
+
+
+def compare(current: Dict[str, Any], previous_path: str):
+    """Mostra a variação de vazão e latência em relação a um arquivo de resultados anterior"""
+    with open(previous_path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nComparação com {previous_path} (commit {previous.get('git', {}).get('sha')}):")
+    for name, result in current["scenarios"].items():
+        old = previous.get("scenarios", {}).get(name)
+        if not old:
+            continue
+        deltas = []
+        for label, new_value, old_value in (
+                ("vazão", result["throughput_rps"], old["throughput_rps"]),
+                ("p50", result["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+                ("p95", result["latency_ms"]["p95"], old["latency_ms"]["p95"])):
+            change = (new_value - old_value) / old_value * 100 if old_value else 0.0
+            deltas.append(f"{label} {old_value} -> {new_value} ({change:+.1f}%)")
+        print(f"  {name:<11} " + ", ".join(deltas))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta com Ollama e banco simulados")
+    parser.add_argument("--requests", type=int, default=40, help="Solicitações por cenário")
+    parser.add_argument("--concurrency", type=int, default=8, help="Threads do cenário concorrente")
+    parser.add_argument("--scenarios", default="single,concurrent,batch", help="Cenários separados por vírgula")
+    parser.add_argument("--width", type=int, default=80, help="Colunas por tabela")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador do número de linhas")
+    parser.add_argument("--prompt-ms", type=float, default=0.2, help="ms por token novo do prompt")
+    parser.add_argument("--token-ms", type=float, default=5.0, help="ms por token gerado")
+    parser.add_argument("--db-latency-ms", type=float, default=1.0, help="ms de rede por instrução no banco")
+    parser.add_argument("--parallel", type=int, default=4, help="Slots do Ollama simulado (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--pool-size", type=int, default=8, help="DB_POOL_SIZE")
+    parser.add_argument("--no-stream", action="store_true", help="Desativa o streaming do Ollama")
+    parser.add_argument("--caches", action="store_true", help="Ativa os caches de geração e de resultados")
+    parser.add_argument("--examples", action="store_true", help="Ativa os exemplos few-shot (EXAMPLES_ENABLED)")
+    parser.add_argument("--no-memory", action="store_true", help="Não mede memória (tracemalloc reduz a vazão)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Arquivo de resultados (padrão: benchmarks/results/<data>_<commit>.json)")
+    parser.add_argument("--compare", help="Resultados anteriores para comparação")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench_assistant_")
+    # Configuração fixa para que as execuções sejam comparáveis
+    os.environ.update({
+        "APP_CACHE_DIR": workdir,
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "TRACE_ENABLED": "true",
+        "TRACE_LOG_PATH": "",
+        "QUERY_GUARD_ENABLED": "false",
+        "RELATIONSHIP_INFERENCE": "false",
+        "GENERATION_CACHE_ENABLED": str(args.caches).lower(),
+        "RESULT_CACHE_ENABLED": str(args.caches).lower(),
+        "EXAMPLES_ENABLED": str(args.examples).lower(),
+        "OLLAMA_STREAM": str(not args.no_stream).lower(),
+        "OLLAMA_NUM_PARALLEL": str(args.parallel),
+        "DB_POOL_SIZE": str(args.pool_size),
+    })
+
+    from src.core.assistant import SQLAIAssistant
+    from src.llm.ollama_client import OllamaClient
+    from src.utils.logger import configure_logging
+    from src.utils.tracing import configure_tracing
+    configure_logging()
+    configure_tracing()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    workloads = {name: build_workload(args.requests, args.seed + i, args.scale) for i, name in enumerate(scenarios)}
+    responses = {item["question"]: item["sql"] for items in workloads.values() for item in items}
+
+    db_path = os.path.join(workdir, "erp.sqlite")
+    start = time.perf_counter()
+    rows = seed_erp_database(db_path, width=args.width, scale=args.scale, seed=args.seed)
+    print(f"Banco SQLite: {len(rows)} tabelas, {sum(rows.values())} linhas, {args.width} colunas/tabela "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    model = FakeOllama(responses, prompt_ms_per_token=args.prompt_ms, token_ms=args.token_ms,
+                       num_parallel=args.parallel).start()
+    llm = OllamaClient("bench")
+    llm.base_url = model.url
+    assistant = SQLAIAssistant({}, model_name="bench", llm=llm,
+                               db=SQLiteDatabaseManager(db_path, latency=args.db_latency_ms / 1000))
+    timings = assistant.start()
+
+    runners = {
+        "single": lambda items: scenario_single(assistant, items),
+        "concurrent": lambda items: scenario_concurrent(assistant, items, args.concurrency),
+        "batch": lambda items: scenario_batch(assistant, items, workdir),
+    }
+    results: Dict[str, Any] = {}
+    try:
+        for name in scenarios:
+            if name not in runners:
+                print(f"Cenário desconhecido: {name}")
+                continue
+            results[name] = run_scenario(name, lambda: runners[name](workloads[name]), model, not args.no_memory)
+    finally:
+        assistant.db.close()
+        model.stop()
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(args),
+        "startup_s": {phase: round(elapsed, 3) for phase, elapsed in timings.items()},
+        "tables": rows,
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}_{report['git']['sha']}"
+                     f"{'-dirty' if report['git']['dirty'] else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Resultados gravados em {output}")
+    if args.compare:
+        compare(report, args.compare)
+    return report
+
+
+if __name__ == "__main__":
+    main()
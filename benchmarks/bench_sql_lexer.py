@@ -0,0 +1,93 @@
+"""
+Micro-benchmark do lexer T-SQL usado por validate_sql, extract_tables_from_query e format_sql
+
+Uso:
+    python benchmarks/bench_sql_lexer.py [repetições]
+
+Mostra o custo por consulta (µs) de cada função, comparado com a
+implementação anterior baseada em varreduras de substring e regex.
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.sql_lexer import tokenize_sql, parse_statements  # noqa: E402
+from src.utils.sql_utils import validate_sql, extract_tables_from_query, format_sql  # noqa: E402
+
+QUERIES = {
+    "simples": "SELECT ref, design FROM st WHERE ref = 'MP02.00.001'",
+    "juncoes": (
+        "SELECT p.Id, p.Data, l.Lote, pr.Descricao, c.Quantidade, p.CREATED_AT, p.UPDATED_BY "
+        "FROM dbo.[Producao] p WITH (NOLOCK) "
+        "INNER JOIN dbo.Consumos c ON c.ProducaoId = p.Id "
+        "INNER JOIN Lotes l ON l.Id = c.LoteId "
+        "LEFT JOIN [dbo].[Produtos] pr ON pr.Id = l.ProdutoId "
+        "WHERE pr.Descricao LIKE N'%porca%' AND p.Data >= '2024-01-01' "
+        "ORDER BY p.Data DESC"
+    ),
+    "cte": (
+        "WITH stock AS (SELECT ref, armazem, SUM(stock) AS qtd FROM sal GROUP BY ref, armazem), "
+        "lotes AS (SELECT ref, lote FROM se WHERE ref = 'MP02.00.001') "
+        "SELECT l.lote, s.armazem, s.qtd FROM lotes l JOIN stock s ON s.ref = l.ref "
+        "WHERE s.qtd > 0 -- apenas com stock\n"
+        "ORDER BY s.qtd DESC"
+    ),
+}
+
+
+def _legacy_validate_sql(query: str) -> bool:
+    forbidden_keywords = ["DROP", "DELETE", "TRUNCATE", "UPDATE", "INSERT", "ALTER", "CREATE", "EXEC"]
+    query_upper = query.upper()
+    if not query_upper.startswith("SELECT"):
+        return False
+    for keyword in forbidden_keywords:
+        if keyword in query_upper:
+            return False
+    return True
+
+
+def _legacy_extract_tables(query: str) -> list:
+    tables = re.findall(r'FROM\s+([\w]+)', query, re.IGNORECASE)
+    tables += re.findall(r'JOIN\s+([\w]+)', query, re.IGNORECASE)
+    return list(set(tables))
+
+
+def _legacy_format_sql(query: str) -> str:
+    query = re.sub(r'(?i)SELECT', '\nSELECT', query)
+    query = re.sub(r'(?i)FROM', '\nFROM', query)
+    query = re.sub(r'(?i)WHERE', '\nWHERE', query)
+    query = re.sub(r'(?i)GROUP BY', '\nGROUP BY', query)
+    query = re.sub(r'(?i)ORDER BY', '\nORDER BY', query)
+    return query
+
+
+FUNCTIONS = [
+    ("tokenize_sql", tokenize_sql, None),
+    ("parse_statements", parse_statements, None),
+    ("validate_sql", validate_sql, _legacy_validate_sql),
+    ("extract_tables_from_query", extract_tables_from_query, _legacy_extract_tables),
+    ("format_sql", format_sql, _legacy_format_sql),
+]
+
+
+def _per_call_us(func, query: str, number: int) -> float:
+    return min(timeit.repeat(lambda: func(query), number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'consulta':<10} {'função':<28} {'atual (µs)':>11} {'anterior (µs)':>14}")
+    for name, query in QUERIES.items():
+        for label, func, legacy in FUNCTIONS:
+            current = _per_call_us(func, query, number)
+            previous = f"{_per_call_us(legacy, query, number):14.1f}" if legacy else f"{'-':>14}"
+            print(f"{name:<10} {label:<28} {current:11.1f} {previous}")
+        print(f"{'':<10} tabelas: {extract_tables_from_query(query)} | válida: {validate_sql(query)} "
+              f"(anterior: {_legacy_validate_sql(query)})")
+
+
+if __name__ == "__main__":
+    main()
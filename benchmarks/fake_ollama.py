@@ -0,0 +1,205 @@
+"""
+Servidor HTTP que imita o /api/generate do Ollama para os benchmarks
+
+Responde com SQL pré-definido por pergunta, em streaming (NDJSON) ou não, e
+simula as latências do modelo:
+
+- avaliação do prompt proporcional aos tokens novos; como no Ollama, cada
+  slot guarda o último prompt e o prefixo em comum com o próximo não é
+  reavaliado (cache KV do prefixo);
+- geração proporcional aos tokens da resposta, enviados um a um;
+- no máximo `num_parallel` gerações simultâneas (as demais aguardam).
+
+As métricas da resposta final (prompt_eval_count, eval_count e durações em
+ns) seguem o formato do Ollama.
+
+Uso isolado:
+    python benchmarks/fake_ollama.py [porta]
+"""
+import json
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+_QUESTION = re.compile(r"### Solicitação:\n(.*?)\n\n### SQL:", re.DOTALL)
+_BAD_SQL = re.compile(r"### Consulta com erro:\n(.*?)\n\n### Erro", re.DOTALL)
+_TOKEN = re.compile(r"\s*\S+")
+
+DEFAULT_SQL = "SELECT 1 AS ok;"
+
+
+def _count_tokens(text: str) -> int:
+    """Aproximação de ~4 caracteres por token (a mesma de estimate_tokens)"""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _common_prefix(a: str, b: str) -> int:
+    size = min(len(a), len(b))
+    i = 0
+    while i < size and a[i] == b[i]:
+        i += 1
+    return i
+
+
+class FakeOllama:
+    """
+    Estado e latências simuladas do modelo
+
+    Args:
+        responses: Pergunta -> SQL devolvido (perguntas não encontradas recebem DEFAULT_SQL)
+        prompt_ms_per_token: Custo de avaliação de cada token novo do prompt
+        token_ms: Custo de geração de cada token da resposta
+        load_ms: Latência fixa por requisição (rede, agendamento)
+        num_parallel: Slots do modelo (como OLLAMA_NUM_PARALLEL)
+    """
+
+    def __init__(self, responses: Optional[Dict[str, str]] = None, prompt_ms_per_token: float = 0.2,
+                 token_ms: float = 5.0, load_ms: float = 2.0, num_parallel: int = 4):
+        self.responses = dict(responses or {})
+        self.prompt_ms_per_token = prompt_ms_per_token
+        self.token_ms = token_ms
+        self.load_ms = load_ms
+        self.num_parallel = num_parallel
+        self._slots: List[str] = [""] * num_parallel
+        self._free = list(range(num_parallel))
+        self._cond = threading.Condition()
+        self.stats = {"requests": 0, "prompt_tokens": 0, "cached_tokens": 0, "generated_tokens": 0}
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def start(self, port: int = 0) -> "FakeOllama":
+        """Inicia o servidor em segundo plano (porta 0 = qualquer porta livre)"""
+        handler = type("Handler", (_Handler,), {"model": self})
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="fake-ollama", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def answer(self, prompt: str) -> str:
+        match = _BAD_SQL.search(prompt)
+        if match:
+            return match.group(1).strip()
+        match = _QUESTION.search(prompt)
+        question = match.group(1).strip() if match else ""
+        return self.responses.get(question, DEFAULT_SQL)
+
+    def acquire_slot(self, prompt: str) -> Tuple[int, int]:
+        """Reserva o slot com o maior prefixo em comum; retorna (slot, tokens já em cache)"""
+        with self._cond:
+            while not self._free:
+                self._cond.wait()
+            slot = max(self._free, key=lambda i: _common_prefix(self._slots[i], prompt))
+            self._free.remove(slot)
+            cached = _common_prefix(self._slots[slot], prompt)
+            self._slots[slot] = prompt
+            return slot, _count_tokens(prompt[:cached])
+
+    def release_slot(self, slot: int):
+        with self._cond:
+            self._free.append(slot)
+            self._cond.notify()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    model: FakeOllama
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Conexão keep-alive fechada pelo cliente
+            pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = self.model
+        prompt = payload.get("prompt", "")
+        stream = payload.get("stream", True)
+        start = time.perf_counter()
+
+        slot, cached_tokens = model.acquire_slot(prompt)
+        try:
+            prompt_tokens = _count_tokens(prompt)
+            evaluated = max(prompt_tokens - cached_tokens, 1 if prompt else 0)
+            time.sleep((model.load_ms + evaluated * model.prompt_ms_per_token) / 1000)
+            prompt_eval = time.perf_counter() - start
+            tokens = _TOKEN.findall(model.answer(prompt)) if prompt else []
+            with model._cond:
+                model.stats["requests"] += 1
+                model.stats["prompt_tokens"] += prompt_tokens
+                model.stats["cached_tokens"] += prompt_tokens - evaluated
+
+            if stream:
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+            try:
+                for token in tokens:
+                    time.sleep(model.token_ms / 1000)
+                    if stream:
+                        self._write_chunk({"model": payload.get("model"), "response": token, "done": False})
+                    with model._cond:
+                        model.stats["generated_tokens"] += 1
+            except (BrokenPipeError, ConnectionResetError):
+                # O cliente fechou a conexão ao receber o SQL completo: geração abortada
+                self.close_connection = True
+                return
+
+            final = {
+                "model": payload.get("model"),
+                "response": "" if stream else "".join(tokens),
+                "done": True,
+                "total_duration": int((time.perf_counter() - start) * 1e9),
+                "load_duration": int(model.load_ms * 1e6),
+                "prompt_eval_count": evaluated,
+                "prompt_eval_duration": int(prompt_eval * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(len(tokens) * model.token_ms * 1e6),
+            }
+            try:
+                if stream:
+                    self._write_chunk(final)
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    body = json.dumps(final).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True
+        finally:
+            model.release_slot(slot)
+
+    def _write_chunk(self, data: Dict):
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):X}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    server = FakeOllama().start(int(sys.argv[1]) if len(sys.argv) > 1 else 11435)
+    print(f"Ollama simulado em {server.url} (Ctrl+C para encerrar)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,216 @@
+"""
+Banco SQLite que substitui o SQL Server nos benchmarks
+
+SQLiteDatabaseManager herda de DatabaseManager: pool de conexões, leitura em
+lotes, limites de linhas/bytes, rastreamento e cache de resultados são os
+mesmos. Apenas a conexão, as consultas de catálogo (respondidas com PRAGMA)
+e a validação (EXPLAIN) são trocadas.
+
+O guarda de custo (SHOWPLAN_XML, TOP e OPTION) e a inferência de
+relacionamentos dependem do SQL Server e ficam desativados nos benchmarks.
+
+seed_erp_database() cria tabelas largas no estilo de um ERP (artigos, lotes,
+stock por armazém, documentos e linhas), com chaves estrangeiras declaradas.
+"""
+import os
+import random
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from src.core.database import DatabaseManager
+from src.core.schema_catalog import _COLUMNS_QUERY, _FOREIGN_KEYS_QUERY, _MODIFY_DATES_QUERY
+
+# Tabela -> (colunas próprias, chaves estrangeiras, linhas); completadas com colunas u_campoNN até `width`
+ERP_TABLES = {
+    "st": (["ref TEXT PRIMARY KEY", "design TEXT", "familia TEXT", "unidade TEXT", "epv1 REAL", "epcusto REAL",
+            "stock REAL", "inactivo INTEGER", "usrdata TEXT"], [], 2000),
+    "fl": (["no INTEGER PRIMARY KEY", "nome TEXT", "ncont TEXT", "local TEXT", "pais TEXT"], [], 200),
+    "cl": (["no INTEGER PRIMARY KEY", "nome TEXT", "ncont TEXT", "local TEXT", "zona TEXT", "saldo REAL"], [], 500),
+    "se": (["lote TEXT PRIMARY KEY", "ref TEXT", "design TEXT", "validade TEXT", "fornecedor INTEGER", "data TEXT"],
+           [("ref", "st", "ref"), ("fornecedor", "fl", "no")], 5000),
+    "sa": (["armazem INTEGER PRIMARY KEY", "nome TEXT", "local TEXT"], [], 10),
+    "sal": (["salstamp TEXT PRIMARY KEY", "ref TEXT", "lote TEXT", "armazem INTEGER", "stock REAL"],
+            [("ref", "st", "ref"), ("lote", "se", "lote"), ("armazem", "sa", "armazem")], 8000),
+    "ft": (["ftstamp TEXT PRIMARY KEY", "fno INTEGER", "no INTEGER", "fdata TEXT", "etotal REAL", "nmdoc TEXT"],
+           [("no", "cl", "no")], 3000),
+    "fi": (["fistamp TEXT PRIMARY KEY", "ftstamp TEXT", "ref TEXT", "lote TEXT", "qtt REAL", "epv REAL",
+            "etiliquido REAL"], [("ftstamp", "ft", "ftstamp"), ("ref", "st", "ref"), ("lote", "se", "lote")], 20000),
+}
+
+
+def seed_erp_database(path: str, width: int = 80, scale: float = 1.0, seed: int = 42) -> Dict[str, int]:
+    """
+    Cria (ou recria) o banco SQLite de exemplo
+
+    Args:
+        path: Arquivo do banco
+        width: Número total de colunas por tabela (as extras simulam campos de utilizador)
+        scale: Multiplicador do número de linhas
+        seed: Semente dos dados aleatórios
+
+    Returns:
+        Tabela -> número de linhas
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    rng = random.Random(seed)
+    counts: Dict[str, int] = {}
+    keys: Dict[str, List[Any]] = {}
+    conn = sqlite3.connect(path)
+    try:
+        for table, (columns, foreign_keys, rows) in ERP_TABLES.items():
+            extra = [f"u_campo{i:02d} TEXT" for i in range(1, max(0, width - len(columns)) + 1)]
+            constraints = [f"FOREIGN KEY ({col}) REFERENCES {target}({target_col})"
+                           for col, target, target_col in foreign_keys]
+            conn.execute(f"CREATE TABLE {table} ({', '.join(columns + extra + constraints)})")
+
+            names = [c.split()[0] for c in columns]
+            types = [c.split()[1] for c in columns]
+            fk_by_column = {col: (target, target_col) for col, target, target_col in foreign_keys}
+            count = max(1, int(rows * scale))
+            data = []
+            for i in range(count):
+                row = []
+                for position, (name, kind) in enumerate(zip(names, types)):
+                    if position == 0:
+                        value = i + 1 if kind == "INTEGER" else f"{table.upper()}{i + 1:06d}"
+                    elif name in fk_by_column:
+                        value = rng.choice(keys[fk_by_column[name][0]])
+                    elif kind == "REAL":
+                        value = round(rng.uniform(0, 1000), 2)
+                    elif kind == "INTEGER":
+                        value = rng.randint(0, 1)
+                    elif "data" in name or name == "validade":
+                        value = f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+                    else:
+                        value = f"{name} {rng.randint(1, 500)}"
+                    row.append(value)
+                row.extend(f"valor {rng.randint(1, 99)}" for _ in extra)
+                data.append(row)
+            placeholders = ", ".join("?" for _ in range(len(names) + len(extra)))
+            conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", data)
+            keys[table] = [row[0] for row in data]
+            counts[table] = count
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+class _Cursor:
+    """Cursor sqlite3 com cancel() (sqlite3 interrompe pela conexão) e latência simulada"""
+
+    def __init__(self, connection: "_Connection"):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query: str, *params):
+        if self._connection.latency:
+            time.sleep(self._connection.latency)
+        if len(params) == 1 and isinstance(params[0], (tuple, list)):
+            params = params[0]
+        self._cursor.execute(query, params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size: int):
+        return self._cursor.fetchmany(size)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def nextset(self):
+        return False
+
+    def cancel(self):
+        self._connection.raw.interrupt()
+
+    def close(self):
+        self._cursor.close()
+
+
+class _Connection:
+    """Conexão com a interface usada pelo pool e pelo DatabaseManager (timeout, cursor, rollback)"""
+
+    def __init__(self, path: str, latency: float):
+        self.raw = sqlite3.connect(path, check_same_thread=False)
+        self.latency = latency
+        self.timeout = 0
+
+    def cursor(self) -> _Cursor:
+        return _Cursor(self)
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def close(self):
+        self.raw.close()
+
+
+class SQLiteDatabaseManager(DatabaseManager):
+    """
+    DatabaseManager sobre um arquivo SQLite
+
+    Args:
+        path: Arquivo criado por seed_erp_database()
+        latency: Atraso (s) por instrução, simulando a ida e volta da rede até o SQL Server
+    """
+
+    def __init__(self, path: str, latency: float = 0.0):
+        self.path = path
+        self.latency = latency
+        super().__init__({"server": "sqlite", "database": os.path.splitext(os.path.basename(path))[0],
+                          "username": "", "password": ""})
+
+    def _open_connection(self):
+        return _Connection(self.path, self.latency)
+
+    def _fetch_all(self, query: str, params: tuple = (), timeout: int = 0) -> List[Any]:
+        # Consultas de catálogo do SQL Server respondidas a partir do SQLite
+        if query.startswith(_MODIFY_DATES_QUERY):
+            return [("dbo", table, "2024-01-01 00:00:00") for table in self._tables()]
+        if query.startswith(_COLUMNS_QUERY):
+            wanted = {p.lower() for p in params if "." in str(p)}
+            return [row for row in self._columns() if not wanted or f"dbo.{row[1]}".lower() in wanted]
+        if query.startswith(_FOREIGN_KEYS_QUERY):
+            return self._foreign_keys()
+        return super()._fetch_all(query, params, timeout)
+
+    def validate_query(self, query: str) -> Optional[str]:
+        """Compila a consulta com EXPLAIN, sem executá-la"""
+        try:
+            with self.cursor() as cursor:
+                cursor.execute(f"EXPLAIN {query.rstrip().rstrip(';')}")
+                cursor.fetchall()
+            return None
+        except sqlite3.Error as e:
+            return str(e)
+
+    def _tables(self) -> List[str]:
+        with self.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name")
+            return [row[0] for row in cursor.fetchall()]
+
+    def _columns(self) -> List[tuple]:
+        rows = []
+        with self.cursor() as cursor:
+            for table in self._tables():
+                cursor.execute(f"PRAGMA table_info({table})")
+                for _, name, kind, _, _, pk in cursor.fetchall():
+                    rows.append(("dbo", table, name, kind.lower() or "text", None, pk))
+        return rows
+
+    def _foreign_keys(self) -> List[tuple]:
+        rows = []
+        with self.cursor() as cursor:
+            for table in self._tables():
+                cursor.execute(f"PRAGMA foreign_key_list({table})")
+                for fk in cursor.fetchall():
+                    rows.append(("dbo", table, fk[3], "dbo", fk[2], fk[4]))
+        return rows
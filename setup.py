@@ -8,6 +8,7 @@ setup(
     install_requires=[
         'requests',
         'pandas',
+        'numpy',
         'pyodbc',
         'setuptools', 
         'flask',   
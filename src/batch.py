@@ -0,0 +1,312 @@
+"""
+Modo em lote: executa uma lista de perguntas com geração e execução em pipeline
+
+Uso:
+    python -m src.batch perguntas.csv resultados.jsonl [--env dev]
+
+Entrada CSV (colunas "question", "tables" e, opcionalmente, "id") ou JSONL
+({"id": ..., "question": ..., "tables": [...]}). As tabelas podem ser uma
+lista ou um texto separado por vírgulas; vazias = seleção automática.
+
+A geração (Ollama) e a execução (SQL Server) rodam em etapas separadas,
+ligadas por filas limitadas: enquanto uma consulta executa no banco, as
+próximas perguntas já estão sendo geradas. Cada resultado é gravado no
+arquivo de saída assim que termina; ao reiniciar, as perguntas já presentes
+na saída são ignoradas.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from typing import List, Dict, Any, Iterator, Optional, Set
+from src.config.settings import settings
+from src.config.config_env import env_manager
+from src.core.assistant import SQLAIAssistant
+from src.main import get_db_config
+from src.utils.json_utils import json_default
+from src.utils.text_utils import normalize_question
+from src.utils.logger import configure_logging, get_logger
+from src.utils.tracing import configure_tracing, tracer
+
+logger = get_logger(__name__)
+
+_DONE = object()
+
+
+def _parse_tables(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(t).strip() for t in value if str(t).strip()]
+    return [t.strip() for t in re.split(r"[,;|]", value or "") if t.strip()]
+
+
+def _item_id(question: str, tables: List[str]) -> str:
+    """Identificador estável de uma pergunta sem id explícito"""
+    raw = normalize_question(question) + "|" + ",".join(sorted(t.lower() for t in tables))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def read_items(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lê as perguntas do arquivo de entrada (.csv ou .jsonl)
+
+    Yields:
+        {"id", "question", "tables"}
+    """
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        if path.lower().endswith(".csv"):
+            records = csv.DictReader(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            question = (record.get("question") or "").strip()
+            if not question:
+                continue
+            tables = _parse_tables(record.get("tables"))
+            item_id = str(record.get("id") or "").strip() or _item_id(question, tables)
+            yield {"id": item_id, "question": question, "tables": tables}
+
+
+def completed_ids(path: str, retry_failed: bool = False) -> Set[str]:
+    """Ids já gravados no arquivo de saída (para retomar após uma interrupção)"""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # Última linha incompleta de uma execução interrompida
+                continue
+            if retry_failed and record.get("status") != "ok":
+                continue
+            done.add(record.get("id"))
+    return done
+
+
+class StageStats:
+    """Contadores de uma etapa do pipeline"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, elapsed: float, failed: bool = False):
+        with self._lock:
+            self.processed += 1
+            self.failed += int(failed)
+            self.busy += elapsed
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "etapa": self.name,
+                "itens": self.processed,
+                "falhas": self.failed,
+                "itens_por_s": round(self.processed / wall, 3) if wall else 0.0,
+                "latencia_media_s": round(self.busy / self.processed, 3) if self.processed else 0.0,
+            }
+
+
+class BatchRunner:
+    """
+    Pipeline de duas etapas (geração -> execução) com filas limitadas.
+
+    `generators` threads chamam SQLAIAssistant.prepare() e `executors`
+    threads chamam execute_prepared(); uma única thread grava a saída.
+    As filas limitadas aplicam contrapressão: a geração não se adianta mais
+    do que `queue_size` consultas em relação à execução.
+    """
+
+    def __init__(self, assistant: SQLAIAssistant, output_path: str, generators: Optional[int] = None,
+                 executors: Optional[int] = None, queue_size: Optional[int] = None):
+        self.assistant = assistant
+        self.output_path = output_path
+        self.generators = generators or settings.OLLAMA_NUM_PARALLEL
+        self.executors = executors or settings.DB_POOL_SIZE
+        queue_size = queue_size or 2 * max(self.generators, self.executors)
+        self._generate_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._execute_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._output_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self.stats = {name: StageStats(name) for name in ("geracao", "execucao", "saida")}
+
+    def run(self, items: Iterator[Dict[str, Any]], skip: Set[str]) -> Dict[str, Any]:
+        """
+        Processa as perguntas e retorna o relatório de vazão por etapa
+
+        Args:
+            items: Perguntas de entrada
+            skip: Ids já processados (retomada)
+        """
+        start = time.perf_counter()
+        generators = [threading.Thread(target=self._generate_worker, name=f"geracao-{i}", daemon=True)
+                      for i in range(self.generators)]
+        executors = [threading.Thread(target=self._execute_worker, name=f"execucao-{i}", daemon=True)
+                     for i in range(self.executors)]
+        writer = threading.Thread(target=self._write_worker, name="saida", daemon=True)
+        for thread in generators + executors + [writer]:
+            thread.start()
+
+        skipped = 0
+        try:
+            for item in items:
+                if item["id"] in skip:
+                    skipped += 1
+                    continue
+                self._put(self._generate_queue, item)
+                if self._stop.is_set():
+                    break
+            # Encerramento em cascata: cada etapa termina depois que a anterior esvaziou
+            self._finish(self._generate_queue, generators)
+            self._finish(self._execute_queue, executors)
+            self._finish(self._output_queue, [writer])
+        except KeyboardInterrupt:
+            print("\nInterrompido. Os resultados já gravados serão ignorados na próxima execução.")
+            self._stop.set()
+            self.assistant.db.cancel_running()
+            writer.join(timeout=settings.DB_QUERY_TIMEOUT or None)
+
+        wall = time.perf_counter() - start
+        return {
+            "duracao_s": round(wall, 2),
+            "ignoradas_retomada": skipped,
+            "etapas": [stage.report(wall) for stage in self.stats.values()],
+        }
+
+    def _put(self, target: queue.Queue, item):
+        while not self._stop.is_set():
+            try:
+                target.put(item, timeout=0.2)
+                return
+            except queue.Full:
+                continue
+
+    def _finish(self, target: queue.Queue, workers: List[threading.Thread]):
+        for _ in workers:
+            self._put(target, _DONE)
+        for worker in workers:
+            # join em intervalos curtos para que o Ctrl+C seja atendido
+            while worker.is_alive():
+                worker.join(0.2)
+
+    def _generate_worker(self):
+        while True:
+            item = self._generate_queue.get()
+            if item is _DONE or self._stop.is_set():
+                return
+            start = time.perf_counter()
+            try:
+                with tracer.span("batch.generate", id=item["id"], question=item["question"]):
+                    prepared = self.assistant.prepare(item["question"], item["tables"])
+            except Exception as e:
+                elapsed = time.perf_counter() - start
+                self.stats["geracao"].add(elapsed, failed=True)
+                self._put(self._output_queue, dict(item, status="error", stage="geracao", error=str(e),
+                                                   generation_s=round(elapsed, 3)))
+                continue
+            elapsed = time.perf_counter() - start
+            self.stats["geracao"].add(elapsed)
+            self._put(self._execute_queue, (dict(item, generation_s=round(elapsed, 3)), prepared))
+
+    def _execute_worker(self):
+        while True:
+            entry = self._execute_queue.get()
+            if entry is _DONE or self._stop.is_set():
+                return
+            item, (sql_query, schemas, relationships, route) = entry
+            start = time.perf_counter()
+            try:
+                with tracer.span("batch.execute", id=item["id"]) as span:
+                    rows = list(self.assistant.execute_prepared(sql_query, schemas, relationships, self._stop,
+                                                                   route, item["question"]))
+                    span.set(rows=len(rows))
+                result = dict(item, status="ok", sql=sql_query, row_count=len(rows), rows=rows)
+                failed = False
+            except Exception as e:
+                if self._stop.is_set():
+                    # Cancelada pela interrupção: fica para a próxima execução
+                    return
+                result = dict(item, status="error", stage="execucao", sql=sql_query, error=str(e))
+                failed = True
+            elapsed = time.perf_counter() - start
+            self.stats["execucao"].add(elapsed, failed)
+            result["execution_s"] = round(elapsed, 3)
+            self._put(self._output_queue, result)
+
+    def _write_worker(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        with open(self.output_path, "a", encoding="utf-8") as f:
+            while True:
+                try:
+                    result = self._output_queue.get(timeout=0.2)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return
+                    continue
+                if result is _DONE:
+                    return
+                start = time.perf_counter()
+                f.write(json.dumps(result, default=json_default, ensure_ascii=False) + "\n")
+                # Cada resultado fica em disco antes do próximo: a retomada nunca repete trabalho concluído
+                f.flush()
+                os.fsync(f.fileno())
+                self.stats["saida"].add(time.perf_counter() - start)
+                logger.info(f"[{result['id']}] {result['status']}: {result.get('row_count', 0)} linha(s) "
+                            f"- {result['question'][:60]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa perguntas em lote")
+    parser.add_argument("input", help="Arquivo de perguntas (.csv ou .jsonl)")
+    parser.add_argument("output", help="Arquivo de resultados (.jsonl), acrescentado a cada pergunta")
+    parser.add_argument("--env", default=os.getenv("APP_ENV", "dev"), help="Ambiente (dev, prod, ...)")
+    parser.add_argument("--generators", type=int, help="Gerações simultâneas (padrão: OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--executors", type=int, help="Execuções simultâneas (padrão: DB_POOL_SIZE)")
+    parser.add_argument("--queue-size", type=int, help="Capacidade das filas entre as etapas")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="Refaz as perguntas que falharam (o novo resultado é acrescentado à saída)")
+    args = parser.parse_args()
+
+    env_manager.load_environment(args.env)
+    configure_logging()
+    configure_tracing()
+    assistant = SQLAIAssistant(get_db_config(), model_name=os.getenv("LLM_MODEL", "llama3.2"))
+    try:
+        assistant.start()
+    except ConnectionError as e:
+        logger.error(f"Erro na inicialização: {e}")
+        return
+
+    try:
+        runner = BatchRunner(assistant, args.output, args.generators, args.executors, args.queue_size)
+        skip = completed_ids(args.output, args.retry_failed)
+        if skip:
+            print(f"Retomando: {len(skip)} pergunta(s) já processada(s) em {args.output}")
+        report = runner.run(read_items(args.input), skip)
+        print(f"Duração: {report['duracao_s']}s, ignoradas (retomada): {report['ignoradas_retomada']}")
+        for stage in report["etapas"]:
+            print(f"  {stage['etapa']}: {stage['itens']} item(ns), {stage['falhas']} falha(s), "
+                  f"{stage['itens_por_s']} itens/s, latência média {stage['latencia_media_s']}s")
+        print("Latência por etapa (ms):")
+        for stage, summary in tracer.stats().items():
+            print(f"  {stage}: {summary}")
+        if assistant.router:
+            print(f"Roteador de modelos: {assistant.router.stats()}")
+    finally:
+        if assistant.router:
+            assistant.router.save()
+        assistant.db.close()
+        tracer.close()
+
+
+if __name__ == "__main__":
+    main()
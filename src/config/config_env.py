@@ -1,6 +1,9 @@
 import os
 from pathlib import Path
 from dotenv import load_dotenv
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 class EnvironmentManager:
     def __init__(self):
@@ -23,7 +26,7 @@ class EnvironmentManager:
             
         load_dotenv(env_path, override=True)
         self.current_env = env_name
-        print(f"✓ Ambiente '{env_name}' carregado de {env_path}")
+        logger.info(f"✓ Ambiente '{env_name}' carregado de {env_path}")
     
     def _clear_environment(self):
         """Limpa variáveis de ambiente carregadas"""
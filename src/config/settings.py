@@ -6,6 +6,354 @@ load_dotenv()
 class Settings:
     OLLAMA_URL = "http://127.0.0.1:11434/api/generate"
     SQL_DRIVER = "ODBC Driver 18 for SQL Server"
-    FORBIDDEN_SQL_KEYWORDS = ["DROP", "DELETE", "TRUNCATE", "UPDATE", "INSERT", "ALTER", "CREATE", "EXEC"]
+    FORBIDDEN_SQL_KEYWORDS = ["DROP", "DELETE", "TRUNCATE", "UPDATE", "INSERT", "ALTER", "CREATE", "EXEC",
+                              "EXECUTE", "MERGE", "GRANT", "REVOKE", "DENY", "DBCC", "SHUTDOWN", "BACKUP",
+                              "RESTORE", "KILL", "WAITFOR", "BULK"]
 
-settings = Settings()
\ No newline at end of file
+    # As propriedades abaixo são lidas do ambiente no momento do uso, para que
+    # os arquivos envs/.env.<ambiente> carregados pelo main() sejam respeitados.
+
+    @property
+    def CACHE_DIR(self) -> str:
+        """Diretório local para caches persistentes"""
+        return os.getenv("APP_CACHE_DIR", ".cache")
+
+    @property
+    def SCHEMA_CATALOG_SCHEMAS(self) -> list:
+        """Esquemas do banco carregados no catálogo (vazio = todos)"""
+        value = os.getenv("SCHEMA_CATALOG_SCHEMAS", "")
+        return [s.strip() for s in value.split(",") if s.strip()]
+
+    @property
+    def SCHEMA_REFRESH_INTERVAL(self) -> float:
+        """Intervalo mínimo (segundos) entre verificações de alteração do esquema"""
+        return float(os.getenv("SCHEMA_REFRESH_INTERVAL", "60"))
+
+    @property
+    def DB_POOL_SIZE(self) -> int:
+        """Número máximo de conexões simultâneas com o SQL Server"""
+        return int(os.getenv("DB_POOL_SIZE", "5"))
+
+    @property
+    def DB_POOL_TIMEOUT(self) -> float:
+        """Tempo máximo (s) de espera por uma conexão livre no pool"""
+        return float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+    @property
+    def DB_POOL_MAX_IDLE(self) -> float:
+        """Tempo (s) após o qual conexões ociosas são fechadas"""
+        return float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+
+    @property
+    def DB_POOL_HEALTH_CHECK(self) -> float:
+        """Ociosidade (s) a partir da qual a conexão é testada antes do uso"""
+        return float(os.getenv("DB_POOL_HEALTH_CHECK", "30"))
+
+    @property
+    def DB_FETCH_BATCH_SIZE(self) -> int:
+        """Linhas lidas por chamada a fetchmany"""
+        return int(os.getenv("DB_FETCH_BATCH_SIZE", "500"))
+
+    @property
+    def DB_MAX_ROWS(self) -> int:
+        """Limite de linhas retornadas por consulta (0 = sem limite)"""
+        return int(os.getenv("DB_MAX_ROWS", "10000"))
+
+    @property
+    def DB_MAX_RESULT_BYTES(self) -> int:
+        """Orçamento de memória (bytes estimados) por resultado (0 = sem limite)"""
+        return int(os.getenv("DB_MAX_RESULT_BYTES", str(64 * 1024 * 1024)))
+
+    @property
+    def GENERATION_CACHE_ENABLED(self) -> bool:
+        """Ativa o cache persistente de SQL gerado pelo LLM"""
+        return os.getenv("GENERATION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def GENERATION_CACHE_MAX_ENTRIES(self) -> int:
+        """Número máximo de entradas no cache de geração (LRU)"""
+        return int(os.getenv("GENERATION_CACHE_MAX_ENTRIES", "1000"))
+
+    @property
+    def GENERATION_CACHE_TTL(self) -> float:
+        """Validade (s) das entradas do cache de geração (0 = sem expiração)"""
+        return float(os.getenv("GENERATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+    @property
+    def EXAMPLES_ENABLED(self) -> bool:
+        """Inclui no prompt exemplos de perguntas parecidas já respondidas com SQL válido"""
+        return os.getenv("EXAMPLES_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def EXAMPLES_TOP_K(self) -> int:
+        """Número máximo de exemplos incluídos no prompt"""
+        return int(os.getenv("EXAMPLES_TOP_K", "3"))
+
+    @property
+    def EXAMPLES_MIN_SIMILARITY(self) -> float:
+        """Fração mínima dos n-gramas da pergunta que o exemplo precisa ter (0-1)"""
+        return float(os.getenv("EXAMPLES_MIN_SIMILARITY", "0.3"))
+
+    @property
+    def EXAMPLES_MAX_ENTRIES(self) -> int:
+        """Número máximo de exemplos guardados (os mais antigos são removidos)"""
+        return int(os.getenv("EXAMPLES_MAX_ENTRIES", "5000"))
+
+    @property
+    def OLLAMA_STREAM(self) -> bool:
+        """Usa streaming e interrompe a geração quando o SQL estiver completo"""
+        return os.getenv("OLLAMA_STREAM", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def OLLAMA_CONNECT_TIMEOUT(self) -> float:
+        """Timeout (s) para abrir a conexão com o Ollama"""
+        return float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+
+    @property
+    def OLLAMA_READ_TIMEOUT(self) -> float:
+        """Timeout (s) de leitura entre blocos da resposta do Ollama"""
+        return float(os.getenv("OLLAMA_READ_TIMEOUT", "120"))
+
+    @property
+    def OLLAMA_MAX_RETRIES(self) -> int:
+        """Novas tentativas em erros 5xx ou conexão resetada"""
+        return int(os.getenv("OLLAMA_MAX_RETRIES", "3"))
+
+    @property
+    def OLLAMA_RETRY_BACKOFF(self) -> float:
+        """Fator de backoff exponencial (s) entre tentativas"""
+        return float(os.getenv("OLLAMA_RETRY_BACKOFF", "0.5"))
+
+    @property
+    def OLLAMA_NUM_PARALLEL(self) -> int:
+        """Requisições simultâneas ao Ollama (igual ao OLLAMA_NUM_PARALLEL do servidor)"""
+        return int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+    @property
+    def OLLAMA_KEEP_ALIVE(self) -> str:
+        """Tempo que o Ollama mantém o modelo carregado após cada requisição (ex: 30m, -1)"""
+        return os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+    @property
+    def OLLAMA_NUM_CTX(self) -> int:
+        """Janela de contexto pedida ao Ollama (0 = padrão do modelo); prompts truncados perdem o cache do prefixo"""
+        return int(os.getenv("OLLAMA_NUM_CTX", "0"))
+
+    @property
+    def PROMPT_COLUMNS_TOP_K(self) -> int:
+        """Máximo de colunas por tabela enviadas ao prompt (0 = todas)"""
+        return int(os.getenv("PROMPT_COLUMNS_TOP_K", "25"))
+
+    @property
+    def PROMPT_MIN_COLUMNS(self) -> int:
+        """Mínimo de colunas por tabela mantidas quando poucas são relevantes"""
+        return int(os.getenv("PROMPT_MIN_COLUMNS", "5"))
+
+    @property
+    def PROMPT_TOKEN_BUDGET(self) -> int:
+        """Orçamento estimado de tokens para o bloco de esquema do prompt (0 = sem limite)"""
+        return int(os.getenv("PROMPT_TOKEN_BUDGET", "2000"))
+
+    @property
+    def SCHEMA_ANNOTATIONS_PATH(self) -> str:
+        """Arquivo JSON opcional com apelidos e descrições de colunas"""
+        return os.getenv("SCHEMA_ANNOTATIONS_PATH", "")
+
+    @property
+    def AUTO_TABLES_MAX(self) -> int:
+        """Máximo de tabelas selecionadas automaticamente por pergunta"""
+        return int(os.getenv("AUTO_TABLES_MAX", "4"))
+
+    @property
+    def JOIN_MAX_HOPS(self) -> int:
+        """Junções máximas entre uma tabela pedida e as já ligadas (2 = até uma tabela-ponte; 0 = sem limite)"""
+        return int(os.getenv("JOIN_MAX_HOPS", "3"))
+
+    @property
+    def RELATIONSHIP_INFERENCE(self) -> bool:
+        """Infere relacionamentos em segundo plano quando não há resultados persistidos"""
+        return os.getenv("RELATIONSHIP_INFERENCE", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def RELATIONSHIP_SAMPLE_SIZE(self) -> int:
+        """Linhas amostradas por coluna candidata"""
+        return int(os.getenv("RELATIONSHIP_SAMPLE_SIZE", "2000"))
+
+    @property
+    def RELATIONSHIP_SAMPLE_TIMEOUT(self) -> int:
+        """Tempo máximo (s) de cada consulta de amostragem de coluna"""
+        return int(os.getenv("RELATIONSHIP_SAMPLE_TIMEOUT", "5"))
+
+    @property
+    def RELATIONSHIP_INFERENCE_BUDGET(self) -> float:
+        """Tempo máximo (s) de cada execução da inferência; o restante fica para a próxima (0 = sem limite)"""
+        return float(os.getenv("RELATIONSHIP_INFERENCE_BUDGET", "300"))
+
+    @property
+    def RELATIONSHIP_MIN_SCORE(self) -> float:
+        """Pontuação mínima (nome + sobreposição de valores) para aceitar um relacionamento"""
+        return float(os.getenv("RELATIONSHIP_MIN_SCORE", "0.6"))
+
+    @property
+    def RELATIONSHIPS_OVERRIDE_PATH(self) -> str:
+        """Arquivo JSON opcional com relacionamentos a incluir/excluir ({"include": [...], "exclude": [...]})"""
+        return os.getenv("RELATIONSHIPS_OVERRIDE_PATH", "")
+
+    @property
+    def SQL_MAX_CORRECTIONS(self) -> int:
+        """Tentativas de correção automática de SQL rejeitado pelo banco"""
+        return int(os.getenv("SQL_MAX_CORRECTIONS", "2"))
+
+    @property
+    def QUERY_GUARD_ENABLED(self) -> bool:
+        """Consulta o plano estimado (SHOWPLAN_XML) antes de executar SQL gerado"""
+        return os.getenv("QUERY_GUARD_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def QUERY_MAX_COST(self) -> float:
+        """Custo estimado máximo (StatementSubTreeCost) de uma consulta (0 = sem limite)"""
+        return float(os.getenv("QUERY_MAX_COST", "50"))
+
+    @property
+    def QUERY_MAX_ESTIMATED_ROWS(self) -> float:
+        """Número máximo de linhas estimadas pelo plano (0 = sem limite)"""
+        return float(os.getenv("QUERY_MAX_ESTIMATED_ROWS", "1000000"))
+
+    @property
+    def DB_QUERY_TIMEOUT(self) -> int:
+        """Tempo máximo (s) de execução de uma consulta gerada (0 = sem limite)"""
+        return int(os.getenv("DB_QUERY_TIMEOUT", "60"))
+
+    @property
+    def QUERY_MAXDOP(self) -> int:
+        """Grau máximo de paralelismo (OPTION MAXDOP) das consultas geradas (0 = padrão do servidor)"""
+        return int(os.getenv("QUERY_MAXDOP", "2"))
+
+    @property
+    def QUERY_GUARD_LOG_PATH(self) -> str:
+        """Arquivo JSONL com rejeições e custo estimado x real das consultas"""
+        return os.getenv("QUERY_GUARD_LOG_PATH", os.path.join(self.CACHE_DIR, "query_guard.jsonl"))
+
+    @property
+    def QUERY_GUARD_LOG_MAX_BYTES(self) -> int:
+        """Tamanho a partir do qual o JSONL do guarda é rotacionado (0 = sem limite)"""
+        return int(os.getenv("QUERY_GUARD_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+
+    @property
+    def QUERY_GUARD_LOG_BACKUPS(self) -> int:
+        """Arquivos rotacionados mantidos (query_guard.jsonl.1, .2, ...); 0 = descarta o antigo"""
+        return int(os.getenv("QUERY_GUARD_LOG_BACKUPS", "3"))
+
+    @property
+    def RESULT_CACHE_ENABLED(self) -> bool:
+        """Mantém em memória os resultados de consultas repetidas"""
+        return os.getenv("RESULT_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    @property
+    def RESULT_CACHE_MAX_BYTES(self) -> int:
+        """Orçamento de memória (bytes estimados) do cache de resultados"""
+        return int(os.getenv("RESULT_CACHE_MAX_BYTES", str(128 * 1024 * 1024)))
+
+    @property
+    def RESULT_CACHE_TTL(self) -> float:
+        """Validade (s) de um resultado em cache (0 = sem validade)"""
+        return float(os.getenv("RESULT_CACHE_TTL", "300"))
+
+    @property
+    def RESULT_CACHE_CHECK_INTERVAL(self) -> float:
+        """Intervalo mínimo (s) entre verificações de alteração das tabelas em cache"""
+        return float(os.getenv("RESULT_CACHE_CHECK_INTERVAL", "5"))
+
+    @property
+    def SERVER_HOST(self) -> str:
+        """Endereço de escuta do modo servidor HTTP"""
+        return os.getenv("SERVER_HOST", "127.0.0.1")
+
+    @property
+    def SERVER_PORT(self) -> int:
+        """Porta do modo servidor HTTP"""
+        return int(os.getenv("SERVER_PORT", "8000"))
+
+    @property
+    def SERVER_MAX_CONCURRENT(self) -> int:
+        """Solicitações processadas simultaneamente pelo servidor; as demais recebem 429"""
+        return int(os.getenv("SERVER_MAX_CONCURRENT", "8"))
+
+    @property
+    def SERVER_QUEUE_TIMEOUT(self) -> float:
+        """Tempo (s) que uma solicitação aguarda vaga antes de receber 429 (0 = não aguarda)"""
+        return float(os.getenv("SERVER_QUEUE_TIMEOUT", "0"))
+
+    @property
+    def SERVER_SHUTDOWN_TIMEOUT(self) -> float:
+        """Tempo (s) para concluir as solicitações em andamento no encerramento"""
+        return float(os.getenv("SERVER_SHUTDOWN_TIMEOUT", "30"))
+
+    @property
+    def SINGLE_FLIGHT_ENABLED(self) -> bool:
+        """Agrupa solicitações idênticas simultâneas em uma única geração e execução"""
+        return os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def SPECULATIVE_CANDIDATES(self) -> int:
+        """Gerações de SQL disparadas em paralelo por pergunta (0 ou 1 = desativado)"""
+        return int(os.getenv("SPECULATIVE_CANDIDATES", "0"))
+
+    @property
+    def SPECULATIVE_TEMPERATURES(self) -> list:
+        """Temperaturas das gerações especulativas, atribuídas em rodízio aos candidatos"""
+        values = os.getenv("SPECULATIVE_TEMPERATURES", "0.3,0.6,0.9")
+        return [float(v) for v in values.split(",") if v.strip()] or [0.3]
+
+    @property
+    def ROUTER_MODELS(self) -> list:
+        """Modelos menores tentados antes do modelo principal, do menor para o maior (vazio = desativado)"""
+        value = os.getenv("ROUTER_MODELS", "")
+        return [m.strip() for m in value.split(",") if m.strip()]
+
+    @property
+    def ROUTER_COMPLEXITY_THRESHOLD(self) -> float:
+        """Complexidade (0-1) a partir da qual a pergunta pula o menor modelo"""
+        return float(os.getenv("ROUTER_COMPLEXITY_THRESHOLD", "0.6"))
+
+    @property
+    def ROUTER_MIN_SAMPLES(self) -> int:
+        """Desfechos registrados por formato de pergunta antes de o roteador aprender com eles"""
+        return int(os.getenv("ROUTER_MIN_SAMPLES", "5"))
+
+    @property
+    def ROUTER_MIN_SUCCESS(self) -> float:
+        """Taxa de sucesso mínima de um modelo para um formato de pergunta continuar a recebê-lo"""
+        return float(os.getenv("ROUTER_MIN_SUCCESS", "0.6"))
+
+    @property
+    def ROUTER_STATE_PATH(self) -> str:
+        """Arquivo JSON com os desfechos por formato de pergunta e modelo"""
+        return os.getenv("ROUTER_STATE_PATH", os.path.join(self.CACHE_DIR, "model_router.json"))
+
+    @property
+    def LOG_LEVEL(self) -> str:
+        """Nível das mensagens de log (DEBUG, INFO, WARNING, ERROR)"""
+        return os.getenv("LOG_LEVEL", "INFO").upper()
+
+    @property
+    def LOG_FORMAT(self) -> str:
+        """Formato das mensagens de log (sintaxe do módulo logging)"""
+        return os.getenv("LOG_FORMAT", "%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    @property
+    def TRACE_ENABLED(self) -> bool:
+        """Mede a duração de cada etapa das solicitações"""
+        return os.getenv("TRACE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+    @property
+    def TRACE_LOG_PATH(self) -> str:
+        """Arquivo JSONL com uma linha por solicitação rastreada (vazio = desativado)"""
+        return os.getenv("TRACE_LOG_PATH", os.path.join(self.CACHE_DIR, "traces.jsonl"))
+
+    @property
+    def TRACE_HISTOGRAM_WINDOW(self) -> int:
+        """Medições mais recentes usadas nos percentis de cada etapa"""
+        return int(os.getenv("TRACE_HISTOGRAM_WINDOW", "1000"))
+
+settings = Settings()
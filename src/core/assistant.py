@@ -1,59 +1,581 @@
-from typing import List, Dict, Any
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Tuple, Optional
 from src.llm.ollama_client import OllamaClient
+from src.llm.generation_cache import GenerationCache
+from src.llm.example_index import ExampleIndex
+from src.llm.schema_pruning import ColumnPruner
+from src.llm.speculative import SpeculativeGenerator
+from src.llm.model_router import ModelRouter, Route
+from src.core.schema_index import SchemaIndex
+from src.core.join_graph import JoinGraph
 from src.core.database import DatabaseManager
-from src.utils.sql_utils import validate_sql, clean_sql_query
+from src.core.query_guard import QueryGuard, QueryRejectedError
+from src.core.columnar import empty_result
+from src.llm.prompt_templates import PromptTemplates
+from src.utils.sql_utils import check_sql, clean_sql_query
+from src.utils.text_utils import estimate_tokens, normalize_question
+from src.utils.single_flight import SingleFlight
 #from src.utils.error_handling import handle_db_error
 from src.config.settings import settings
+from src.utils.logger import get_logger
+from src.utils.tracing import tracer
+
+logger = get_logger(__name__)
+
 # src/core/assistant.py
 
 class SQLAIAssistant:
-    def __init__(self, db_config: Dict[str, str], model_name: str = "llama3.2"):
-        self.db = DatabaseManager(db_config)
-        self.llm = OllamaClient(model_name)
+    def __init__(self, db_config: Dict[str, str], model_name: str = "llama3.2",
+                 db: Optional[DatabaseManager] = None, llm: Optional[OllamaClient] = None):
+        self.db = db or DatabaseManager(db_config)
+        self.llm = llm or OllamaClient(model_name)
+        self.pruner = ColumnPruner()
+        self.schema_index = SchemaIndex(self.db.catalog, annotations=self.pruner.annotations)
+        self.join_graph = JoinGraph(self.db.catalog, inferred=self.db.inferred_relationships)
+        if settings.RELATIONSHIP_INFERENCE:
+            # Tabelas alteradas podem ganhar ou perder relacionamentos implícitos: reavalia só os candidatos delas
+            self.db.catalog.add_listener(self.db.inferred_relationships.start_background)
+        self.guard = QueryGuard(self.db) if settings.QUERY_GUARD_ENABLED else None
+        # Agrupa solicitações idênticas em andamento (independente dos caches)
+        self.flights = SingleFlight() if settings.SINGLE_FLIGHT_ENABLED else None
+        self.generation_cache = GenerationCache() if settings.GENERATION_CACHE_ENABLED else None
+        # Candidatos gerados em paralelo; o primeiro aprovado é executado
+        self.speculative = SpeculativeGenerator(self.llm) if settings.SPECULATIVE_CANDIDATES > 1 else None
+        # Modelos menores tentados antes do principal (self.llm), que fica como o último nível
+        self.router = None
+        if settings.ROUTER_MODELS:
+            tiers = []
+            for name in settings.ROUTER_MODELS:
+                if name == self.llm.model_name:
+                    continue
+                client = OllamaClient(name, http_client=self.llm.http)
+                client.base_url = self.llm.base_url
+                tiers.append(client)
+            self.router = ModelRouter(tiers + [self.llm])
+        if self.generation_cache:
+            # Alterações de esquema invalidam o SQL gerado para as tabelas afetadas
+            self.db.catalog.add_listener(self.generation_cache.invalidate_tables)
+        # Pares pergunta -> SQL executados com sucesso, usados como exemplos few-shot em perguntas parecidas
+        self.examples = ExampleIndex() if settings.EXAMPLES_ENABLED else None
+        if self.examples:
+            self.db.catalog.add_listener(self.examples.invalidate_tables)
         
-    def process_nl_request(self, nl_request: str, table_names: List[str]) -> List[Dict[str, Any]]:
-        """Processa solicitação em linguagem natural com múltiplas tabelas e JOINs"""
+    def start(self) -> Dict[str, float]:
+        """
+        Fase de inicialização: abre o pool de conexões e pré-carrega o catálogo
+        de esquema enquanto, em paralelo, o modelo é pré-carregado no Ollama
+
+        Returns:
+            Tempo (s) de cada fase
+
+        Raises:
+            ConnectionError: Se não for possível conectar ao banco
+        """
+        timings: Dict[str, float] = {}
+
+        def timed(phase: str, func):
+            start = time.perf_counter()
+            try:
+                return func()
+            finally:
+                timings[phase] = time.perf_counter() - start
+
+        def open_database() -> bool:
+            if not timed("pool_conexoes", self.db.connect):
+                return False
+            try:
+                timed("catalogo_esquema", self.db.catalog.ensure_fresh)
+            except Exception as e:
+                # O catálogo será carregado sob demanda na primeira pergunta
+                logger.warning(f"Erro ao pré-carregar o catálogo de esquema: {e}")
+                return True
+            inferer = self.db.inferred_relationships
+            if not inferer.load() and settings.RELATIONSHIP_INFERENCE:
+                # Sem resultados persistidos: infere em segundo plano sem atrasar a primeira pergunta
+                inferer.start_background()
+            elif inferer.pending() and settings.RELATIONSHIP_INFERENCE:
+                # Retoma os candidatos que ficaram sem avaliação por falta de orçamento
+                inferer.start_background([])
+            return True
+
+        start = time.perf_counter()
+        models = self.router.clients if self.router else [self.llm]
+        with ThreadPoolExecutor(max_workers=1 + len(models)) as executor:
+            db_future = executor.submit(open_database)
+            for llm in models:
+                phase = "aquecimento_modelo" if llm is self.llm else f"aquecimento_{llm.model_name}"
+                executor.submit(timed, phase, llm.warm_up)
+            connected = db_future.result()
+        timings["total"] = time.perf_counter() - start
+
+        if not connected:
+            raise ConnectionError("Não foi possível conectar ao SQL Server")
+        return timings
+
+    def process_nl_request(self, nl_request: str, table_names: List[str], result_format: str = "records"):
+        """
+        Processa solicitação em linguagem natural com múltiplas tabelas e JOINs
+
+        Args:
+            nl_request: Pergunta em linguagem natural
+            table_names: Tabelas envolvidas
+            result_format: "records" (lista de dicionários), "dataframe" ou "numpy" (colunar)
+        """
+        if result_format == "records":
+            return list(self.iter_nl_request(nl_request, table_names))
+        try:
+            with tracer.span("request", question=nl_request, tables=list(table_names), format=result_format) as span:
+                if self.flights is None:
+                    return self._run_columnar(nl_request, table_names, result_format)
+                result, shared = self.flights.do(_request_key(nl_request, table_names, result_format),
+                                                 lambda: self._run_columnar(nl_request, table_names, result_format))
+                span.set(shared=shared)
+                return _copy_columnar(result) if shared else result
+        except Exception as e:
+            logger.error(f"Erro ao processar solicitação: {e}")
+            return empty_result(result_format)
+
+    def _run_columnar(self, nl_request: str, table_names: List[str], result_format: str):
+        """Gera e executa a consulta preenchendo o resultado colunar (propaga os erros)
+
+        Erros de execução passam pelo mesmo ciclo de correção de execute_prepared().
+        """
+        sql_query, schemas, relationships, route = self._generate(nl_request, table_names)
+        [result] = self._execute_corrected(lambda sql: (self._execute_columnar(sql, result_format),),
+                                           sql_query, schemas, relationships, route, nl_request)
+        return result
+
+    def _execute_columnar(self, sql_query: str, result_format: str):
+        """Executa a consulta pelo guarda de custo e retorna o resultado colunar"""
+        executed_sql, before_execute, checked = self._guarded(sql_query)
+        start = time.perf_counter()
+        try:
+            with tracer.span("execution") as span:
+                result = self.db.query_columnar(executed_sql, as_numpy=(result_format == "numpy"),
+                                                before_execute=before_execute)
+                rows = len(result) if result_format == "dataframe" else len(next(iter(result.values()), []))
+                span.set(rows=rows)
+        except Exception as e:
+            if checked.get("record"):
+                self.guard.record_execution(checked["record"], 0, time.perf_counter() - start,
+                                            _execution_status(e), str(e))
+            raise
+        if checked.get("record"):
+            self.guard.record_execution(checked["record"], rows, time.perf_counter() - start)
+        return result
+
+    def iter_nl_request(self, nl_request: str, table_names: List[str],
+                        cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """Processa a solicitação e produz as linhas do resultado à medida que chegam do banco
+
+        Erros são registrados e encerram o resultado (ver stream_nl_request).
+
+        Args:
+            cancel: Evento opcional que interrompe a solicitação (ex: Ctrl+C no REPL)
+        """
+        try:
+            yield from self.stream_nl_request(nl_request, table_names, cancel)
+        except Exception as e:
+            logger.error(f"Erro ao processar solicitação: {e}")
+
+    def stream_nl_request(self, nl_request: str, table_names: List[str],
+                          cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """Como iter_nl_request, mas propaga os erros ao chamador
+
+        Solicitações idênticas simultâneas (mesma pergunta normalizada e mesmas
+        tabelas) são agrupadas: apenas a primeira gera e executa a consulta, e
+        as demais recebem as mesmas linhas ou o mesmo erro quando ela termina.
+        """
+        with tracer.detached_span("request", question=nl_request, tables=list(table_names)) as span:
+            row_count = 0
+            for row in tracer.iterate(span, self._stream_coalesced(nl_request, table_names, cancel)):
+                row_count += 1
+                yield row
+            span.set(rows=row_count)
+
+    def _stream_coalesced(self, nl_request: str, table_names: List[str],
+                          cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        if self.flights is None:
+            yield from self._stream(nl_request, table_names, cancel)
+            return
+
+        key = _request_key(nl_request, table_names, "records")
+        while True:
+            call, leader = self.flights.begin(key)
+            if leader:
+                break
+            rows, retry = self.flights.wait(call, cancel)
+            if not retry:
+                logger.info("Resultado compartilhado com uma solicitação idêntica em andamento.")
+                tracer.set(shared=True)
+                for row in rows:
+                    yield dict(row)
+                return
+
+        # O líder repassa as linhas ao seu consumidor à medida que chegam e as guarda para os demais
+        rows: List[Dict[str, Any]] = []
+        try:
+            for row in self._stream(nl_request, table_names, cancel):
+                rows.append(row)
+                yield row
+        except InterruptedError:
+            self.flights.finish(key, call, abandoned=True)
+            raise
+        except Exception as e:
+            self.flights.finish(key, call, error=e)
+            raise
+        except BaseException:
+            # Consumidor parou de ler (GeneratorExit) ou Ctrl+C: os demais refazem a solicitação
+            self.flights.finish(key, call, abandoned=True)
+            raise
+        self.flights.finish(key, call, result=rows)
+
+    def _stream(self, nl_request: str, table_names: List[str],
+                cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        sql_query, schemas, relationships, route = self.prepare(nl_request, table_names)
+        yield from self.execute_prepared(sql_query, schemas, relationships, cancel, route, nl_request)
+
+    def prepare(self, nl_request: str,
+                table_names: List[str]) -> Tuple[str, Dict[str, List[Dict]], List[Dict], Optional[Route]]:
+        """
+        Etapa de geração: seleciona tabelas, gera e valida a consulta
+
+        Returns:
+            (consulta validada, esquemas e relacionamentos usados no prompt, rota do
+            roteador de modelos ou None), a serem passados para execute_prepared()
+        """
+        return self._generate(nl_request, table_names)
+
+    def execute_prepared(self, sql_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                         cancel: Optional[threading.Event] = None, route: Optional[Route] = None,
+                         nl_request: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Etapa de execução: produz as linhas da consulta gerada por prepare()
+
+        Se a execução falhar antes da primeira linha, o erro é enviado ao modelo
+        para correção e a consulta é refeita (até SQL_MAX_CORRECTIONS vezes).
+        Timeouts e cancelamentos não são corrigidos. Com a rota retornada por
+        prepare(), o desfecho é registrado no roteador em todas as saídas e a
+        correção é pedida ao modelo seguinte ao que gerou a consulta. Com a
+        pergunta original (`nl_request`), a consulta executada com sucesso é
+        registrada como exemplo few-shot.
+        """
+        yield from self._execute_corrected(lambda sql: self._execute(sql, cancel),
+                                           sql_query, schemas, relationships, route, nl_request)
 
-        print(f"Processando solicitação: {nl_request} nas tabelas: {table_names} com o modelo {self.llm.model_name}")
+    def _execute_corrected(self, execute: Callable[[str], Iterable], sql_query: str,
+                           schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                           route: Optional[Route] = None, nl_request: Optional[str] = None) -> Iterator:
+        """
+        Produz os itens de `execute(sql)`; se falhar antes do primeiro item, pede
+        a correção ao modelo e executa de novo (ciclo de execute_prepared(),
+        compartilhado com o resultado colunar)
+        """
+        llm = self.router.client(route) if route else self.llm
+        # Desfecho para o roteador; None = não depende do modelo (timeout, cancelamento)
+        outcome: Optional[bool] = None
         try:
+            attempts = settings.SQL_MAX_CORRECTIONS
+            while True:
+                row_count = 0
+                try:
+                    for row in execute(sql_query):
+                        row_count += 1
+                        yield row
+                    outcome = True
+                    return
+                except GeneratorExit:
+                    # O consumidor parou de ler: a consulta funcionou se já produziu linhas
+                    outcome = True if row_count else None
+                    raise
+                except Exception as e:
+                    if row_count or attempts <= 0 or isinstance(e, (TimeoutError, InterruptedError)):
+                        raise
+                    self._discard_cached(sql_query)
+                    attempts -= 1
+                    if route and self.router.escalate(route, f"erro na execução: {e}"):
+                        llm = self.router.client(route)
+                    sql_query = llm.correct_sql_multi_table(sql_query, str(e), schemas, relationships)
+                    sql_query, used = self._validate_and_repair(sql_query, schemas, relationships, attempts, llm)
+                    attempts -= used
+        except (TimeoutError, InterruptedError):
+            raise
+        except Exception:
+            outcome = False
+            self._discard_cached(sql_query)
+            raise
+        finally:
+            if route:
+                self.router.finish(route, outcome)
+            if outcome and nl_request and self.examples:
+                # Só consultas que executaram viram exemplos
+                self.examples.add(nl_request, schemas.keys(), sql_query)
+
+    def _execute(self, sql_query: str, cancel: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """Executa a consulta pelo guarda de custo e registra linhas e tempo reais"""
+        if cancel is not None and cancel.is_set():
+            raise InterruptedError("Consulta cancelada")
+        executed_sql, before_execute, checked = self._guarded(sql_query)
+        row_count = 0
+        status, error = "completed", None
+        start = time.perf_counter()
+        with tracer.detached_span("execution") as span:
+            try:
+                for row in tracer.iterate(span, self.db.iter_query(executed_sql, before_execute=before_execute)):
+                    if cancel is not None and cancel.is_set():
+                        raise InterruptedError("Consulta cancelada")
+                    row_count += 1
+                    yield row
+            except GeneratorExit:
+                # O consumidor parou de ler antes do fim do resultado
+                status = "stopped"
+                raise
+            except Exception as e:
+                status, error = _execution_status(e), str(e)
+                raise
+            finally:
+                span.set(rows=row_count, status=status)
+                if checked.get("record"):
+                    self.guard.record_execution(checked["record"], row_count, time.perf_counter() - start,
+                                                status, error)
+
+    def _guarded(self, sql_query: str) -> Tuple[str, Optional[Callable[[], None]], Dict[str, Any]]:
+        """
+        Consulta a executar (reescrita pelo guarda de custo) e a verificação do
+        plano, feita pelo banco só quando o resultado não está no cache de resultados
+
+        Returns:
+            (SQL, before_execute para iter_query/query_columnar, dicionário que
+            recebe o "record" do guarda se a verificação acontecer)
+        """
+        checked: Dict[str, Any] = {}
+        if not self.guard:
+            return sql_query, None, checked
+
+        def before_execute():
+            checked["record"] = self._guard(sql_query)
+
+        return self.guard.rewrite(sql_query), before_execute, checked
+
+    def _guard(self, sql_query: str) -> Optional[Dict[str, Any]]:
+        """Plano estimado e limites do guarda de custo (None se desativado)"""
+        if not self.guard:
+            return None
+        with tracer.span("guard") as span:
+            record = self.guard.prepare(sql_query)
+            span.set(estimated_cost=record.get("estimated_cost"), estimated_rows=record.get("estimated_rows"))
+            return record
+
+    def suggest_tables(self, nl_request: str) -> List[str]:
+        """Seleciona automaticamente as tabelas mais prováveis para a pergunta"""
+        return self.schema_index.suggest(nl_request, max_tables=settings.AUTO_TABLES_MAX)
+
+    def generate_query(self, nl_request: str, table_names: List[str]) -> str:
+        """Gera e valida a consulta SQL para a solicitação em linguagem natural
+
+        Se nenhuma tabela for informada, as tabelas são escolhidas pelo índice de esquema.
+        """
+        return self._generate(nl_request, table_names)[0]
+
+    def _generate(self, nl_request: str,
+                  table_names: List[str]) -> Tuple[str, Dict[str, List[Dict]], List[Dict], Optional[Route]]:
+        """
+        Gera a consulta validada e retorna também o esquema e os relacionamentos
+        usados no prompt e a rota do roteador de modelos (None sem roteador ou
+        com o SQL vindo do cache)
+        """
+        with tracer.span("schema") as span:
+            if not table_names:
+                table_names = self.suggest_tables(nl_request)
+                if not table_names:
+                    raise ValueError("Não foi possível identificar as tabelas para a pergunta")
+
+            logger.info(f"Processando solicitação: {nl_request} nas tabelas: {table_names} "
+                        f"com o modelo {self.llm.model_name}")
+            # Junções mínimas entre as tabelas, incluindo tabelas-ponte não citadas
+            bridges, relationships = self.join_graph.connect(table_names)
+            if bridges:
+                logger.info(f"Tabelas-ponte adicionadas para as junções: {bridges}")
+                table_names = list(table_names) + bridges
             schemas = self.db.get_multiple_table_schemas(table_names)
-            # Relacionamentos entre as tabelas
-            relationships = []
-            for table in table_names:
-                relationships.extend(self.db.get_foreign_keys(table))
             #print(f"Esquemas das tabelas: {schemas}")
-            print(f"Relacionamentos: {relationships}")
-
-            # Se não encontrou relacionamentos, solicitar ao usuário
-            if not relationships:
-                print("Não foram encontrados relacionamentos entre as tabelas.")
-                user_input = input(
-                    "Por favor, indique as colunas relacionais no formato 'tabela1.coluna1 = tabela2.coluna2' (separadas por vírgula se houver mais de uma):\n"
-                )
-                # Exemplo de entrada: "Producao.id_lote = Lotes.id, Produtos.id = Producao.id_produto"
-                for rel in user_input.split(","):
-                    rel = rel.strip()
-                    if "=" in rel:
-                        left, right = rel.split("=")
-                        left_table, left_col = [x.strip() for x in left.split(".")]
-                        right_table, right_col = [x.strip() for x in right.split(".")]
-                        relationships.append({
-                            "source_table": left_table,
-                            "source_column": left_col,
-                            "target_table": right_table,
-                            "target_column": right_col
-                        })
-                print(f"Relacionamentos informados pelo usuário: {relationships}")
-
-            sql_query = self.llm.generate_sql_multi_table(nl_request, schemas, relationships)
-           
-            if not validate_sql(sql_query):
-                raise ValueError("Consulta SQL inválida ou insegura")
-                
-            return self.db.execute_query(sql_query)
-            
-        except Exception as e:
-            print(f"Erro ao processar solicitação: {e}")
-            return []
+            logger.debug("Relacionamentos: %s", relationships)
+            span.set(tables=list(table_names), relationships=len(relationships))
+
+        if not relationships and len(table_names) > 1:
+            # Sem chaves declaradas nem inferidas: o modelo deduz as junções pelos nomes das colunas
+            logger.info("Não foram encontrados relacionamentos entre as tabelas. "
+                        "Ajustes podem ser informados em RELATIONSHIPS_OVERRIDE_PATH.")
+
+        with tracer.span("prompt") as span:
+            schemas = self._prune_schemas(nl_request, schemas, relationships)
+            examples = self.examples.search(nl_request, schemas.keys()) if self.examples else []
+            span.set(columns=sum(map(len, schemas.values())), examples=len(examples))
+
+        route = None
+        try:
+            with tracer.span("generation") as span:
+                cached = None
+                if self.generation_cache:
+                    cached = self._cached_generation(nl_request, schemas, relationships)
+                    if cached:
+                        logger.info("SQL obtido do cache de geração.")
+                span.set(cached=bool(cached))
+                checked = False
+                if cached:
+                    sql_query = cached
+                elif self.router:
+                    route = self.router.route(nl_request, table_names)
+                    sql_query, checked = self._generate_routed(nl_request, schemas, relationships, route, examples)
+                else:
+                    sql_query, checked = self._generate_sql(nl_request, schemas, relationships, self.llm, examples)
+
+            corrections = 0
+            if not checked:
+                with tracer.span("validation") as span:
+                    sql_query, corrections = self._validate_and_repair(
+                        sql_query, schemas, relationships, settings.SQL_MAX_CORRECTIONS,
+                        self.router.client(route) if route else self.llm)
+                    span.set(corrections=corrections)
+        except BaseException as e:
+            # Falhas do modelo, do guarda ou da conexão também encerram a rota
+            if route:
+                self.router.finish(route, _route_outcome(e))
+            raise
+
+        if self.generation_cache and (not cached or corrections):
+            if cached:
+                self.generation_cache.discard_sql(cached)
+            # Registrado pelo modelo que produziu o SQL (com o roteador, o nível final da rota)
+            producer = self.router.client(route) if route else self.llm
+            self.generation_cache.put(nl_request, schemas, relationships, producer.model_name, sql_query)
+        return sql_query, schemas, relationships, route
+
+    def _cached_generation(self, nl_request: str, schemas: Dict[str, List[Dict]],
+                           relationships: List[Dict]) -> Optional[str]:
+        """SQL em cache gerado por qualquer um dos modelos, do maior para o menor"""
+        models = self.router.clients if self.router else [self.llm]
+        for llm in reversed(models):
+            cached = self.generation_cache.get(nl_request, schemas, relationships, llm.model_name)
+            if cached:
+                return cached
+        return None
+
+    def _generate_sql(self, nl_request: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                      llm: OllamaClient, examples: Optional[List[Dict]] = None) -> Tuple[str, bool]:
+        """Gera a consulta com `llm`; retorna (SQL, True se já verificado pela geração especulativa)"""
+        if self.speculative:
+            return self.speculative.generate(nl_request, schemas, relationships, self._check_candidate, llm,
+                                             examples)
+        return llm.generate_sql_multi_table(nl_request, schemas, relationships, examples=examples), False
+
+    def _generate_routed(self, nl_request: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                         route: Route, examples: Optional[List[Dict]] = None) -> Tuple[str, bool]:
+        """
+        Gera a consulta a partir do modelo da rota; abaixo do último nível, a
+        consulta é verificada (sintaxe, validação e plano) e, se rejeitada,
+        gerada de novo pelo modelo seguinte em vez de corrigida
+
+        Returns:
+            (SQL, True se já verificado)
+        """
+        while True:
+            sql_query, checked = self._generate_sql(nl_request, schemas, relationships, self.router.client(route),
+                                                    examples)
+            if checked or route.tier >= self.router.last_tier:
+                return sql_query, checked
+            # Candidatos especulativos já foram verificados: nenhum passou
+            error = "nenhum candidato aprovado" if self.speculative else self._check_candidate(sql_query)
+            if error is None:
+                return sql_query, True
+            self.router.escalate(route, error)
+
+    def _validate_and_repair(self, sql_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                             max_attempts: int, llm: Optional[OllamaClient] = None) -> Tuple[str, int]:
+        """
+        Valida a consulta sem executá-la e, se rejeitada, pede correções ao modelo
+        (`llm`, padrão: o modelo principal)
+
+        Returns:
+            (consulta válida, número de correções usadas)
+
+        Raises:
+            ValueError: Se a consulta continuar inválida após `max_attempts` correções
+        """
+        attempt = 0
+        while True:
+            error = check_sql(sql_query)
+            if error is None:
+                error = self.db.validate_query(sql_query)
+            if error is None:
+                return sql_query, attempt
+            if attempt >= max_attempts:
+                raise ValueError(f"Consulta SQL inválida após {attempt} correção(ões): {error}")
+            attempt += 1
+            logger.info(f"Consulta rejeitada ({error}). Correção {attempt}/{max_attempts}.")
+            sql_query = (llm or self.llm).correct_sql_multi_table(sql_query, error, schemas, relationships)
+
+    def _check_candidate(self, sql_query: str) -> Optional[str]:
+        """
+        Verificação de um candidato da geração especulativa: sintaxe, validação
+        no banco e, com o guarda ativo, o plano estimado (reaproveitado na execução)
+        """
+        error = check_sql(sql_query)
+        if error is None:
+            error = self.db.validate_query(sql_query)
+        if error is None and self.guard:
+            try:
+                self.guard.check(sql_query)
+            except QueryRejectedError as e:
+                return str(e)
+        return error
+
+    def _prune_schemas(self, nl_request: str, schemas: Dict[str, List[Dict]],
+                       relationships: List[Dict]) -> Dict[str, List[Dict]]:
+        """Mantém apenas as colunas relevantes para a pergunta e registra o ganho no prompt"""
+        pruned = self.pruner.prune(nl_request, schemas, relationships)
+        if logger.isEnabledFor(logging.DEBUG):
+            # Estimativa só para o log: evita montar os dois prompts quando DEBUG está desligado
+            before = estimate_tokens(PromptTemplates.multi_table_prompt(nl_request, schemas, relationships))
+            after = estimate_tokens(PromptTemplates.multi_table_prompt(nl_request, pruned, relationships))
+            logger.debug(f"Poda de colunas: {sum(map(len, schemas.values()))} -> {sum(map(len, pruned.values()))} "
+                         f"colunas, prompt ~{before} -> ~{after} tokens")
+        return pruned
+
+    def _discard_cached(self, sql_query: str):
+        """Remove do cache de geração e dos exemplos um SQL que falhou na execução"""
+        if self.generation_cache and sql_query:
+            self.generation_cache.discard_sql(sql_query)
+        if self.examples and sql_query:
+            self.examples.discard_sql(sql_query)
+
+
+def _execution_status(error: Exception) -> str:
+    """Desfecho registrado pelo guarda de custo para uma execução com erro"""
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, InterruptedError):
+        return "cancelled"
+    return "error"
+
+
+def _route_outcome(error: BaseException) -> Optional[bool]:
+    """Desfecho registrado no roteador: None se o erro não depende do modelo (timeout, cancelamento, Ctrl+C)"""
+    if isinstance(error, (TimeoutError, InterruptedError)) or not isinstance(error, Exception):
+        return None
+    return False
+
+
+def _request_key(nl_request: str, table_names: List[str], result_format: str) -> tuple:
+    """Chave de agrupamento: pergunta normalizada, tabelas ordenadas e formato do resultado"""
+    return (normalize_question(nl_request), tuple(sorted({t.strip().lower() for t in table_names})), result_format)
 
 
+def _copy_columnar(result):
+    """Cópia do resultado colunar entregue a cada solicitação agrupada"""
+    if isinstance(result, dict):
+        return {column: values.copy() for column, values in result.items()}
+    return result.copy()
@@ -0,0 +1,134 @@
+import datetime
+import decimal
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+RESULT_FORMATS = ("records", "dataframe", "numpy")
+
+
+def unique_column_names(description: Sequence[Sequence[Any]]) -> List[str]:
+    """
+    Nomes das colunas de cursor.description sem repetição
+
+    Consultas como `SELECT a.id, b.id` retornam nomes repetidos, que se
+    sobrescreveriam em dicionários; as repetições recebem um sufixo (id, id_1).
+    """
+    names: List[str] = []
+    seen = set()
+    for column in description:
+        name = column[0] or "coluna"
+        candidate, suffix = name, 0
+        while candidate.lower() in seen:
+            suffix += 1
+            candidate = f"{name}_{suffix}"
+        seen.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+def _column_kind(type_code: Any) -> str:
+    """Mapeia o tipo Python informado em cursor.description para um tipo de coluna"""
+    if type_code is bool:
+        return "bool"
+    if type_code is int:
+        return "int"
+    if type_code is float:
+        return "float"
+    if type_code is decimal.Decimal:
+        # numeric/decimal/money: mantém Decimal (object) para não perder precisão em float64
+        return "decimal"
+    if type_code in (datetime.datetime, datetime.date):
+        return "datetime"
+    return "object"
+
+
+class _ColumnBuilder:
+    """Acumula os valores de uma coluna em arrays tipados, lote a lote"""
+
+    _DTYPES = {"bool": np.bool_, "int": np.int64, "float": np.float64,
+               "datetime": "datetime64[us]", "decimal": object, "object": object}
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.dtype = self._DTYPES[kind]
+        self._chunks: List[np.ndarray] = []
+        self._masks: List[np.ndarray] = []
+        self._has_nulls = False
+
+    def append(self, values: Sequence[Any]):
+        n = len(values)
+        if self.kind in ("bool", "int"):
+            mask = np.fromiter((v is None for v in values), dtype=np.bool_, count=n)
+            if mask.any():
+                self._has_nulls = True
+                values = [0 if v is None else v for v in values]
+            self._chunks.append(np.fromiter(values, dtype=self.dtype, count=n))
+            self._masks.append(mask)
+        elif self.kind == "float":
+            self._chunks.append(np.fromiter(
+                (np.nan if v is None else float(v) for v in values), dtype=np.float64, count=n))
+        elif self.kind == "datetime":
+            self._chunks.append(np.array(values, dtype=self.dtype))
+        else:
+            chunk = np.empty(n, dtype=object)
+            chunk[:] = values
+            self._chunks.append(chunk)
+
+    @staticmethod
+    def _concat(parts: List[np.ndarray], dtype) -> np.ndarray:
+        if not parts:
+            return np.empty(0, dtype=dtype)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def to_numpy(self) -> np.ndarray:
+        """Array NumPy da coluna (inteiros/booleanos com nulos viram MaskedArray)"""
+        values = self._concat(self._chunks, self.dtype)
+        if self._has_nulls:
+            return np.ma.MaskedArray(values, mask=self._concat(self._masks, np.bool_))
+        return values
+
+    def to_pandas(self):
+        """Array pandas da coluna, usando tipos anuláveis para inteiros/booleanos com nulos"""
+        values = self.to_numpy()
+        if isinstance(values, np.ma.MaskedArray):
+            if self.kind == "int":
+                return pd.arrays.IntegerArray(values.data, values.mask)
+            return pd.arrays.BooleanArray(values.data, values.mask)
+        return values
+
+
+class ColumnarResult:
+    """Resultado de consulta armazenado por coluna, preenchido a partir de lotes de fetchmany"""
+
+    def __init__(self, description: Sequence[Sequence[Any]]):
+        self.columns = unique_column_names(description)
+        self._builders = [_ColumnBuilder(name, _column_kind(col[1])) for name, col in zip(self.columns, description)]
+        self.row_count = 0
+
+    def append_batch(self, rows: Sequence[Sequence[Any]]):
+        """Transpõe um lote de linhas e anexa cada coluna ao seu array"""
+        if not rows:
+            return
+        for builder, values in zip(self._builders, zip(*rows)):
+            builder.append(values)
+        self.row_count += len(rows)
+
+    def to_numpy(self) -> Dict[str, np.ndarray]:
+        """Dicionário coluna -> array NumPy"""
+        return {b.name: b.to_numpy() for b in self._builders}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """DataFrame montado a partir dos arrays das colunas, sem cópia adicional"""
+        return pd.DataFrame({b.name: b.to_pandas() for b in self._builders}, copy=False)
+
+
+def empty_result(result_format: str):
+    """Resultado vazio no formato pedido"""
+    if result_format == "dataframe":
+        return pd.DataFrame()
+    if result_format == "numpy":
+        return {}
+    return []
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+
+class ConnectionPool:
+    """
+    Pool limitado e thread-safe de conexões de banco.
+
+    - Empréstimo/devolução com espera limitada quando o pool está cheio
+    - Verificação de saúde (SELECT 1) de conexões ociosas há mais de
+      `health_check_after` segundos antes de entregá-las
+    - Reconexão automática de conexões quebradas
+    - Descarte de conexões ociosas há mais de `max_idle` segundos
+    """
+
+    def __init__(self, connect: Callable[[], Any], max_size: int = 5, min_idle: int = 0,
+                 acquire_timeout: float = 30.0, max_idle: float = 300.0,
+                 health_check_after: float = 30.0):
+        """
+        Args:
+            connect: Função que abre uma nova conexão
+            max_size: Número máximo de conexões abertas
+            min_idle: Conexões ociosas mantidas mesmo após `max_idle`
+            acquire_timeout: Tempo máximo de espera por uma conexão livre
+            max_idle: Tempo (s) após o qual conexões ociosas são fechadas
+            health_check_after: Ociosidade (s) a partir da qual a conexão é testada no empréstimo
+        """
+        self._connect = connect
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self.acquire_timeout = acquire_timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conexão, instante da devolução)
+        self._size = 0
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "health_checks": 0,
+            "reconnects": 0,
+            "evicted": 0,
+            "discarded": 0,
+        }
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Empresta uma conexão saudável do pool, abrindo uma nova se houver espaço"""
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            conn, idle_since, create = None, None, False
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError("Pool de conexões fechado")
+                expired = self._evict_idle_locked()
+                if self._idle:
+                    conn, idle_since = self._idle.pop()
+                elif self._size < self.max_size:
+                    self._size += 1
+                    create = True
+                else:
+                    self._stats["waits"] += 1
+                    wait_start = time.monotonic()
+                    while not self._idle and self._size >= self.max_size and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._stats["timeouts"] += 1
+                            raise TimeoutError(
+                                f"Nenhuma conexão disponível após {timeout:.1f}s "
+                                f"(pool com {self.max_size} conexões)"
+                            )
+                        self._cond.wait(remaining)
+                    self._stats["wait_time"] += time.monotonic() - wait_start
+
+            for old in expired:
+                self._close_quietly(old)
+            if conn is None and not create:
+                continue
+            if create:
+                return self._open_new()
+
+            if time.monotonic() - idle_since >= self.health_check_after and not self._is_healthy(conn):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._stats["reconnects"] += 1
+                # A vaga da conexão quebrada é reaproveitada pela nova
+                return self._open_new()
+
+            with self._cond:
+                self._stats["checkouts"] += 1
+            return conn
+
+    def release(self, conn: Any, discard: bool = False):
+        """Devolve a conexão ao pool (ou a fecha, se `discard`)"""
+        with self._cond:
+            if discard or self._closed:
+                self._size -= 1
+                if discard:
+                    self._stats["discarded"] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+                conn = None
+            self._cond.notify()
+        if conn is not None:
+            self._close_quietly(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager que empresta e devolve uma conexão
+
+        Se ocorrer erro durante o uso, a conexão é testada e descartada caso
+        esteja quebrada, para que o próximo empréstimo abra uma nova.
+        """
+        conn = self.acquire(timeout)
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = not self._is_healthy(conn)
+            if not broken:
+                self._rollback_quietly(conn)
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas do pool para dimensionamento sob carga"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "max_size": self.max_size,
+            })
+        return stats
+
+    def close(self):
+        """Fecha todas as conexões ociosas e impede novos empréstimos"""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def _open_new(self) -> Any:
+        """Abre uma nova conexão para uma vaga já reservada em `_size`"""
+        try:
+            conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["created"] += 1
+            self._stats["checkouts"] += 1
+        return conn
+
+    def _evict_idle_locked(self) -> list:
+        """Remove do pool as conexões ociosas expiradas e as retorna para fechamento"""
+        now = time.monotonic()
+        expired = []
+        # As conexões mais antigas ficam no início da fila
+        while len(self._idle) > self.min_idle and now - self._idle[0][1] >= self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats["evicted"] += 1
+            expired.append(conn)
+        return expired
+
+    def _is_healthy(self, conn: Any) -> bool:
+        with self._cond:
+            self._stats["health_checks"] += 1
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _rollback_quietly(conn: Any):
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _close_quietly(conn: Any):
+        try:
+            conn.close()
+        except Exception:
+            pass
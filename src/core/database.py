@@ -1,12 +1,56 @@
-import pyodbc
-from typing import List, Dict, Any
+import sys
+import threading
+import time
+from contextlib import contextmanager, closing
+from typing import List, Dict, Any, Callable, Optional, Iterator
 from src.config.settings import settings
+from src.core.columnar import ColumnarResult, RESULT_FORMATS, empty_result, unique_column_names
+from src.core.connection_pool import ConnectionPool
+from src.core.schema_catalog import SchemaCatalog
+from src.core.relationship_inference import RelationshipInferer
+from src.core.result_cache import ResultCache
+from src.utils.logger import get_logger
+from src.utils.tracing import tracer
+
+logger = get_logger(__name__)
+
+
+class _DriverUnavailable(Exception):
+    """Nunca lançada: substitui pyodbc.Error quando o pyodbc não está instalado"""
+
+
+def _pyodbc():
+    """
+    Importa o pyodbc sob demanda
+
+    O pyodbc carrega a biblioteca ODBC nativa (libodbc) ao ser importado; com
+    a importação adiada, o módulo pode ser usado sem ela (ex: benchmark
+    offline sobre SQLite e testes).
+    """
+    import pyodbc
+    return pyodbc
+
+
+def _driver_error() -> type:
+    """pyodbc.Error, ou uma exceção que nunca ocorre se o pyodbc não puder ser importado"""
+    try:
+        return _pyodbc().Error
+    except ImportError:
+        return _DriverUnavailable
+
 
 class DatabaseManager:
     def __init__(self, config: Dict):
         self.config = config
-        self.conn = None
-        self.cursor = None
+        self.pool: Optional[ConnectionPool] = None
+        self._running_lock = threading.Lock()
+        self._running = set()      # cursors executando consultas geradas (canceláveis)
+        self.catalog = SchemaCatalog(self._fetch_all, config['database'])
+        self.inferred_relationships = RelationshipInferer(self.catalog, self._fetch_all, config['database'])
+        self.result_cache = ResultCache(self._fetch_all) if settings.RESULT_CACHE_ENABLED else None
+        if self.result_cache:
+            # Alterações de esquema invalidam os resultados das tabelas afetadas
+            self.catalog.add_listener(self.result_cache.invalidate_tables)
 
     def _build_connection_string(self) -> str:
         return (
@@ -18,93 +62,361 @@ class DatabaseManager:
             f"TrustServerCertificate=yes;"
         )
         
+    def _open_connection(self):
+        return _pyodbc().connect(self._build_connection_string())
+
     def connect(self) -> bool:
-        """Estabelece conexão com o SQL Server"""
+        """Cria o pool de conexões e valida o acesso ao SQL Server"""
         try:
-            self.conn = pyodbc.connect(self._build_connection_string())
-            self.cursor = self.conn.cursor()
-            print("Conexão estabelecida com sucesso!")
+            self.pool = ConnectionPool(
+                self._open_connection,
+                max_size=settings.DB_POOL_SIZE,
+                acquire_timeout=settings.DB_POOL_TIMEOUT,
+                max_idle=settings.DB_POOL_MAX_IDLE,
+                health_check_after=settings.DB_POOL_HEALTH_CHECK,
+            )
+            # Abre a primeira conexão para validar as credenciais
+            self.pool.release(self.pool.acquire())
+            logger.info(f"Conexão estabelecida com sucesso! (pool de até {self.pool.max_size} conexões)")
             return True  # Retorna True se conectado com sucesso
         except Exception as e:
-            print(f"Erro ao conectar ao SQL Server: {e}")
-            self.conn = None
-            self.cursor = None
+            logger.error(f"Erro ao conectar ao SQL Server: {e}")
+            if self.pool:
+                self.pool.close()
+            self.pool = None
             return False  # Retorna False se falhar
-        
-    def get_table_schema(self, table_name: str) -> List[Dict]:
-        """Obtém esquema da tabela"""
-        print(f"Obtendo esquema da tabela: {table_name}")
 
-        query = f"""
-        SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH
-        FROM INFORMATION_SCHEMA.COLUMNS
-        WHERE TABLE_NAME = '{table_name}'
+    @contextmanager
+    def cursor(self, timeout: int = 0):
         """
-        self.cursor.execute(query)
-        columns = self.cursor.fetchall()
-        
-        schema = []
-        for col in columns:
-            schema.append({
-                'name': col.COLUMN_NAME,
-                'type': col.DATA_TYPE,
-                'max_length': col.CHARACTER_MAXIMUM_LENGTH
-            })
-        return schema
+        Empresta uma conexão do pool e fornece um cursor exclusivo para a requisição
+
+        Args:
+            timeout: Tempo máximo (s) de cada instrução executada no cursor (0 = sem limite)
+        """
+        if self.pool is None:
+            raise RuntimeError("Banco de dados não conectado. Chame connect() primeiro.")
+        with self.pool.connection() as conn:
+            # O timeout vale por conexão; é redefinido a cada empréstimo
+            conn.timeout = timeout
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _query_cursor(self, timeout: Optional[int]):
+        """Cursor para consultas geradas: com timeout, cancelável por cancel_running()"""
+        timeout = settings.DB_QUERY_TIMEOUT if timeout is None else timeout
+        with self.cursor(timeout) as cursor:
+            with self._running_lock:
+                self._running.add(cursor)
+            try:
+                yield cursor
+            except _driver_error() as e:
+                translated = _translate_error(e, timeout)
+                if translated is e:
+                    raise
+                raise translated from e
+            finally:
+                with self._running_lock:
+                    self._running.discard(cursor)
+
+    def cancel_running(self) -> int:
+        """
+        Cancela no servidor as consultas geradas em execução (ex: Ctrl+C no REPL)
+
+        Returns:
+            Número de instruções canceladas
+        """
+        with self._running_lock:
+            cursors = list(self._running)
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception as e:
+                logger.warning(f"Erro ao cancelar consulta: {e}")
+        return len(cursors)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Estatísticas do pool (esperas, empréstimos, reconexões)"""
+        return self.pool.stats() if self.pool else {}
+
+    def _fetch_all(self, query: str, params: tuple = (), timeout: int = 0) -> List[Any]:
+        """Executa uma consulta de metadados parametrizada e retorna todas as linhas"""
+        with self.cursor(timeout) as cursor:
+            cursor.execute(query, *params)
+            return cursor.fetchall()
+
+    def get_table_schema(self, table_name: str) -> List[Dict]:
+        """Obtém esquema da tabela (servido pelo catálogo em memória)"""
+        return self.catalog.get_table_schema(table_name)
     
     def get_multiple_table_schemas(self, table_names: List[str]) -> Dict[str, List[Dict]]:
         """Obtém o esquema de múltiplas tabelas"""
-        schemas = {}
-        for table_name in table_names:
-            schemas[table_name] = self.get_table_schema(table_name)
-        return schemas
+        return self.catalog.get_multiple_table_schemas(table_names)
 
     def get_foreign_keys(self, table_name: str) -> List[Dict]:
-        """Obtém chaves estrangeiras para uma tabela"""
-        query = f"""
-        SELECT 
-            OBJECT_NAME(f.parent_object_id) AS source_table,
-            COL_NAME(fc.parent_object_id, fc.parent_column_id) AS source_column,
-            OBJECT_NAME(f.referenced_object_id) AS target_table,
-            COL_NAME(fc.referenced_object_id, fc.referenced_column_id) AS target_column
-        FROM 
-            sys.foreign_keys AS f
-        INNER JOIN 
-            sys.foreign_key_columns AS fc 
-        ON 
-            f.object_id = fc.constraint_object_id
-        WHERE 
-            OBJECT_NAME(f.parent_object_id) = '{table_name}'
-            OR OBJECT_NAME(f.referenced_object_id) = '{table_name}'
-        """
-        self.cursor.execute(query)
-        return [dict(zip(['source_table', 'source_column', 'target_table', 'target_column'], row)) 
-                for row in self.cursor.fetchall()]
+        """Obtém chaves estrangeiras para uma tabela (servidas pelo catálogo em memória)"""
+        return self.catalog.get_foreign_keys(table_name)
         
-    def execute_query(self, query: str) -> List[Dict[str, Any]]:
-        """Executa consulta SQL"""
-        print(f"Executando consulta: {query}")
+    def iter_query(self, query: str, batch_size: Optional[int] = None, max_rows: Optional[int] = None,
+                   max_bytes: Optional[int] = None, timeout: Optional[int] = None,
+                   before_execute: Optional[Callable[[], Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Executa consulta SQL e produz as linhas em lotes de fetchmany
+
+        A conexão fica emprestada do pool enquanto o gerador estiver ativo.
+        A leitura para ao atingir o limite de linhas ou o orçamento de bytes.
+
+        Args:
+            query: Consulta SQL
+            batch_size: Linhas por fetchmany (padrão: settings.DB_FETCH_BATCH_SIZE)
+            max_rows: Limite de linhas, 0 = sem limite (padrão: settings.DB_MAX_ROWS)
+            max_bytes: Limite estimado de bytes, 0 = sem limite (padrão: settings.DB_MAX_RESULT_BYTES)
+            timeout: Tempo máximo (s) da consulta, 0 = sem limite (padrão: settings.DB_QUERY_TIMEOUT)
+            before_execute: Chamado antes de executar, apenas se o resultado não vier do
+                cache de resultados (ex: guarda de custo); suas exceções interrompem a consulta
+
+        Yields:
+            Dicionário coluna -> valor para cada linha
+
+        Raises:
+            TimeoutError: Se a consulta exceder o tempo limite
+            InterruptedError: Se a consulta for cancelada por cancel_running()
+        """
+        logger.debug("Executando consulta: %s", query)
+        with closing(self._iter_result(query, batch_size, max_rows, max_bytes, timeout, before_execute)) as batches:
+            description = next(batches)
+            if description is None:
+                return
+            columns = unique_column_names(description)
+            for rows in batches:
+                for row in rows:
+                    yield dict(zip(columns, row))
+
+    def query_columnar(self, query: str, as_numpy: bool = False, batch_size: Optional[int] = None,
+                       max_rows: Optional[int] = None, max_bytes: Optional[int] = None,
+                       timeout: Optional[int] = None, before_execute: Optional[Callable[[], Any]] = None):
+        """
+        Executa consulta SQL e preenche arrays tipados por coluna a partir dos lotes de fetchmany
+
+        Args:
+            query: Consulta SQL
+            as_numpy: Se True, retorna dicionário coluna -> array NumPy em vez de DataFrame
+            batch_size, max_rows, max_bytes, timeout, before_execute: Como em iter_query
+
+        Returns:
+            pandas.DataFrame (ou dicionário de arrays NumPy)
+        """
+        logger.debug("Executando consulta (colunar): %s", query)
+        with closing(self._iter_result(query, batch_size, max_rows, max_bytes, timeout, before_execute)) as batches:
+            description = next(batches)
+            if description is None:
+                return empty_result("numpy" if as_numpy else "dataframe")
+            result = ColumnarResult(description)
+            for rows in batches:
+                result.append_batch(rows)
+        return result.to_numpy() if as_numpy else result.to_dataframe()
+
+    def _iter_result(self, query: str, batch_size: Optional[int], max_rows: Optional[int],
+                     max_bytes: Optional[int], timeout: Optional[int],
+                     before_execute: Optional[Callable[[], Any]] = None) -> Iterator[Any]:
+        """
+        Produz primeiro o cursor.description (None se a instrução não retorna linhas)
+        e depois os lotes de linhas, servidos do cache de resultados quando possível
+
+        Resultados lidos até o fim (não truncados) são guardados no cache.
+        """
+        cache = self.result_cache
+        with tracer.detached_span("db.query") as span:
+            cached = cache.get(query) if cache else None
+            if cached is not None:
+                logger.info("Resultado obtido do cache de resultados.")
+                description, rows = cached
+                max_rows = settings.DB_MAX_ROWS if max_rows is None else max_rows
+                rows = rows[:max_rows] if max_rows else rows
+                span.set(cached=True, rows=len(rows))
+                yield description
+                yield rows
+                return
+
+            if before_execute is not None:
+                before_execute()
+            # Versões das tabelas lidas antes da execução: uma alteração concorrente invalida a entrada
+            versions = cache.table_versions(cache.tables(query)) if cache else None
+            status: Optional[Dict[str, Any]] = {} if cache or tracer.enabled else None
+            start = time.perf_counter()
+            try:
+                with self._query_cursor(timeout) as cursor:
+                    cursor.execute(query)
+                    execute_ms = (time.perf_counter() - start) * 1000
+                    span.set(cached=False, execute_ms=round(execute_ms, 3))
+                    tracer.observe("db.execute_ms", execute_ms)
+                    description = cursor.description
+                    yield description
+                    if description is None:
+                        return
+                    collected: List[tuple] = []
+                    for rows in self._iter_batches(cursor, batch_size, max_rows, max_bytes, status):
+                        if cache:
+                            collected.extend(tuple(row) for row in rows)
+                        yield rows
+                    if cache and status["exhausted"]:
+                        cache.put(query, description, collected, status["bytes"], versions)
+            finally:
+                if status:
+                    # fetch_ms conta só o tempo em fetchmany; a duração do span inclui o consumidor
+                    span.set(rows=status["rows"], bytes=status["bytes"], fetch_ms=round(status["fetch_s"] * 1000, 3))
+                    tracer.observe("db.fetch_ms", status["fetch_s"] * 1000)
+
+    def _iter_batches(self, cursor, batch_size: Optional[int], max_rows: Optional[int],
+                      max_bytes: Optional[int], status: Optional[Dict[str, Any]] = None) -> Iterator[List[Any]]:
+        """
+        Lê o resultado em lotes, parando nos limites de linhas/bytes e cancelando o restante
+
+        Se `status` for informado, recebe "exhausted" (resultado lido até o fim), "rows",
+        "bytes" estimados e "fetch_s" (tempo gasto em fetchmany).
+        """
+        batch_size = batch_size or settings.DB_FETCH_BATCH_SIZE
+        max_rows = settings.DB_MAX_ROWS if max_rows is None else max_rows
+        max_bytes = settings.DB_MAX_RESULT_BYTES if max_bytes is None else max_bytes
+
+        measure = bool(max_bytes) or status is not None
+        row_count = 0
+        byte_count = 0
+        fetch_time = 0.0
+        exhausted = False
+        try:
+            while True:
+                size = batch_size if not max_rows else min(batch_size, max_rows - row_count)
+                start = time.perf_counter()
+                rows = cursor.fetchmany(size)
+                fetch_time += time.perf_counter() - start
+                if not rows:
+                    exhausted = True
+                    return
+                row_count += len(rows)
+                if measure:
+                    byte_count += sum(_estimate_row_bytes(row) for row in rows)
+                yield rows
+                if max_rows and row_count >= max_rows:
+                    logger.info(f"Resultado truncado em {row_count} linhas (limite DB_MAX_ROWS).")
+                    return
+                if max_bytes and byte_count >= max_bytes:
+                    logger.info(f"Resultado truncado em {row_count} linhas "
+                                f"(~{byte_count // 1024} KB, limite DB_MAX_RESULT_BYTES).")
+                    return
+        finally:
+            if status is not None:
+                status.update(exhausted=exhausted, rows=row_count, bytes=byte_count, fetch_s=fetch_time)
+            if not exhausted:
+                # Interrompe o envio das linhas restantes pelo servidor
+                try:
+                    cursor.cancel()
+                except Exception:
+                    pass
+
+    def validate_query(self, query: str) -> Optional[str]:
+        """
+        Valida a consulta no servidor sem executá-la (sp_describe_first_result_set compila
+        a instrução e resolve tabelas e colunas)
+
+        Returns:
+            None se a consulta é válida, ou a mensagem de erro do SQL Server
+        """
         try:
-            self.cursor.execute(query)
-            rows = self.cursor.fetchall()
-            
-            # Converter para lista de dicionários
-            columns = [column[0] for column in self.cursor.description]
-            results = []
-            for row in rows:
-                results.append(dict(zip(columns, row)))
-            
-            return results
+            with self.cursor() as cursor:
+                cursor.execute("EXEC sp_describe_first_result_set @tsql = ?", query)
+                cursor.fetchall()
+            return None
+        except _driver_error() as e:
+            return _error_message(e)
+
+    def estimated_plan(self, query: str) -> str:
+        """
+        Obtém o plano estimado (SHOWPLAN_XML) da consulta sem executá-la
+
+        Returns:
+            XML do plano de execução
+        """
+        if self.pool is None:
+            raise RuntimeError("Banco de dados não conectado. Chame connect() primeiro.")
+        conn = self.pool.acquire()
+        # Se o SHOWPLAN não for desligado, a conexão é descartada em vez de voltar ao pool
+        discard = True
+        try:
+            conn.timeout = settings.DB_QUERY_TIMEOUT
+            cursor = conn.cursor()
+            try:
+                # SET SHOWPLAN_XML precisa estar sozinho no lote
+                cursor.execute("SET SHOWPLAN_XML ON")
+                try:
+                    cursor.execute(query)
+                    row = cursor.fetchone()
+                    while cursor.nextset():
+                        pass
+                finally:
+                    cursor.execute("SET SHOWPLAN_XML OFF")
+                    discard = False
+            finally:
+                cursor.close()
+        finally:
+            self.pool.release(conn, discard=discard)
+        if not row:
+            raise ValueError("O SQL Server não retornou o plano estimado")
+        return row[0]
+
+    def execute_query(self, query: str, result_format: str = "records"):
+        """
+        Executa consulta SQL (respeitando os limites de iter_query)
+
+        Args:
+            query: Consulta SQL
+            result_format: "records" (lista de dicionários), "dataframe" ou "numpy"
+
+        Returns:
+            Resultado no formato pedido (vazio em caso de erro)
+        """
+        if result_format not in RESULT_FORMATS:
+            raise ValueError(f"Formato de resultado inválido: {result_format}")
+        try:
+            if result_format == "records":
+                return list(self.iter_query(query))
+            return self.query_columnar(query, as_numpy=(result_format == "numpy"))
         except Exception as e:
-            print(f"Erro ao executar consulta: {e}")
-            return []
+            logger.error(f"Erro ao executar consulta: {e}")
+            return empty_result(result_format)
         
     def close(self):
-        """Fecha conexão"""
-        self.cursor.close()
-        self.conn.close()
-        print("Conexão fechada.")
+        """Fecha todas as conexões do pool"""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
+        logger.info("Conexão fechada.")
         
     def handle_error(self, error: Exception):
         """Tratamento centralizado de erros"""
-        # Implementação personalizada
\ No newline at end of file
+        # Implementação personalizada
+
+
+def _estimate_row_bytes(row) -> int:
+    """Estimativa barata do tamanho em memória de uma linha"""
+    return sum(sys.getsizeof(value) for value in row)
+
+
+def _translate_error(error: Exception, timeout: int) -> Exception:
+    """Converte timeout (HYT00) e cancelamento (HY008) do driver em exceções próprias"""
+    state = error.args[0] if error.args else ""
+    if state == "HYT00":
+        return TimeoutError(f"Consulta excedeu o tempo limite de {timeout}s (DB_QUERY_TIMEOUT)")
+    if state == "HY008":
+        return InterruptedError("Consulta cancelada")
+    return error
+
+
+def _error_message(error: Exception) -> str:
+    """Mensagem do SQL Server sem o prefixo do driver ODBC"""
+    message = str(error.args[1]) if len(error.args) > 1 else str(error)
+    return message.rsplit("]", 1)[-1].strip()
@@ -0,0 +1,152 @@
+import threading
+from collections import deque
+from typing import List, Dict, Tuple, Optional
+from src.config.settings import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class JoinGraph:
+    """
+    Grafo de junções construído uma única vez a partir das chaves estrangeiras do catálogo.
+
+    As tabelas são vértices e cada par de tabelas ligado por chave estrangeira
+    é uma aresta. Para um conjunto de tabelas pedidas, `connect` calcula o
+    menor conjunto de junções que as liga (heurística de Takahashi-Matsuyama
+    para árvore de Steiner: a árvore cresce sempre pelo caminho mais curto até
+    a tabela pedida mais próxima), incluindo tabelas-ponte não citadas. Tabelas
+    sem caminho até a árvore atual começam uma nova árvore (floresta de
+    Steiner), de modo que uma tabela isolada não descarta as demais junções.
+    Caminhos com mais de `max_hops` junções não são usados: em esquemas densos,
+    duas tabelas sem relação direta sempre se ligam por uma cadeia longa de
+    tabelas-ponte que só confundiria o modelo.
+    """
+
+    def __init__(self, catalog, inferred=None, max_hops: Optional[int] = None):
+        """
+        Args:
+            catalog: SchemaCatalog com as chaves estrangeiras declaradas
+            inferred: RelationshipInferer opcional com relacionamentos inferidos
+            max_hops: Junções máximas por caminho, 0 = sem limite (padrão: settings.JOIN_MAX_HOPS)
+        """
+        self.catalog = catalog
+        self.inferred = inferred
+        self.max_hops = max_hops if max_hops is not None else settings.JOIN_MAX_HOPS
+        self._lock = threading.Lock()
+        self._built_version = None
+        self._names: Dict[str, str] = {}                       # minúsculas -> nome no catálogo
+        self._adjacency: Dict[str, List[str]] = {}
+        self._edges: Dict[Tuple[str, str], List[Dict]] = {}    # par ordenado -> relacionamentos
+
+    def _relationships(self) -> List[Dict]:
+        """Relacionamentos usados como arestas: chaves declaradas e, depois, as inferidas"""
+        relationships = self.catalog.all_foreign_keys()
+        if self.inferred:
+            relationships.extend(self.inferred.relationships())
+        return relationships
+
+    def _version(self) -> tuple:
+        return (self.catalog.version, self.inferred.version if self.inferred else 0)
+
+    def _ensure_built(self):
+        self.catalog.ensure_fresh()
+        if self.inferred:
+            self.inferred.ensure_fresh()
+        if self._built_version == self._version():
+            return
+        with self._lock:
+            if self._built_version != self._version():
+                self._build()
+
+    def _build(self):
+        version = self._version()
+        names: Dict[str, str] = {}
+        adjacency: Dict[str, set] = {}
+        edges: Dict[Tuple[str, str], List[Dict]] = {}
+
+        for fk in self._relationships():
+            rel = {k: fk[k] for k in ("source_table", "source_column", "target_table", "target_column")}
+            a, b = rel["source_table"].lower(), rel["target_table"].lower()
+            names.setdefault(a, rel["source_table"])
+            names.setdefault(b, rel["target_table"])
+            if a == b:
+                continue
+            pair = (a, b) if a < b else (b, a)
+            if rel not in edges.setdefault(pair, []):
+                edges[pair].append(rel)
+            adjacency.setdefault(a, set()).add(b)
+            adjacency.setdefault(b, set()).add(a)
+
+        self._names = names
+        # Vizinhos ordenados para que o resultado seja determinístico
+        self._adjacency = {node: sorted(neighbors) for node, neighbors in adjacency.items()}
+        self._edges = edges
+        self._built_version = version
+
+    def _shortest_path(self, sources: set, targets: set) -> Optional[List[str]]:
+        """
+        BFS multi-origem: caminho mais curto da árvore atual até o alvo mais
+        próximo, com no máximo `max_hops` junções (None se não houver)
+        """
+        parents = {node: None for node in sources}
+        depth = {node: 0 for node in sources}
+        queue = deque(sorted(sources))
+        while queue:
+            node = queue.popleft()
+            if node in targets:
+                path = [node]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            if self.max_hops and depth[node] >= self.max_hops:
+                continue
+            for neighbor in self._adjacency.get(node, ()):
+                if neighbor not in parents:
+                    parents[neighbor] = node
+                    depth[neighbor] = depth[node] + 1
+                    queue.append(neighbor)
+        return None
+
+    def connect(self, table_names: List[str]) -> Tuple[List[str], List[Dict]]:
+        """
+        Calcula as junções mínimas que ligam as tabelas pedidas
+
+        Args:
+            table_names: Tabelas citadas na pergunta
+
+        Returns:
+            (tabelas-ponte adicionadas, relacionamentos a usar nas junções)
+        """
+        self._ensure_built()
+        requested = []
+        for name in table_names:
+            node = name.strip().strip("[]").rpartition(".")[2].strip("[]").lower()
+            if node not in requested:
+                requested.append(node)
+        if len(requested) < 2:
+            return [], []
+
+        tree = {requested[0]}
+        forest = set(tree)
+        remaining = set(requested[1:])
+        pairs: List[Tuple[str, str]] = []
+        while remaining:
+            path = self._shortest_path(tree, remaining)
+            if path is None:
+                # Nenhuma tabela restante é alcançável: começa outra árvore pela próxima pedida
+                logger.info(f"Sem caminho de junção conhecido (até {self.max_hops or '∞'} junções) entre "
+                            f"{sorted(tree & set(requested))} e {sorted(remaining)}")
+                tree = {next(node for node in requested if node in remaining)}
+                remaining -= tree
+                forest |= tree
+                continue
+            for a, b in zip(path, path[1:]):
+                pairs.append((a, b) if a < b else (b, a))
+            tree.update(path)
+            forest.update(path)
+            remaining.discard(path[-1])
+
+        bridges = [self._names.get(node, node) for node in sorted(forest - set(requested))]
+        relationships = [rel for pair in pairs for rel in self._edges[pair]]
+        return bridges, relationships
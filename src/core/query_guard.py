@@ -0,0 +1,193 @@
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, OrderedDict
+from typing import Dict, Any, Optional, Tuple
+from src.config.settings import settings
+from src.utils.sql_utils import inject_top, add_query_option
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_SHOWPLAN_NS = "{http://schemas.microsoft.com/sqlserver/2004/07/showplan}"
+
+
+class QueryRejectedError(ValueError):
+    """Consulta rejeitada pelo guarda de custo antes da execução"""
+
+
+def parse_plan(plan_xml: str) -> Tuple[float, float]:
+    """
+    Extrai custo e linhas estimados do plano SHOWPLAN_XML
+
+    Returns:
+        (StatementSubTreeCost, StatementEstRows) somados sobre as instruções do lote
+    """
+    root = ET.fromstring(plan_xml)
+    cost = rows = 0.0
+    for stmt in root.iter(f"{_SHOWPLAN_NS}StmtSimple"):
+        cost += float(stmt.get("StatementSubTreeCost", 0) or 0)
+        rows += float(stmt.get("StatementEstRows", 0) or 0)
+    return cost, rows
+
+
+class QueryGuard:
+    """
+    Etapa de proteção entre a validação e a execução de SQL gerado pelo LLM.
+
+    A consulta é reescrita com TOP (n) quando não tem limite de linhas e com
+    OPTION (MAXDOP n); em seguida o plano estimado (SHOWPLAN_XML) é obtido
+    sem executar nada e a consulta é rejeitada se o custo ou as linhas
+    estimadas passarem dos limites. Rejeições e o custo estimado x real de
+    cada execução são gravados em JSONL para calibrar os limites.
+    """
+
+    def __init__(self, db, max_cost: Optional[float] = None, max_rows: Optional[float] = None,
+                 top_rows: Optional[int] = None, maxdop: Optional[int] = None,
+                 log_path: Optional[str] = None, log_max_bytes: Optional[int] = None,
+                 log_backups: Optional[int] = None):
+        """
+        Args:
+            db: DatabaseManager usado para obter os planos estimados
+            max_cost: Custo estimado máximo, 0 = sem limite (padrão: settings.QUERY_MAX_COST)
+            max_rows: Linhas estimadas máximas, 0 = sem limite (padrão: settings.QUERY_MAX_ESTIMATED_ROWS)
+            top_rows: TOP injetado em consultas sem limite, 0 = nenhum (padrão: settings.DB_MAX_ROWS)
+            maxdop: Valor de OPTION (MAXDOP), 0 = padrão do servidor (padrão: settings.QUERY_MAXDOP)
+            log_path: Arquivo JSONL de registros (padrão: settings.QUERY_GUARD_LOG_PATH)
+            log_max_bytes: Tamanho que dispara a rotação do JSONL, 0 = sem limite
+                (padrão: settings.QUERY_GUARD_LOG_MAX_BYTES)
+            log_backups: Arquivos rotacionados mantidos (padrão: settings.QUERY_GUARD_LOG_BACKUPS)
+        """
+        self.db = db
+        self.max_cost = max_cost if max_cost is not None else settings.QUERY_MAX_COST
+        self.max_rows = max_rows if max_rows is not None else settings.QUERY_MAX_ESTIMATED_ROWS
+        self.top_rows = top_rows if top_rows is not None else settings.DB_MAX_ROWS
+        self.maxdop = maxdop if maxdop is not None else settings.QUERY_MAXDOP
+        self.log_path = log_path if log_path is not None else settings.QUERY_GUARD_LOG_PATH
+        self.log_max_bytes = log_max_bytes if log_max_bytes is not None else settings.QUERY_GUARD_LOG_MAX_BYTES
+        self.log_backups = log_backups if log_backups is not None else settings.QUERY_GUARD_LOG_BACKUPS
+        self._lock = threading.Lock()
+        self._stats = Counter()
+        # Registros de check() aguardando a execução da mesma consulta
+        self._checked: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def prepare(self, sql_query: str) -> Dict[str, Any]:
+        """
+        Reescreve a consulta com os limites e verifica o plano estimado
+
+        Returns:
+            Registro com "sql" (consulta a executar), custo e linhas estimados,
+            a ser completado por record_execution()
+
+        Raises:
+            QueryRejectedError: Se o custo ou as linhas estimadas excederem os limites
+        """
+        with self._lock:
+            record = self._checked.pop(sql_query, None)
+        if record is not None:
+            # Plano já verificado por check() (ex: candidato da geração especulativa)
+            return record
+        limited = inject_top(sql_query, self.top_rows)
+        guarded = self.rewrite(sql_query, limited)
+        record: Dict[str, Any] = {
+            "timestamp": time.time(),
+            "original_sql": sql_query,
+            "sql": guarded,
+            "top_injected": limited != sql_query,
+            "estimated_cost": None,
+            "estimated_rows": None,
+        }
+
+        try:
+            record["estimated_cost"], record["estimated_rows"] = parse_plan(self.db.estimated_plan(guarded))
+        except Exception as e:
+            # Sem permissão SHOWPLAN ou plano ilegível: executa apenas com TOP, MAXDOP e timeout
+            logger.warning(f"Não foi possível obter o plano estimado: {e}")
+            self._count("unestimated")
+            return record
+
+        reason = None
+        if self.max_cost and record["estimated_cost"] > self.max_cost:
+            reason = (f"custo estimado {record['estimated_cost']:.2f} acima do limite "
+                      f"{self.max_cost:g} (QUERY_MAX_COST)")
+        elif self.max_rows and record["estimated_rows"] > self.max_rows:
+            reason = (f"{record['estimated_rows']:.0f} linhas estimadas acima do limite "
+                      f"{self.max_rows:g} (QUERY_MAX_ESTIMATED_ROWS)")
+        if reason:
+            record["status"] = "rejected"
+            record["reason"] = reason
+            self._count("rejected")
+            self._write(record)
+            raise QueryRejectedError(f"Consulta rejeitada: {reason}. "
+                                     f"Restrinja a consulta com filtros ou junções mais seletivas.")
+
+        logger.debug("Plano estimado: custo %.2f, ~%.0f linha(s)", record["estimated_cost"], record["estimated_rows"])
+        return record
+
+    def rewrite(self, sql_query: str, limited: Optional[str] = None) -> str:
+        """Consulta com TOP (n) e OPTION (MAXDOP n), sem obter o plano (mesmo "sql" de prepare())"""
+        if limited is None:
+            limited = inject_top(sql_query, self.top_rows)
+        return add_query_option(limited, f"MAXDOP {self.maxdop}") if self.maxdop else limited
+
+    def check(self, sql_query: str) -> Dict[str, Any]:
+        """
+        Verifica a consulta antes da execução; o próximo prepare() da mesma
+        consulta reaproveita o registro sem pedir o plano de novo
+
+        Raises:
+            QueryRejectedError: Como em prepare()
+        """
+        record = self.prepare(sql_query)
+        with self._lock:
+            self._checked[sql_query] = record
+            while len(self._checked) > 64:
+                self._checked.popitem(last=False)
+        return record
+
+    def record_execution(self, record: Dict[str, Any], actual_rows: int, elapsed: float,
+                         status: str = "completed", error: Optional[str] = None):
+        """Registra linhas e tempo reais de uma consulta preparada por prepare()"""
+        record = dict(record, status=status, actual_rows=actual_rows, elapsed=round(elapsed, 4))
+        if error:
+            record["error"] = error
+        self._count(status)
+        self._write(record)
+
+    def stats(self) -> Dict[str, int]:
+        """Contagem de consultas por desfecho (completed, rejected, timeout, cancelled...)"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _write(self, record: Dict[str, Any]):
+        if not self.log_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            line = json.dumps(record, ensure_ascii=False)
+            with self._lock:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                    size = f.tell()
+                if self.log_max_bytes and size >= self.log_max_bytes:
+                    self._rotate()
+        except OSError as e:
+            logger.warning(f"Erro ao registrar consulta em {self.log_path}: {e}")
+
+    def _rotate(self):
+        """Renomeia o JSONL para .1 (e os anteriores para .2, .3, ...), descartando o mais antigo"""
+        if self.log_backups <= 0:
+            os.remove(self.log_path)
+            return
+        for i in range(self.log_backups - 1, 0, -1):
+            older = f"{self.log_path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.log_path}.{i + 1}")
+        os.replace(self.log_path, f"{self.log_path}.1")
+        logger.info(f"Registro do guarda de custo rotacionado: {self.log_path}.1")
@@ -0,0 +1,416 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from itertools import combinations
+from pathlib import Path
+from typing import List, Dict, Optional, Callable, Any, Tuple
+
+import numpy as np
+
+from src.config.settings import settings
+from src.utils.text_utils import split_identifier
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Nomes de coluna comuns demais para indicar relacionamento por si só
+GENERIC_COLUMNS = frozenset({
+    "id", "nome", "name", "descricao", "description", "design", "data", "date", "obs",
+    "estado", "status", "tipo", "valor", "quantidade", "qtt", "ousrdata", "ousrhora",
+    "ousrinis", "usrdata", "usrhora", "usrinis", "marcada", "created_at", "updated_at",
+})
+
+_TYPE_FAMILIES = {
+    "int": "int", "bigint": "int", "smallint": "int", "tinyint": "int",
+    "numeric": "num", "decimal": "num", "money": "num", "float": "num", "real": "num",
+    "char": "text", "varchar": "text", "nchar": "text", "nvarchar": "text",
+    "uniqueidentifier": "guid",
+    "date": "date", "datetime": "date", "datetime2": "date", "smalldatetime": "date",
+}
+
+
+def parse_relationship(text: str) -> Optional[Dict[str, str]]:
+    """Converte 'tabela1.coluna1 = tabela2.coluna2' em dicionário de relacionamento"""
+    if "=" not in text:
+        return None
+    left, right = text.split("=", 1)
+    try:
+        left_table, left_col = [x.strip() for x in left.strip().rsplit(".", 1)]
+        right_table, right_col = [x.strip() for x in right.strip().rsplit(".", 1)]
+    except ValueError:
+        return None
+    return {
+        "source_table": left_table,
+        "source_column": left_col,
+        "target_table": right_table,
+        "target_column": right_col,
+    }
+
+
+def _edge_key(rel: Dict) -> Tuple[str, str]:
+    """Chave independente da direção do relacionamento"""
+    a = f"{rel['source_table']}.{rel['source_column']}".lower()
+    b = f"{rel['target_table']}.{rel['target_column']}".lower()
+    return (a, b) if a < b else (b, a)
+
+
+class MinHasher:
+    """Esboços MinHash de conjuntos de valores para estimar sobreposição sem trazer os dados"""
+
+    def __init__(self, num_perm: int = 64, seed: int = 7):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, 2 ** 62, size=num_perm, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+        self.b = rng.randint(0, 2 ** 62, size=num_perm, dtype=np.int64).astype(np.uint64)
+
+    def sketch(self, values: List[Any]) -> Optional[np.ndarray]:
+        if not values:
+            return None
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(str(v).strip().lower().encode("utf-8"), digest_size=8).digest(), "little")
+             for v in values),
+            dtype=np.uint64, count=len(values),
+        )
+        # Hash multiply-shift: (a * h + b) mod 2^64, usando os 32 bits mais altos
+        with np.errstate(over="ignore"):
+            permuted = (self.a[:, None] * hashes[None, :] + self.b[:, None]) >> np.uint64(32)
+        return permuted.min(axis=1)
+
+    @staticmethod
+    def jaccard(s1: np.ndarray, s2: np.ndarray) -> float:
+        return float(np.mean(s1 == s2))
+
+
+class RelationshipInferer:
+    """
+    Inferência offline de relacionamentos para tabelas sem chaves estrangeiras declaradas.
+
+    1. Candidatos por semelhança de nome e tipo (mesmo nome de coluna, ou
+       padrões como `id_<tabela>`, `<tabela>_id` e `<tabela>stamp` apontando
+       para a chave da outra tabela)
+    2. Amostra de valores de cada coluna candidata (TOP sem DISTINCT, com
+       tempo limite por consulta), resumida em esboços MinHash, para estimar
+       a contenção de valores entre as colunas
+    3. Pontuação combinada; os aprovados são persistidos ao lado do cache de
+       esquema e usados automaticamente pelo grafo de junções
+
+    Cada execução respeita um orçamento de tempo; os candidatos não avaliados
+    mantêm o resultado anterior, são persistidos como pendentes e avaliados
+    primeiro na execução seguinte (retomada em SQLAIAssistant.start()). Após
+    alterações de esquema, apenas os candidatos que envolvem as tabelas
+    alteradas (e os pendentes) são avaliados.
+
+    Um arquivo opcional de ajustes do administrador permite incluir ou excluir
+    relacionamentos no formato 'tabela1.coluna1 = tabela2.coluna2'.
+    """
+
+    def __init__(self, catalog, fetch: Callable[..., List[Any]], database: str,
+                 cache_path: Optional[str] = None, override_path: Optional[str] = None,
+                 sample_size: Optional[int] = None, min_score: Optional[float] = None,
+                 max_candidates: int = 2000, sample_timeout: Optional[int] = None,
+                 budget: Optional[float] = None):
+        self.catalog = catalog
+        self._fetch = fetch
+        self.database = database
+        self.cache_path = Path(cache_path or os.path.join(settings.CACHE_DIR, f"relationships_{database}.json"))
+        self.override_path = override_path if override_path is not None else settings.RELATIONSHIPS_OVERRIDE_PATH
+        self.sample_size = sample_size or settings.RELATIONSHIP_SAMPLE_SIZE
+        self.min_score = min_score if min_score is not None else settings.RELATIONSHIP_MIN_SCORE
+        self.max_candidates = max_candidates
+        self.sample_timeout = sample_timeout if sample_timeout is not None else settings.RELATIONSHIP_SAMPLE_TIMEOUT
+        self.budget = budget if budget is not None else settings.RELATIONSHIP_INFERENCE_BUDGET
+        self.hasher = MinHasher()
+
+        self._lock = threading.Lock()
+        self._inferred: List[Dict] = []
+        # Candidatos (chaves de _edge_key) que ficaram sem avaliação por falta de orçamento
+        self._unevaluated: set = set()
+        self._overrides: Tuple[List[Dict], List[Dict]] = ([], [])
+        self._overrides_mtime: Optional[float] = None
+        self._loaded = False
+        self._thread: Optional[threading.Thread] = None
+        # Tabelas a reavaliar pela thread de fundo (None = todas)
+        self._pending: Optional[set] = set()
+        self._has_pending = False
+        self.version = 0
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+    def relationships(self) -> List[Dict]:
+        """Relacionamentos inferidos aprovados, com os ajustes do administrador aplicados"""
+        self.ensure_fresh()
+        with self._lock:
+            include, exclude = self._overrides
+            excluded = {_edge_key(rel) for rel in exclude}
+            result = [rel for rel in self._inferred if _edge_key(rel) not in excluded]
+        known = {_edge_key(rel) for rel in result}
+        result.extend(rel for rel in include if _edge_key(rel) not in known)
+        return result
+
+    def ensure_fresh(self):
+        """Carrega os resultados persistidos e relê o arquivo de ajustes se ele mudou"""
+        if not self._loaded:
+            self.load()
+        if not self.override_path:
+            return
+        try:
+            mtime = os.stat(self.override_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._overrides_mtime:
+            overrides = self._load_overrides() if mtime is not None else ([], [])
+            with self._lock:
+                self._overrides = overrides
+                self._overrides_mtime = mtime
+                self.version += 1
+
+    def _load_overrides(self) -> Tuple[List[Dict], List[Dict]]:
+        try:
+            with open(self.override_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Não foi possível ler os ajustes de relacionamentos em {self.override_path}: {e}")
+            return [], []
+
+        def parse_all(items):
+            parsed = []
+            for item in items or []:
+                rel = parse_relationship(item) if isinstance(item, str) else item
+                if rel:
+                    parsed.append(rel)
+            return parsed
+
+        return parse_all(data.get("include")), parse_all(data.get("exclude"))
+
+    # ------------------------------------------------------------------
+    # Execução
+    # ------------------------------------------------------------------
+    def load(self) -> bool:
+        """Carrega os resultados persistidos; retorna False se não houver arquivo válido"""
+        with self._lock:
+            self._loaded = True
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return False
+            if data.get("database") != self.database:
+                return False
+            self._inferred = data.get("relationships", [])
+            self._unevaluated = {tuple(key) for key in data.get("pending", [])}
+            self.version += 1
+            return True
+
+    def pending(self) -> int:
+        """Candidatos à espera de avaliação (orçamento esgotado na última execução)"""
+        with self._lock:
+            return len(self._unevaluated)
+
+    def start_background(self, tables: Optional[List[str]] = None) -> threading.Thread:
+        """
+        Executa a inferência em uma thread de fundo
+
+        Args:
+            tables: Reavalia apenas os candidatos que envolvem estas tabelas e os pendentes
+                (padrão: todas; lista vazia = só os pendentes). Se a thread já estiver em
+                execução, as tabelas entram na próxima rodada dela.
+        """
+        with self._lock:
+            if tables is None or self._pending is None:
+                self._pending = None
+            else:
+                self._pending.update(t.lower() for t in tables)
+            self._has_pending = True
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_pending, name="relationship-inference",
+                                                daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def _run_pending(self):
+        while True:
+            with self._lock:
+                if not self._has_pending:
+                    self._thread = None
+                    return
+                tables = self._pending
+                self._pending = set()
+                self._has_pending = False
+            try:
+                self.run(sorted(tables) if tables is not None else None)
+            except Exception as e:
+                logger.error(f"Erro na inferência de relacionamentos: {e}")
+
+    def run(self, tables: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Gera candidatos, amostra valores, pontua e persiste os relacionamentos aprovados
+
+        Args:
+            tables: Avalia apenas os candidatos que envolvem estas tabelas e os que
+                ficaram pendentes; os demais mantêm o resultado anterior (padrão: todos)
+        """
+        start = time.perf_counter()
+        if not self._loaded:
+            self.load()
+        declared = {_edge_key(fk) for fk in self.catalog.all_foreign_keys()}
+        candidates = [c for c in self._name_candidates() if _edge_key(c) not in declared]
+        current = {_edge_key(c) for c in candidates}
+        with self._lock:
+            unevaluated = set(self._unevaluated)
+        if tables is not None:
+            changed = {t.lower() for t in tables}
+            candidates = [c for c in candidates
+                          if c["source_table"].lower() in changed or c["target_table"].lower() in changed
+                          or _edge_key(c) in unevaluated]
+        # Pendentes primeiro, para que execuções sucessivas sempre avancem
+        candidates.sort(key=lambda c: (_edge_key(c) not in unevaluated, -c["name_score"]))
+        candidates = candidates[:self.max_candidates]
+
+        deadline = start + self.budget if self.budget else None
+        sketches: Dict[Tuple[str, str], Tuple[Optional[np.ndarray], int]] = {}
+        evaluated = set()
+        accepted = []
+        for cand in candidates:
+            if deadline is not None and time.perf_counter() > deadline:
+                logger.warning(f"Orçamento da inferência de relacionamentos esgotado ({self.budget:.0f}s): "
+                               f"{len(candidates) - len(evaluated)} candidato(s) ficam para a próxima execução")
+                break
+            left = self._sample_sketch(sketches, cand["source_table"], cand["source_column"])
+            right = self._sample_sketch(sketches, cand["target_table"], cand["target_column"])
+            overlap = self._containment(left, right)
+            score = 0.5 * cand["name_score"] + 0.5 * overlap
+            evaluated.add(_edge_key(cand))
+            if score >= self.min_score:
+                accepted.append({**cand, "overlap": round(overlap, 3), "score": round(score, 3)})
+
+        with self._lock:
+            # Resultados anteriores de candidatos que ainda existem e não foram reavaliados
+            kept = [rel for rel in self._inferred
+                    if _edge_key(rel) in current and _edge_key(rel) not in evaluated]
+            self._inferred = kept + accepted
+            self._unevaluated = {_edge_key(c) for c in candidates} - evaluated
+            self._loaded = True
+            self.version += 1
+            result = list(self._inferred)
+            pending = sorted(self._unevaluated)
+        self._save(result, pending)
+        logger.info(f"Inferência de relacionamentos: {len(evaluated)} de {len(candidates)} candidatos avaliados, "
+                    f"{len(accepted)} aceitos, {len(kept)} mantidos, {len(pending)} pendentes "
+                    f"em {time.perf_counter() - start:.1f}s")
+        return result
+
+    def _name_candidates(self) -> List[Dict]:
+        """Pares de colunas compatíveis por nome e tipo, sem comparar todas com todas"""
+        columns: Dict[str, List[Dict]] = {}
+        by_name: Dict[str, List[Tuple[str, Dict]]] = {}
+        for table in self.catalog.table_names():
+            cols = self.catalog.get_table_schema(table)
+            columns[table] = cols
+            for col in cols:
+                by_name.setdefault(col["name"].lower(), []).append((table, col))
+
+        candidates = []
+        # 1. Mesmo nome de coluna em tabelas diferentes
+        for name, entries in by_name.items():
+            if name in GENERIC_COLUMNS or len(entries) < 2 or len(entries) > 50:
+                continue
+            for (t1, c1), (t2, c2) in combinations(entries, 2):
+                if t1 != t2 and self._compatible(c1, c2):
+                    candidates.append(self._oriented(t1, c1, t2, c2, 0.8))
+
+        # 2. Coluna que cita o nome de outra tabela (id_lote, lote_id, lotestamp) -> chave da tabela
+        tables_by_term = {}
+        for table in columns:
+            tables_by_term.setdefault(table.lower(), table)
+            tables_by_term.setdefault("".join(split_identifier(table)), table)
+        for table, cols in columns.items():
+            for col in cols:
+                name = col["name"].lower()
+                for prefix, suffix in (("id_", ""), ("", "_id"), ("", "id"), ("", "stamp")):
+                    if not (name.startswith(prefix) and name.endswith(suffix)):
+                        continue
+                    ref = name[len(prefix):len(name) - len(suffix)] if suffix else name[len(prefix):]
+                    target = tables_by_term.get(ref) or tables_by_term.get("".join(split_identifier(ref)))
+                    if not target or target == table:
+                        continue
+                    for key in self._key_columns(columns[target], name):
+                        if self._compatible(col, key):
+                            candidates.append({
+                                "source_table": table, "source_column": col["name"],
+                                "target_table": target, "target_column": key["name"],
+                                "name_score": 0.9,
+                            })
+
+        unique = {}
+        for cand in candidates:
+            key = _edge_key(cand)
+            if key not in unique or unique[key]["name_score"] < cand["name_score"]:
+                unique[key] = cand
+        return list(unique.values())
+
+    @staticmethod
+    def _key_columns(target_columns: List[Dict], name: str) -> List[Dict]:
+        """Colunas da tabela referenciada que podem ser o destino do relacionamento"""
+        keys = [c for c in target_columns if c.get("primary_key")]
+        if not keys:
+            keys = [c for c in target_columns if c["name"].lower() in ("id", name)]
+        return keys
+
+    @staticmethod
+    def _compatible(c1: Dict, c2: Dict) -> bool:
+        f1 = _TYPE_FAMILIES.get(str(c1["type"]).lower())
+        f2 = _TYPE_FAMILIES.get(str(c2["type"]).lower())
+        return f1 is not None and f1 == f2
+
+    @staticmethod
+    def _oriented(t1: str, c1: Dict, t2: str, c2: Dict, name_score: float) -> Dict:
+        """Orienta o relacionamento para a coluna de chave primária, quando houver"""
+        if c1.get("primary_key") and not c2.get("primary_key"):
+            t1, c1, t2, c2 = t2, c2, t1, c1
+        return {
+            "source_table": t1, "source_column": c1["name"],
+            "target_table": t2, "target_column": c2["name"],
+            "name_score": name_score,
+        }
+
+    def _sample_sketch(self, cache: Dict, table: str, column: str) -> Tuple[Optional[np.ndarray], int]:
+        key = (table.lower(), column.lower())
+        if key not in cache:
+            schema = self.catalog.schema_of(table) or "dbo"
+            col, sch, tbl = (name.replace("]", "]]") for name in (column, schema, table))
+            # TOP sem DISTINCT para de ler ao atingir a amostra; os repetidos são removidos aqui
+            query = (f"SELECT TOP ({int(self.sample_size)}) [{col}] "
+                     f"FROM [{sch}].[{tbl}] WHERE [{col}] IS NOT NULL")
+            try:
+                rows = self._fetch(query, (), timeout=self.sample_timeout)
+                values = list(dict.fromkeys(row[0] for row in rows))
+            except Exception as e:
+                logger.debug(f"Erro ao amostrar {table}.{column}: {e}")
+                values = []
+            cache[key] = (self.hasher.sketch(values), len(values))
+        return cache[key]
+
+    def _containment(self, left: Tuple[Optional[np.ndarray], int], right: Tuple[Optional[np.ndarray], int]) -> float:
+        """Maior fração estimada de um conjunto contida no outro, a partir do Jaccard do MinHash"""
+        (s1, n1), (s2, n2) = left, right
+        if s1 is None or s2 is None:
+            return 0.0
+        j = self.hasher.jaccard(s1, s2)
+        if j == 0:
+            return 0.0
+        intersection = j * (n1 + n2) / (1 + j)
+        return min(1.0, intersection / min(n1, n2))
+
+    def _save(self, relationships: List[Dict], pending: List[Tuple[str, str]]):
+        data = {"database": self.database, "generated_at": time.time(), "relationships": relationships,
+                "pending": [list(key) for key in pending]}
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Não foi possível salvar os relacionamentos inferidos: {e}")
@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Callable, Tuple
+from src.config.settings import settings
+from src.utils.sql_utils import normalize_sql, extract_tables_from_query
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Última alteração de cada tabela desde o início do SQL Server (inclui INSERT/UPDATE/DELETE/MERGE)
+_TABLE_CHANGES_QUERY = """
+SELECT OBJECT_NAME(s.object_id) AS table_name, MAX(s.last_user_update) AS last_update
+FROM sys.dm_db_index_usage_stats s
+WHERE s.database_id = DB_ID() AND s.last_user_update IS NOT NULL
+GROUP BY s.object_id
+"""
+
+
+class _Entry:
+    __slots__ = ("description", "rows", "size", "tables", "versions", "created_at")
+
+    def __init__(self, description, rows, size, tables, versions):
+        self.description = description
+        self.rows = rows
+        self.size = size
+        self.tables = tables
+        self.versions = versions
+        self.created_at = time.monotonic()
+
+
+class ResultCache:
+    """
+    Cache em memória dos resultados de consultas executadas.
+
+    A chave é o texto SQL normalizado (comentários removidos e espaços
+    colapsados fora de strings). As entradas são descartadas por LRU acima do
+    orçamento de memória, por TTL e sempre que alguma tabela citada na
+    consulta é alterada. As alterações são detectadas pela última escrita de
+    cada tabela em sys.dm_db_index_usage_stats, consultada no máximo a cada
+    `check_interval` segundos; sem permissão para a DMV, vale apenas o TTL.
+    """
+
+    def __init__(self, fetch: Callable[[str], List[Any]], max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, check_interval: Optional[float] = None):
+        """
+        Args:
+            fetch: Função que executa uma consulta de metadados e retorna as linhas
+            max_bytes: Orçamento de memória (padrão: settings.RESULT_CACHE_MAX_BYTES)
+            ttl: Validade (s) de cada entrada, 0 = sem validade (padrão: settings.RESULT_CACHE_TTL)
+            check_interval: Intervalo (s) entre verificações de alteração das tabelas
+                (padrão: settings.RESULT_CACHE_CHECK_INTERVAL)
+        """
+        self.fetch = fetch
+        self.max_bytes = max_bytes if max_bytes is not None else settings.RESULT_CACHE_MAX_BYTES
+        self.ttl = ttl if ttl is not None else settings.RESULT_CACHE_TTL
+        self.check_interval = (check_interval if check_interval is not None
+                               else settings.RESULT_CACHE_CHECK_INTERVAL)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._by_table: Dict[str, set] = {}
+        self._bytes = 0
+        self._versions: Dict[str, Any] = {}
+        self._versions_checked = 0.0
+        self._tracking = True
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                       "expirations": 0, "invalidations": 0}
+
+    @staticmethod
+    def key(query: str) -> str:
+        return normalize_sql(query)
+
+    @staticmethod
+    def tables(query: str) -> Tuple[str, ...]:
+        """Tabelas citadas na consulta, pelo nome sem esquema em minúsculas"""
+        return tuple(sorted({t.rpartition(".")[2].lower() for t in extract_tables_from_query(query)}))
+
+    def get(self, query: str) -> Optional[Tuple[Any, List[Any]]]:
+        """
+        Retorna o resultado em cache da consulta
+
+        Returns:
+            (cursor.description, linhas) ou None se não houver entrada válida
+        """
+        key = self.key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None:
+            versions = self.table_versions(entry.tables)
+            with self._lock:
+                if self._entries.get(key) is not entry:
+                    entry = None
+                elif self.ttl and time.monotonic() - entry.created_at > self.ttl:
+                    self._remove_locked(key)
+                    self._stats["expirations"] += 1
+                    entry = None
+                elif versions != entry.versions:
+                    self._remove_locked(key)
+                    self._stats["invalidations"] += 1
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+        with self._lock:
+            self._stats["hits" if entry is not None else "misses"] += 1
+        return (entry.description, entry.rows) if entry is not None else None
+
+    def put(self, query: str, description, rows: List[Any], size: int, versions: Dict[str, Any]):
+        """
+        Armazena o resultado completo de uma consulta
+
+        Args:
+            description: cursor.description do resultado
+            rows: Linhas (tuplas) do resultado
+            size: Tamanho estimado em bytes
+            versions: Versões das tabelas obtidas com table_versions() ANTES da execução
+        """
+        if size > self.max_bytes:
+            return
+        key = self.key(query)
+        tables = self.tables(query)
+        with self._lock:
+            if key in self._entries:
+                self._remove_locked(key)
+            self._entries[key] = _Entry(description, rows, size, tables, versions)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._stats["stores"] += 1
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove_locked(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def table_versions(self, tables) -> Dict[str, Any]:
+        """Última alteração conhecida de cada tabela (None se não alterada desde o início do servidor)"""
+        self._refresh_versions()
+        with self._lock:
+            return {table: self._versions.get(table) for table in tables}
+
+    def invalidate_tables(self, table_names):
+        """Remove as entradas que citam as tabelas informadas"""
+        with self._lock:
+            for table in table_names:
+                for key in list(self._by_table.get(table.rpartition(".")[2].lower(), ())):
+                    self._remove_locked(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Acertos, taxa de acerto, entradas e bytes mantidos"""
+        with self._lock:
+            stats = dict(self._stats)
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+            stats["max_bytes"] = self.max_bytes
+            return stats
+
+    def _refresh_versions(self):
+        now = time.monotonic()
+        with self._lock:
+            if not self._tracking or now - self._versions_checked < self.check_interval:
+                return
+            self._versions_checked = now
+        try:
+            rows = self.fetch(_TABLE_CHANGES_QUERY)
+        except Exception as e:
+            logger.warning(f"Alterações de tabelas indisponíveis ({e}); o cache de resultados usará apenas o TTL.")
+            with self._lock:
+                self._tracking = False
+            return
+        versions: Dict[str, Any] = {}
+        for table_name, last_update in rows:
+            if table_name:
+                table = table_name.lower()
+                versions[table] = max(versions[table], last_update) if table in versions else last_update
+
+        with self._lock:
+            changed = {t for t in set(versions) | set(self._versions) if versions.get(t) != self._versions.get(t)}
+            self._versions = versions
+            for table in changed:
+                for key in list(self._by_table.get(table, ())):
+                    self._remove_locked(key)
+                    self._stats["invalidations"] += 1
+
+    def _remove_locked(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
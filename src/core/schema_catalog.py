@@ -0,0 +1,374 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Callable, Any
+from src.config.settings import settings
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CATALOG_FORMAT_VERSION = 1
+
+# Limite seguro de parâmetros por instrução (o SQL Server aceita até 2100)
+_MAX_PARAMS = 500
+
+_MODIFY_DATES_QUERY = """
+SELECT s.name AS table_schema, o.name AS table_name, o.modify_date
+FROM sys.objects AS o
+INNER JOIN sys.schemas AS s ON s.schema_id = o.schema_id
+WHERE o.type IN ('U', 'V') AND o.is_ms_shipped = 0
+"""
+
+_COLUMNS_QUERY = """
+SELECT
+    c.TABLE_SCHEMA, c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE,
+    c.CHARACTER_MAXIMUM_LENGTH,
+    CASE WHEN pk.COLUMN_NAME IS NULL THEN 0 ELSE 1 END AS IS_PRIMARY_KEY
+FROM INFORMATION_SCHEMA.COLUMNS AS c
+LEFT JOIN (
+    SELECT ku.TABLE_SCHEMA, ku.TABLE_NAME, ku.COLUMN_NAME
+    FROM INFORMATION_SCHEMA.TABLE_CONSTRAINTS AS tc
+    INNER JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE AS ku
+        ON tc.CONSTRAINT_NAME = ku.CONSTRAINT_NAME
+        AND tc.TABLE_SCHEMA = ku.TABLE_SCHEMA
+    WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
+) AS pk
+    ON pk.TABLE_SCHEMA = c.TABLE_SCHEMA
+    AND pk.TABLE_NAME = c.TABLE_NAME
+    AND pk.COLUMN_NAME = c.COLUMN_NAME
+"""
+
+_FOREIGN_KEYS_QUERY = """
+SELECT
+    OBJECT_SCHEMA_NAME(f.parent_object_id) AS source_schema,
+    OBJECT_NAME(f.parent_object_id) AS source_table,
+    COL_NAME(fc.parent_object_id, fc.parent_column_id) AS source_column,
+    OBJECT_SCHEMA_NAME(f.referenced_object_id) AS target_schema,
+    OBJECT_NAME(f.referenced_object_id) AS target_table,
+    COL_NAME(fc.referenced_object_id, fc.referenced_column_id) AS target_column
+FROM sys.foreign_keys AS f
+INNER JOIN sys.foreign_key_columns AS fc
+    ON f.object_id = fc.constraint_object_id
+"""
+
+
+class SchemaCatalog:
+    """
+    Catálogo em memória das colunas e chaves estrangeiras do banco.
+
+    O catálogo é carregado com poucas consultas em lote (colunas, chaves
+    estrangeiras e datas de modificação), persistido em arquivo local para
+    reinícios rápidos e atualizado apenas para as tabelas cuja
+    `sys.objects.modify_date` mudou desde a última verificação.
+    """
+
+    def __init__(self, fetch: Callable[[str, tuple], List[Any]], database: str,
+                 cache_path: Optional[str] = None, schemas: Optional[List[str]] = None,
+                 refresh_interval: Optional[float] = None):
+        """
+        Args:
+            fetch: Função que executa uma consulta parametrizada e retorna as linhas
+            database: Nome do banco (usado para validar o arquivo de cache)
+            cache_path: Arquivo de persistência (padrão: <CACHE_DIR>/schema_<banco>.json)
+            schemas: Esquemas a carregar (padrão: settings.SCHEMA_CATALOG_SCHEMAS; vazio = todos)
+            refresh_interval: Segundos entre verificações de alteração
+        """
+        self._fetch = fetch
+        self.database = database
+        self.cache_path = Path(cache_path or os.path.join(settings.CACHE_DIR, f"schema_{database}.json"))
+        self.schemas = schemas if schemas is not None else settings.SCHEMA_CATALOG_SCHEMAS
+        self.refresh_interval = (refresh_interval if refresh_interval is not None
+                                 else settings.SCHEMA_REFRESH_INTERVAL)
+
+        self._lock = threading.RLock()
+        self._tables: Dict[str, Dict] = {}        # "esquema.tabela" -> metadados
+        self._by_name: Dict[str, str] = {}        # "tabela" -> "esquema.tabela"
+        self._foreign_keys: List[Dict] = []
+        self._fk_by_table: Dict[str, List[Dict]] = {}   # "esquema.tabela" -> relacionamentos
+        self._loaded = False
+        self._last_check = 0.0
+        self._listeners: List[Callable[[List[str]], Any]] = []
+        self.version = 0
+
+    def add_listener(self, callback: Callable[[List[str]], Any]):
+        """Registra uma função chamada com os nomes das tabelas alteradas após cada atualização"""
+        self._listeners.append(callback)
+
+    # ------------------------------------------------------------------
+    # Consultas públicas
+    # ------------------------------------------------------------------
+    def get_table_schema(self, table_name: str) -> List[Dict]:
+        """Retorna as colunas de uma tabela (lista vazia se não existir)"""
+        self.ensure_fresh()
+        with self._lock:
+            table = self._lookup(table_name)
+            return list(table["columns"]) if table else []
+
+    def get_multiple_table_schemas(self, table_names: List[str]) -> Dict[str, List[Dict]]:
+        """Retorna o esquema de múltiplas tabelas"""
+        self.ensure_fresh()
+        with self._lock:
+            schemas = {}
+            for table_name in table_names:
+                table = self._lookup(table_name)
+                schemas[table_name] = list(table["columns"]) if table else []
+            return schemas
+
+    def get_foreign_keys(self, table_name: str) -> List[Dict]:
+        """Retorna as chaves estrangeiras em que a tabela é origem ou destino"""
+        self.ensure_fresh()
+        with self._lock:
+            table = self._lookup(table_name)
+            if table is None:
+                return []
+            return list(self._fk_by_table.get(f"{table['schema']}.{table['name']}".lower(), []))
+
+    def has_table(self, table_name: str) -> bool:
+        self.ensure_fresh()
+        with self._lock:
+            return self._lookup(table_name) is not None
+
+    def schema_of(self, table_name: str) -> Optional[str]:
+        """Esquema da tabela (None se não existir)"""
+        self.ensure_fresh()
+        with self._lock:
+            table = self._lookup(table_name)
+            return table["schema"] if table else None
+
+    def table_names(self) -> List[str]:
+        """Lista os nomes (sem esquema) das tabelas do catálogo"""
+        self.ensure_fresh()
+        with self._lock:
+            return [t["name"] for t in self._tables.values()]
+
+    def all_foreign_keys(self) -> List[Dict]:
+        self.ensure_fresh()
+        with self._lock:
+            return list(self._foreign_keys)
+
+    # ------------------------------------------------------------------
+    # Carga e atualização
+    # ------------------------------------------------------------------
+    def ensure_fresh(self):
+        """Carrega o catálogo se necessário e verifica alterações respeitando o intervalo"""
+        if not self._loaded:
+            self.load()
+        elif time.monotonic() - self._last_check >= self.refresh_interval:
+            changed: List[str] = []
+            with self._lock:
+                # Outra thread pode ter verificado enquanto aguardávamos o lock
+                if time.monotonic() - self._last_check < self.refresh_interval:
+                    return
+                try:
+                    changed = self._refresh_locked()
+                except Exception as e:
+                    # Mantém o catálogo atual se a verificação falhar
+                    logger.warning(f"Erro ao verificar alterações do esquema: {e}")
+            self._notify(changed)
+
+    def load(self):
+        """Carrega do arquivo local (se válido) e sincroniza com o banco"""
+        changed: List[str] = []
+        with self._lock:
+            if self._loaded:
+                return
+            if self._load_from_file():
+                logger.info(f"Catálogo de esquema carregado de {self.cache_path} ({len(self._tables)} tabelas)")
+                self._loaded = True
+                changed = self._refresh_locked()
+            else:
+                self.reload()
+        self._notify(changed)
+
+    def reload(self):
+        """Recarrega todo o catálogo a partir do banco"""
+        with self._lock:
+            start = time.perf_counter()
+            modify_dates = self._fetch_modify_dates()
+            self._tables = {}
+            self._load_columns(None, modify_dates)
+            self._load_foreign_keys()
+            self._reindex()
+            self._loaded = True
+            self._last_check = time.monotonic()
+            self.version += 1
+            self._save_to_file()
+            logger.info(f"Catálogo de esquema carregado do banco: {len(self._tables)} tabelas, "
+                        f"{len(self._foreign_keys)} chaves estrangeiras em {time.perf_counter() - start:.2f}s")
+
+    def refresh(self) -> List[str]:
+        """
+        Recarrega apenas as tabelas novas, alteradas ou removidas
+
+        Os ouvintes são chamados depois de liberado o lock do catálogo, pois
+        podem fazer trabalho demorado (inferência, invalidação de caches).
+
+        Returns:
+            Lista das tabelas ("esquema.tabela") que mudaram
+        """
+        with self._lock:
+            changed = self._refresh_locked()
+        self._notify(changed)
+        return changed
+
+    def _refresh_locked(self) -> List[str]:
+        """Atualização incremental; chamada com o lock, sem notificar os ouvintes"""
+        self._last_check = time.monotonic()
+        modify_dates = self._fetch_modify_dates()
+
+        changed = [key for key, date in modify_dates.items()
+                   if key not in self._tables or self._tables[key]["modify_date"] != date]
+        removed = [key for key in self._tables if key not in modify_dates]
+        if not changed and not removed:
+            return []
+
+        for key in removed:
+            del self._tables[key]
+        if changed:
+            self._load_columns(changed, modify_dates)
+        self._load_foreign_keys()
+        self._reindex()
+        self.version += 1
+        self._save_to_file()
+        logger.info(f"Catálogo de esquema atualizado: {len(changed)} alterada(s), {len(removed)} removida(s)")
+        return changed + removed
+
+    def _notify(self, keys: List[str]):
+        """Chama os ouvintes com os nomes (sem esquema) das tabelas alteradas; nunca com o lock"""
+        if not keys:
+            return
+        table_names = [key.rpartition(".")[2] for key in keys]
+        for callback in self._listeners:
+            try:
+                callback(table_names)
+            except Exception as e:
+                logger.error(f"Erro ao notificar alteração de esquema: {e}")
+
+    def _fetch_modify_dates(self) -> Dict[str, str]:
+        query = _MODIFY_DATES_QUERY
+        params: tuple = ()
+        if self.schemas:
+            query += f" AND s.name IN ({', '.join('?' for _ in self.schemas)})"
+            params = tuple(self.schemas)
+        return {f"{row[0]}.{row[1]}".lower(): str(row[2]) for row in self._fetch(query, params)}
+
+    def _load_columns(self, keys: Optional[List[str]], modify_dates: Dict[str, str]):
+        """Carrega colunas de todas as tabelas (keys=None) ou apenas das informadas"""
+        base = _COLUMNS_QUERY
+        batches: List[tuple] = []
+        if keys is None:
+            if self.schemas:
+                base += f" WHERE c.TABLE_SCHEMA IN ({', '.join('?' for _ in self.schemas)})"
+                batches.append(tuple(self.schemas))
+            else:
+                batches.append(())
+        else:
+            base += " WHERE LOWER(c.TABLE_SCHEMA + '.' + c.TABLE_NAME) IN ({})"
+            for i in range(0, len(keys), _MAX_PARAMS):
+                batches.append(tuple(keys[i:i + _MAX_PARAMS]))
+            for key in keys:
+                self._tables.pop(key, None)
+
+        for params in batches:
+            query = base.format(", ".join("?" for _ in params)) if keys is not None else base
+            query += " ORDER BY c.TABLE_SCHEMA, c.TABLE_NAME, c.ORDINAL_POSITION"
+            for row in self._fetch(query, params):
+                key = f"{row[0]}.{row[1]}".lower()
+                table = self._tables.get(key)
+                if table is None:
+                    table = self._tables[key] = {
+                        "schema": row[0],
+                        "name": row[1],
+                        "modify_date": modify_dates.get(key, ""),
+                        "columns": [],
+                    }
+                table["columns"].append({
+                    "name": row[2],
+                    "type": row[3],
+                    "max_length": row[4],
+                    "primary_key": bool(row[5]),
+                })
+
+    def _load_foreign_keys(self):
+        """Carrega as chaves estrangeiras com origem e destino nos esquemas do catálogo"""
+        keys = ["source_schema", "source_table", "source_column",
+                "target_schema", "target_table", "target_column"]
+        query = _FOREIGN_KEYS_QUERY
+        params: tuple = ()
+        if self.schemas:
+            placeholders = ", ".join("?" for _ in self.schemas)
+            query += (f" WHERE OBJECT_SCHEMA_NAME(f.parent_object_id) IN ({placeholders})"
+                      f" AND OBJECT_SCHEMA_NAME(f.referenced_object_id) IN ({placeholders})")
+            params = tuple(self.schemas) * 2
+        self._foreign_keys = [dict(zip(keys, row)) for row in self._fetch(query, params)]
+
+    def _reindex(self):
+        """Reconstrói os índices por nome de tabela"""
+        self._by_name = {}
+        for key, table in self._tables.items():
+            name = table["name"].lower()
+            # Em caso de nomes repetidos em esquemas diferentes, prioriza 'dbo'
+            if name not in self._by_name or table["schema"].lower() == "dbo":
+                self._by_name[name] = key
+
+        # Indexadas pela chave "esquema.tabela", a mesma de _tables
+        self._fk_by_table = {}
+        for fk in self._foreign_keys:
+            rel = {k: fk[k] for k in ("source_table", "source_column", "target_table", "target_column")}
+            source = f"{fk['source_schema']}.{fk['source_table']}".lower()
+            target = f"{fk['target_schema']}.{fk['target_table']}".lower()
+            self._fk_by_table.setdefault(source, []).append(rel)
+            if target != source:
+                self._fk_by_table.setdefault(target, []).append(rel)
+
+    def _lookup(self, table_name: str) -> Optional[Dict]:
+        name = table_name.strip().strip("[]").lower()
+        if "." in name:
+            schema, _, bare = name.rpartition(".")
+            table = self._tables.get(f"{schema.strip('[]')}.{bare.strip('[]')}")
+            if table:
+                return table
+            name = bare.strip("[]")
+        key = self._by_name.get(name)
+        return self._tables.get(key) if key else None
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+    def _load_from_file(self) -> bool:
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if (data.get("format_version") != CATALOG_FORMAT_VERSION
+                or data.get("database") != self.database
+                or data.get("schemas") != list(self.schemas)):
+            return False
+
+        self._tables = data.get("tables", {})
+        self._foreign_keys = data.get("foreign_keys", [])
+        self._reindex()
+        self.version += 1
+        return True
+
+    def _save_to_file(self):
+        data = {
+            "format_version": CATALOG_FORMAT_VERSION,
+            "database": self.database,
+            "schemas": list(self.schemas),
+            "saved_at": time.time(),
+            "tables": self._tables,
+            "foreign_keys": self._foreign_keys,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Não foi possível salvar o catálogo de esquema: {e}")
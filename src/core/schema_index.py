@@ -0,0 +1,143 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Tuple, Optional
+from src.utils.text_utils import tokenize, split_identifier, fold_accents
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+_RAW_WORD = re.compile(r"[a-z0-9_]+")
+
+
+class SchemaIndex:
+    """
+    Índice invertido de tabelas e colunas do catálogo para seleção automática de tabelas.
+
+    Cada tabela é um documento formado pelos termos do seu nome (com peso
+    maior) e das suas colunas, com acentos removidos e stemming em português.
+    A pergunta é pontuada com BM25 consultando apenas as listas de postagem
+    dos seus termos, o que mantém a busca em milissegundos mesmo com
+    milhares de tabelas.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    TABLE_NAME_WEIGHT = 3
+    EXACT_NAME_BONUS = 5.0
+
+    def __init__(self, catalog, annotations: Optional[Dict[str, Dict[str, Dict]]] = None):
+        """
+        Args:
+            catalog: SchemaCatalog usado como fonte das tabelas e colunas
+            annotations: Apelidos/descrições opcionais (ver schema_pruning.load_annotations)
+        """
+        self.catalog = catalog
+        self.annotations = annotations or {}
+        self._lock = threading.Lock()
+        self._built_version = -1
+        self._tables: List[str] = []
+        self._doc_len: List[int] = []
+        self._avg_len = 1.0
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._by_exact_name: Dict[str, int] = {}
+
+    def _ensure_built(self):
+        self.catalog.ensure_fresh()
+        if self._built_version == self.catalog.version:
+            return
+        with self._lock:
+            if self._built_version != self.catalog.version:
+                self._build()
+
+    def _build(self):
+        start = time.perf_counter()
+        version = self.catalog.version
+        tables: List[str] = []
+        doc_len: List[int] = []
+        postings: Dict[str, Dict[int, int]] = {}
+        by_exact_name: Dict[str, int] = {}
+
+        for table_name in self.catalog.table_names():
+            doc_id = len(tables)
+            tables.append(table_name)
+            by_exact_name.setdefault(table_name.lower(), doc_id)
+
+            terms = Counter()
+            for term in split_identifier(table_name):
+                terms[term] += self.TABLE_NAME_WEIGHT
+            table_ann = self.annotations.get(table_name.lower(), {})
+            for col in self.catalog.get_table_schema(table_name):
+                terms.update(split_identifier(col["name"]))
+                ann = table_ann.get(col["name"].lower())
+                if ann:
+                    for alias in ann.get("aliases", []):
+                        terms.update(tokenize(alias))
+                    terms.update(tokenize(ann.get("description", "")))
+
+            doc_len.append(sum(terms.values()))
+            for term, tf in terms.items():
+                postings.setdefault(term, {})[doc_id] = tf
+
+        self._tables = tables
+        self._doc_len = doc_len
+        self._avg_len = (sum(doc_len) / len(doc_len)) if doc_len else 1.0
+        self._postings = postings
+        self._by_exact_name = by_exact_name
+        self._built_version = version
+        logger.info(f"Índice de esquema construído: {len(tables)} tabelas, {len(postings)} termos "
+                    f"em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def rank(self, question: str, limit: int = 10) -> List[Tuple[str, float]]:
+        """
+        Ordena as tabelas candidatas para a pergunta
+
+        Returns:
+            Lista de (tabela, pontuação) em ordem decrescente
+        """
+        self._ensure_built()
+        n = len(self._tables)
+        if not n:
+            return []
+
+        scores: Dict[int, float] = {}
+        for term, qtf in Counter(tokenize(question)).items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.K1 * (1 - self.B + self.B * self._doc_len[doc_id] / self._avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + qtf * idf * tf * (self.K1 + 1) / (tf + norm)
+
+        # Nomes curtos de tabela citados literalmente (ex: "na tabela se") não passam pelo stemming
+        for word in set(_RAW_WORD.findall(fold_accents(question).lower())):
+            doc_id = self._by_exact_name.get(word)
+            if doc_id is not None:
+                scores[doc_id] = scores.get(doc_id, 0.0) + self.EXACT_NAME_BONUS
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        return [(self._tables[doc_id], score) for doc_id, score in ranked]
+
+    def suggest(self, question: str, max_tables: int = 4, min_ratio: float = 0.35) -> List[str]:
+        """
+        Sugere as tabelas para a pergunta
+
+        Args:
+            question: Pergunta em linguagem natural
+            max_tables: Número máximo de tabelas
+            min_ratio: Pontuação mínima relativa à melhor tabela
+
+        Returns:
+            Nomes das tabelas sugeridas
+        """
+        start = time.perf_counter()
+        ranked = self.rank(question, limit=max_tables)
+        if not ranked:
+            return []
+        threshold = ranked[0][1] * min_ratio
+        tables = [table for table, score in ranked if score >= threshold]
+        logger.debug("Tabelas sugeridas: %s em %.1fms", tables, (time.perf_counter() - start) * 1000)
+        return tables
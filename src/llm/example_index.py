@@ -0,0 +1,246 @@
+import heapq
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import List, Dict, Optional, Iterable, Any
+from src.config.settings import settings
+from src.utils.logger import get_logger
+from src.utils.text_utils import normalize_question
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS examples (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_examples_created_at ON examples (created_at);
+"""
+
+
+def char_ngrams(text: str, n: int = 3) -> Counter:
+    """
+    N-gramas de caracteres de cada palavra da pergunta normalizada
+
+    As palavras recebem um espaço de cada lado, de modo que prefixos e
+    sufixos contam como n-gramas próprios. Tolera flexões e erros de
+    digitação ("lotes"/"lote", "producao"/"produção") sem stemming.
+    """
+    grams = Counter()
+    for word in normalize_question(text).split():
+        padded = f" {word} "
+        if len(padded) <= n:
+            grams[padded] += 1
+            continue
+        for i in range(len(padded) - n + 1):
+            grams[padded[i:i + n]] += 1
+    return grams
+
+
+class ExampleIndex:
+    """
+    Exemplos verificados de pergunta -> SQL para prompts few-shot.
+
+    Os pares validados pelo banco são gravados em SQLite e indexados em
+    memória por n-gramas de caracteres da pergunta (BM25). O índice é
+    atualizado a cada inclusão ou remoção, sem reconstrução. A busca
+    considera apenas os exemplos cujas tabelas estejam todas no prompt atual
+    (localizados pelo índice de tabelas) e pontua só os n-gramas da pergunta.
+    Exemplos cujo SQL falhou na execução ou que envolvem tabelas alteradas
+    são removidos.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 top_k: Optional[int] = None, min_similarity: Optional[float] = None):
+        """
+        Args:
+            path: Arquivo SQLite (padrão: CACHE_DIR/examples.sqlite3)
+            max_entries: Número máximo de exemplos (os mais antigos são removidos)
+            top_k: Exemplos retornados por busca
+            min_similarity: Fração mínima dos n-gramas da pergunta presentes no exemplo
+        """
+        self.path = path or os.path.join(settings.CACHE_DIR, "examples.sqlite3")
+        self.max_entries = max_entries if max_entries is not None else settings.EXAMPLES_MAX_ENTRIES
+        self.top_k = top_k if top_k is not None else settings.EXAMPLES_TOP_K
+        self.min_similarity = min_similarity if min_similarity is not None else settings.EXAMPLES_MIN_SIMILARITY
+        self.searches = 0
+        self.hits = 0
+        self._search_ms = 0.0
+
+        self._lock = threading.Lock()
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._by_key: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._by_table: Dict[str, set] = {}
+        self._total_len = 0
+        self._next_id = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        self._load()
+
+    @staticmethod
+    def _table_list(table_names: Iterable[str]) -> str:
+        # Mesmo formato do cache de geração: tabelas em minúsculas, ordenadas e delimitadas por '|'
+        return "|" + "|".join(sorted({t.lower() for t in table_names})) + "|"
+
+    @classmethod
+    def make_key(cls, question: str, table_names: Iterable[str]) -> str:
+        return normalize_question(question) + "\x1f" + cls._table_list(table_names)
+
+    def _load(self):
+        start = time.perf_counter()
+        rows = self._conn.execute("SELECT key, question, tables, sql FROM examples ORDER BY created_at").fetchall()
+        with self._lock:
+            for key, question, tables, sql in rows:
+                self._index(key, question, tables, sql)
+        if rows:
+            logger.info(f"Índice de exemplos carregado: {len(rows)} exemplo(s), {len(self._postings)} n-gramas "
+                        f"em {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def _index(self, key: str, question: str, tables: str, sql: str):
+        """Inclui o exemplo nas estruturas em memória (chamado com o lock)"""
+        if key in self._by_key:
+            self._unindex(self._by_key[key])
+        grams = char_ngrams(question)
+        doc_id = self._next_id
+        self._next_id += 1
+        self._docs[doc_id] = {"key": key, "question": question, "sql": sql, "grams": grams,
+                              "tables": frozenset(t for t in tables.split("|") if t),
+                              "length": sum(grams.values())}
+        self._by_key[key] = doc_id
+        self._total_len += self._docs[doc_id]["length"]
+        for gram, tf in grams.items():
+            self._postings.setdefault(gram, {})[doc_id] = tf
+        for table in self._docs[doc_id]["tables"]:
+            self._by_table.setdefault(table, set()).add(doc_id)
+
+    def _unindex(self, doc_id: int):
+        """Remove o exemplo das estruturas em memória (chamado com o lock)"""
+        doc = self._docs.pop(doc_id)
+        del self._by_key[doc["key"]]
+        self._total_len -= doc["length"]
+        for gram in doc["grams"]:
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[gram]
+        for table in doc["tables"]:
+            docs = self._by_table.get(table)
+            if docs is not None:
+                docs.discard(doc_id)
+                if not docs:
+                    del self._by_table[table]
+
+    def add(self, question: str, table_names: Iterable[str], sql: str):
+        """Inclui (ou substitui) o exemplo da pergunta e aplica o limite de exemplos"""
+        table_names = list(table_names)
+        key = self.make_key(question, table_names)
+        tables = self._table_list(table_names)
+        with self._lock:
+            doc_id = self._by_key.get(key)
+            if doc_id is not None and self._docs[doc_id]["sql"] == sql:
+                # Mesmo SQL de novo (ex: vindo do cache de geração): nada a gravar
+                return
+            self._conn.execute(
+                "INSERT OR REPLACE INTO examples (key, question, tables, sql, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, question.strip(), tables, sql, time.time()),
+            )
+            self._index(key, question.strip(), tables, sql)
+            if self.max_entries and len(self._docs) > self.max_entries:
+                # Os identificadores crescem com a inclusão: os menores são os mais antigos
+                for doc_id in sorted(self._docs)[:len(self._docs) - self.max_entries]:
+                    self._conn.execute("DELETE FROM examples WHERE key = ?", (self._docs[doc_id]["key"],))
+                    self._unindex(doc_id)
+            self._conn.commit()
+
+    def search(self, question: str, table_names: Iterable[str], k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Exemplos mais parecidos com a pergunta entre os que usam apenas as tabelas informadas
+
+        Returns:
+            Lista de {"nl", "sql", "score"} em ordem decrescente (formato de
+            PromptTemplates.advanced_sql_generation)
+        """
+        start = time.perf_counter()
+        k = self.top_k if k is None else k
+        allowed = {t.lower() for t in table_names}
+        query = char_ngrams(question)
+        query_len = sum(query.values())
+        with self._lock:
+            n = len(self._docs)
+            results: List[Dict[str, Any]] = []
+            candidates = set()
+            for table in allowed:
+                candidates.update(self._by_table.get(table, ()))
+            if candidates and query_len and k > 0:
+                avg_len = self._total_len / n
+                idf = {gram: math.log(1 + (n - len(self._postings[gram]) + 0.5) / (len(self._postings[gram]) + 0.5))
+                       for gram in query if gram in self._postings}
+                scored = []
+                for doc_id in candidates:
+                    doc = self._docs[doc_id]
+                    if not doc["tables"] <= allowed:
+                        continue
+                    norm = self.K1 * (1 - self.B + self.B * doc["length"] / avg_len)
+                    score, matched = 0.0, 0
+                    for gram, weight in idf.items():
+                        tf = doc["grams"].get(gram)
+                        if tf:
+                            score += query[gram] * weight * tf * (self.K1 + 1) / (tf + norm)
+                            matched += min(query[gram], tf)
+                    if matched / query_len >= self.min_similarity:
+                        scored.append((score, doc_id))
+                for score, doc_id in heapq.nlargest(k, scored):
+                    doc = self._docs[doc_id]
+                    results.append({"nl": doc["question"], "sql": doc["sql"], "score": round(score, 3)})
+            self.searches += 1
+            self.hits += bool(results)
+            self._search_ms += (time.perf_counter() - start) * 1000
+        logger.debug("Exemplos para a pergunta: %d em %.1fms", len(results), (time.perf_counter() - start) * 1000)
+        return results
+
+    def discard_sql(self, sql: str):
+        """Remove exemplos cujo SQL falhou na execução"""
+        with self._lock:
+            for doc_id in [d for d, doc in self._docs.items() if doc["sql"] == sql]:
+                self._unindex(doc_id)
+            self._conn.execute("DELETE FROM examples WHERE sql = ?", (sql,))
+            self._conn.commit()
+
+    def invalidate_tables(self, table_names: Iterable[str]) -> int:
+        """Remove os exemplos que envolvem qualquer uma das tabelas (ex: após alteração de esquema)"""
+        tables = {t.lower() for t in table_names}
+        with self._lock:
+            stale = [doc_id for doc_id, doc in self._docs.items() if doc["tables"] & tables]
+            for doc_id in stale:
+                self._conn.execute("DELETE FROM examples WHERE key = ?", (self._docs[doc_id]["key"],))
+                self._unindex(doc_id)
+            self._conn.commit()
+        return len(stale)
+
+    def stats(self) -> Dict[str, float]:
+        """Exemplos indexados, buscas, buscas com exemplos e tempo médio de busca"""
+        with self._lock:
+            return {
+                "examples": len(self._docs),
+                "searches": self.searches,
+                "hit_ratio": round(self.hits / self.searches, 3) if self.searches else 0.0,
+                "search_ms_avg": round(self._search_ms / self.searches, 3) if self.searches else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional, Iterable
+from src.config.settings import settings
+from src.utils.text_utils import normalize_question
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS generations (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    tables TEXT NOT NULL,
+    schema_hash TEXT NOT NULL,
+    model TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_generations_last_access ON generations (last_access);
+"""
+
+
+def schema_fingerprint(schemas: Dict[str, List[Dict]], relationships: List[Dict]) -> str:
+    """Hash estável dos esquemas e relacionamentos enviados ao prompt"""
+    payload = {
+        "schemas": {table.lower(): [[col["name"], col["type"]] for col in columns]
+                    for table, columns in schemas.items()},
+        "relationships": sorted(
+            f"{r['source_table']}.{r['source_column']}->{r['target_table']}.{r['target_column']}".lower()
+            for r in relationships
+        ),
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class GenerationCache:
+    """
+    Cache persistente (SQLite) de SQL gerado pelo LLM.
+
+    A chave combina a pergunta normalizada (caixa, acentos, espaços), a lista
+    ordenada de tabelas, o hash dos esquemas/relacionamentos e o modelo, de
+    modo que qualquer alteração de esquema produz uma chave nova. As entradas
+    expiram por TTL e são removidas por LRU acima de `max_entries`.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 ttl: Optional[float] = None):
+        self.path = path or os.path.join(settings.CACHE_DIR, "generation_cache.sqlite3")
+        self.max_entries = max_entries if max_entries is not None else settings.GENERATION_CACHE_MAX_ENTRIES
+        self.ttl = ttl if ttl is not None else settings.GENERATION_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    @staticmethod
+    def _table_list(table_names: Iterable[str]) -> str:
+        # Delimitada por '|' para permitir busca exata por tabela com LIKE
+        return "|" + "|".join(sorted({t.lower() for t in table_names})) + "|"
+
+    @classmethod
+    def make_key(cls, question: str, table_names: Iterable[str], schema_hash: str, model: str) -> str:
+        raw = "\x1f".join([normalize_question(question), cls._table_list(table_names), schema_hash, model])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+            model: str) -> Optional[str]:
+        """Retorna o SQL em cache para a pergunta, ou None"""
+        key = self.make_key(question, schemas.keys(), schema_fingerprint(schemas, relationships), model)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT sql, created_at FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+            if row and self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE generations SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, question: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+            model: str, sql: str):
+        """Armazena o SQL gerado e aplica a remoção por LRU"""
+        schema_hash = schema_fingerprint(schemas, relationships)
+        key = self.make_key(question, schemas.keys(), schema_hash, model)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations "
+                "(key, question, tables, schema_hash, model, sql, created_at, last_access, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, normalize_question(question), self._table_list(schemas.keys()),
+                 schema_hash, model, sql, now, now),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM generations WHERE key IN ("
+                    "SELECT key FROM generations ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def discard_sql(self, sql: str):
+        """Remove entradas cujo SQL falhou na execução"""
+        with self._lock:
+            self._conn.execute("DELETE FROM generations WHERE sql = ?", (sql,))
+            self._conn.commit()
+
+    def invalidate_tables(self, table_names: Iterable[str]) -> int:
+        """Remove as entradas que envolvem qualquer uma das tabelas (ex: após alteração de esquema)"""
+        removed = 0
+        with self._lock:
+            for table in {t.lower() for t in table_names}:
+                cursor = self._conn.execute(
+                    "DELETE FROM generations WHERE tables LIKE ? ESCAPE '\\'",
+                    ("%|" + table.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "|%",),
+                )
+                removed += cursor.rowcount
+            self._conn.commit()
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM generations")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Contadores de acertos/falhas e tamanho do cache"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,75 @@
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.config.settings import settings
+
+
+class OllamaHTTPClient:
+    """
+    Cliente HTTP compartilhado para o Ollama.
+
+    - Conexões persistentes (keep-alive) via requests.Session
+    - Timeouts de conexão e leitura configuráveis
+    - Novas tentativas com backoff exponencial em erros 5xx e conexões resetadas
+    - Limite de requisições simultâneas igual ao OLLAMA_NUM_PARALLEL do servidor
+    """
+
+    _shared: Optional["OllamaHTTPClient"] = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, connect_timeout: Optional[float] = None, read_timeout: Optional[float] = None,
+                 max_retries: Optional[int] = None, backoff_factor: Optional[float] = None,
+                 max_parallel: Optional[int] = None):
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else settings.OLLAMA_CONNECT_TIMEOUT,
+            read_timeout if read_timeout is not None else settings.OLLAMA_READ_TIMEOUT,
+        )
+        self.max_parallel = max_parallel or settings.OLLAMA_NUM_PARALLEL
+        max_retries = settings.OLLAMA_MAX_RETRIES if max_retries is None else max_retries
+        backoff_factor = settings.OLLAMA_RETRY_BACKOFF if backoff_factor is None else backoff_factor
+
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_parallel, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(self.max_parallel)
+
+    @classmethod
+    def shared(cls) -> "OllamaHTTPClient":
+        """Instância única do processo, para que o limite de concorrência seja global"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @contextmanager
+    def post(self, url: str, payload: Dict[str, Any], stream: bool = False):
+        """
+        Envia um POST ocupando um dos slots de concorrência até a resposta ser fechada
+
+        Yields:
+            requests.Response já validada com raise_for_status()
+        """
+        with self._slots:
+            response = self.session.post(url, json=payload, stream=stream, timeout=self.timeout)
+            try:
+                response.raise_for_status()
+                yield response
+            finally:
+                response.close()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,235 @@
+"""
+Roteamento de perguntas entre modelos de tamanhos diferentes
+
+A pergunta vai primeiro ao menor modelo e sobe para o seguinte quando o SQL
+gerado falha na validação, no plano estimado ou na execução. Perguntas com
+complexidade alta (muitas tabelas, agregações, pergunta longa) pulam o menor
+modelo.
+
+Os desfechos são registrados por formato de pergunta (tabelas + tipo de
+pergunta) e por modelo: quando um modelo acumula ROUTER_MIN_SAMPLES
+tentativas em um formato com sucesso abaixo de ROUTER_MIN_SUCCESS, as
+perguntas desse formato passam a começar no modelo seguinte. Os desfechos
+são persistidos em ROUTER_STATE_PATH.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from src.config.settings import settings
+from src.utils.logger import get_logger
+from src.utils.text_utils import normalize_question
+from src.utils.tracing import Histogram, tracer
+
+logger = get_logger(__name__)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Tipo de pergunta -> prefixos de palavras (sem acentos) que o indicam
+_SHAPE_FEATURES = {
+    "agregacao": ("total", "soma", "media", "contag", "quantos", "quantas", "agrupad"),
+    "ranking": ("maior", "menor", "top", "primeir", "ultim", "ranking"),
+    "periodo": ("data", "mes", "ano", "periodo", "entre", "semana", "dia", "hoje"),
+}
+
+_MAX_SHAPES = 5000
+_SAVE_INTERVAL = 30.0
+
+
+class Route:
+    """Rota de uma solicitação: formato da pergunta e modelo (tier) atual"""
+
+    __slots__ = ("shape", "tier", "complexity", "escalations", "started", "finished")
+
+    def __init__(self, shape: str, tier: int, complexity: float):
+        self.shape = shape
+        self.tier = tier
+        self.complexity = complexity
+        self.escalations = 0
+        self.started = time.perf_counter()
+        self.finished = False
+
+
+def question_features(nl_query: str) -> List[str]:
+    """Tipos de pergunta presentes (agregacao, ranking, periodo)"""
+    words = _WORD.findall(normalize_question(nl_query))
+    return [feature for feature, prefixes in _SHAPE_FEATURES.items()
+            if any(word.startswith(prefixes) for word in words)]
+
+
+class ModelRouter:
+    """
+    Escolhe o modelo de cada solicitação e registra os desfechos por modelo
+
+    Args:
+        clients: Clientes dos modelos, do menor para o maior
+        threshold: Complexidade a partir da qual o menor modelo é pulado
+        min_samples: Tentativas por formato antes de aprender com elas
+        min_success: Taxa de sucesso mínima para manter o formato em um modelo
+        path: Arquivo JSON dos desfechos por formato ("" = não persiste)
+    """
+
+    def __init__(self, clients: List[Any], threshold: Optional[float] = None, min_samples: Optional[int] = None,
+                 min_success: Optional[float] = None, path: Optional[str] = None):
+        self.clients = clients
+        self.threshold = threshold if threshold is not None else settings.ROUTER_COMPLEXITY_THRESHOLD
+        self.min_samples = min_samples if min_samples is not None else settings.ROUTER_MIN_SAMPLES
+        self.min_success = min_success if min_success is not None else settings.ROUTER_MIN_SUCCESS
+        self.path = path if path is not None else settings.ROUTER_STATE_PATH
+        self._lock = threading.Lock()
+        # Formato -> modelo -> [sucessos, tentativas]
+        self._shapes: "OrderedDict[str, Dict[str, List[int]]]" = OrderedDict()
+        self._tiers: Dict[str, Counter] = {client.model_name: Counter() for client in clients}
+        self._latency: Dict[str, Histogram] = {client.model_name: Histogram(settings.TRACE_HISTOGRAM_WINDOW)
+                                               for client in clients}
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self.load()
+
+    @property
+    def last_tier(self) -> int:
+        return len(self.clients) - 1
+
+    def client(self, route: Route):
+        """Cliente do modelo atual da rota"""
+        return self.clients[route.tier]
+
+    def complexity(self, nl_query: str, table_names: List[str]) -> float:
+        """
+        Pontuação de 0 a 1: 0,3 por tabela além da primeira, 0,15 por tipo de
+        pergunta (agregação, ranking, período) e 0,1 a cada 8 palavras
+        """
+        words = len(normalize_question(nl_query).split())
+        score = 0.3 * max(0, len(table_names) - 1) + 0.15 * len(question_features(nl_query)) + words / 80
+        return round(min(1.0, score), 3)
+
+    @staticmethod
+    def shape(nl_query: str, table_names: List[str]) -> str:
+        """Formato da pergunta: tabelas ordenadas e tipos de pergunta (ex: "fi,st|agregacao")"""
+        tables = ",".join(sorted({t.strip().lower() for t in table_names}))
+        return f"{tables}|{','.join(question_features(nl_query))}"
+
+    def route(self, nl_query: str, table_names: List[str]) -> Route:
+        """
+        Modelo inicial da solicitação: o menor, o seguinte se a complexidade
+        for alta, e acima dos modelos que falham com frequência neste formato
+        """
+        shape = self.shape(nl_query, table_names)
+        complexity = self.complexity(nl_query, table_names)
+        tier = 1 if complexity >= self.threshold else 0
+        with self._lock:
+            history = self._shapes.get(shape, {})
+            while tier < self.last_tier:
+                successes, attempts = history.get(self.clients[tier].model_name, (0, 0))
+                if attempts < self.min_samples or successes / attempts >= self.min_success:
+                    break
+                tier += 1
+            tier = min(tier, self.last_tier)
+            self._tiers[self.clients[tier].model_name]["requests"] += 1
+        route = Route(shape, tier, complexity)
+        tracer.set(model=self.clients[tier].model_name, complexity=complexity)
+        logger.debug("Rota %s: modelo %s (complexidade %.2f)", shape, self.clients[tier].model_name, complexity)
+        return route
+
+    def escalate(self, route: Route, reason: str) -> bool:
+        """
+        Registra a falha do modelo atual e passa a rota ao modelo seguinte
+
+        Returns:
+            False se a rota já estiver no maior modelo
+        """
+        if route.tier >= self.last_tier:
+            return False
+        model = self.clients[route.tier].model_name
+        with self._lock:
+            self._tiers[model]["escalations"] += 1
+            self._record(route.shape, model, False)
+        route.tier += 1
+        route.escalations += 1
+        logger.info(f"Escalando de {model} para {self.clients[route.tier].model_name} ({reason})")
+        tracer.set(model=self.clients[route.tier].model_name, escalations=route.escalations)
+        return True
+
+    def finish(self, route: Route, success: Optional[bool]):
+        """
+        Registra o desfecho final da solicitação no modelo atual da rota (só a
+        primeira chamada por rota conta)
+
+        Args:
+            success: None quando o desfecho não depende do modelo (timeout,
+                cancelamento, consumidor que parou de ler): conta como
+                abandonada, sem entrar no histórico do formato
+        """
+        if route.finished:
+            return
+        route.finished = True
+        model = self.clients[route.tier].model_name
+        elapsed = time.perf_counter() - route.started
+        with self._lock:
+            if success is None:
+                self._tiers[model]["abandoned"] += 1
+            else:
+                self._tiers[model]["successes" if success else "failures"] += 1
+                self._record(route.shape, model, success)
+        self._latency[model].observe(elapsed * 1000)
+        self._maybe_save()
+
+    def _record(self, shape: str, model: str, success: bool):
+        history = self._shapes.pop(shape, None) or {}
+        outcome = history.setdefault(model, [0, 0])
+        outcome[0] += int(success)
+        outcome[1] += 1
+        self._shapes[shape] = history
+        while len(self._shapes) > _MAX_SHAPES:
+            self._shapes.popitem(last=False)
+        self._dirty = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Por modelo: solicitações iniciadas, escaladas, sucessos, falhas, abandonadas, taxa de sucesso e latência (ms)"""
+        with self._lock:
+            tiers = {model: dict(counter) for model, counter in self._tiers.items()}
+            shapes = len(self._shapes)
+        for model, counter in tiers.items():
+            attempts = counter.get("successes", 0) + counter.get("failures", 0) + counter.get("escalations", 0)
+            counter["success_rate"] = round(counter.get("successes", 0) / attempts, 3) if attempts else 0.0
+            counter["latency_ms"] = self._latency[model].summary()
+        return {"tiers": tiers, "shapes": shapes}
+
+    def load(self) -> bool:
+        """Carrega os desfechos persistidos; retorna False se não houver arquivo válido"""
+        if not self.path:
+            return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self._shapes = OrderedDict(data.get("shapes", {}))
+        return True
+
+    def save(self):
+        """Grava os desfechos por formato (escrita atômica)"""
+        if not self.path:
+            return
+        with self._lock:
+            shapes = {shape: {model: list(outcome) for model, outcome in history.items()}
+                      for shape, history in self._shapes.items()}
+            data = {"saved_at": time.time(), "shapes": shapes}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Não foi possível salvar o estado do roteador de modelos: {e}")
+
+    def _maybe_save(self):
+        if self._dirty and time.monotonic() - self._saved_at >= _SAVE_INTERVAL:
+            self.save()
@@ -1,24 +1,81 @@
-import requests
-from typing import List, Dict, Any
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
 from src.config.settings import settings
-from src.utils.sql_utils import validate_sql, clean_sql_query
+from src.utils.sql_utils import validate_sql, clean_sql_query, find_sql_end
+from src.llm.http_client import OllamaHTTPClient
+from src.utils.text_utils import estimate_tokens
 from src.llm.prompt_templates import PromptTemplates
+from src.utils.logger import get_logger
+from src.utils.tracing import tracer
+
+logger = get_logger(__name__)
 
 class OllamaClient:
-    def __init__(self, model_name: str):
+    def __init__(self, model_name: str, http_client: Optional[OllamaHTTPClient] = None):
         self.model_name = model_name
         self.base_url = settings.OLLAMA_URL
+        self.stream = settings.OLLAMA_STREAM
+        self.http = http_client or OllamaHTTPClient.shared()
+        self.keep_alive = settings.OLLAMA_KEEP_ALIVE
+        self.num_ctx = settings.OLLAMA_NUM_CTX
+        # Tempo de avaliação do prompt por prefixo: primeira chamada (cache frio) x seguintes
+        self._prefix_stats: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._stats_lock = threading.Lock()
+
+    def warm_up(self) -> bool:
+        """
+        Pré-carrega o modelo na memória do Ollama (prompt vazio) e o mantém
+        carregado por `keep_alive`, evitando a latência de carga na primeira pergunta
+        """
+        logger.info(f"Pré-carregando o modelo {self.model_name} (keep_alive={self.keep_alive})")
+        payload = {"model": self.model_name, "prompt": "", "stream": False, "keep_alive": self.keep_alive}
+        try:
+            with self.http.post(self.base_url, payload) as response:
+                response.json()
+            return True
+        except Exception as e:
+            logger.error(f"Erro ao pré-carregar o modelo no Ollama: {e}")
+            return False
+        
+    def generate_sql_multi_table(self, nl_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                                 options: Optional[Dict[str, Any]] = None,
+                                 cancel: Optional[threading.Event] = None,
+                                 examples: Optional[List[Dict]] = None) -> str:
+        """
+        Gera SQL para múltiplas tabelas
+
+        Args:
+            options: Opções do Ollama que substituem as padrão (ex: temperature, seed)
+            cancel: Evento que interrompe a geração em andamento (apenas em streaming)
+            examples: Exemplos few-shot de NL->SQL incluídos após o prefixo fixo
+        """
+        logger.info(f"Gerando SQL multi-tabela para: {nl_query}")
+        with tracer.span("llm.generate", model=self.model_name):
+            prefix = PromptTemplates.multi_table_prefix(schemas, relationships)
+            prompt = prefix + PromptTemplates.multi_table_question(nl_query, examples, schemas)
+            start = time.perf_counter()
+            response = self._call_ollama(prompt, prefix, options, cancel)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Prompt de ~{estimate_tokens(prompt)} tokens gerado em {time.perf_counter() - start:.2f}s")
+            return clean_sql_query(response)
         
-    def generate_sql_multi_table(self, nl_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict]) -> str:
-        """Gera SQL para múltiplas tabelas"""
-        print(f"Gerando SQL multi-tabela para: {nl_query}")
-        prompt = PromptTemplates.multi_table_prompt(nl_query, schemas, relationships)
-        response = self._call_ollama(prompt)
-        return clean_sql_query(response)
+    def correct_sql_multi_table(self, bad_sql: str, error_msg: str, schemas: Dict[str, List[Dict]],
+                                relationships: List[Dict]) -> str:
+        """Pede ao modelo a correção de uma consulta multi-tabela rejeitada pelo banco"""
+        logger.info(f"Corrigindo SQL multi-tabela após erro: {error_msg}")
+        with tracer.span("llm.correct", model=self.model_name):
+            prompt = PromptTemplates.multi_table_error_correction_prompt(bad_sql, error_msg, schemas, relationships)
+            response = self._call_ollama(prompt, PromptTemplates.multi_table_prefix(schemas, relationships))
+            return clean_sql_query(response)
         
     def _build_prompt_table(self, nl_query: str, table_name: str, schema: List[Dict]) -> str:
         """Constrói prompt para o LLM"""
-        print(f"Construindo prompt para o modelo {self.model_name}")
+        logger.debug("Construindo prompt para o modelo %s", self.model_name)
 
         return PromptTemplates.basic_sql_generation(
             nl_query=nl_query,
@@ -28,20 +85,165 @@ class OllamaClient:
 
         # Usar templates de src/llm/prompt_templates.py
         
-    def _call_ollama(self, prompt: str) -> str:
-        """Chama API do Ollama"""
-        print(f"Chamando API do Ollama com o modelo {self.model_name}")
+    def _options(self, overrides: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        # Opções constantes entre chamadas: mudar num_ctx recarrega o modelo e descarta o cache
+        options: Dict[str, Any] = {"temperature": 0.3}
+        if self.num_ctx > 0:
+            options["num_ctx"] = self.num_ctx
+        # temperature/seed só afetam a amostragem: o cache do prefixo continua válido
+        options.update(overrides or {})
+        return options
+
+    def _call_ollama(self, prompt: str, prefix: str = "", options: Optional[Dict[str, Any]] = None,
+                     cancel: Optional[threading.Event] = None) -> str:
+        """
+        Chama API do Ollama
+
+        Args:
+            prompt: Prompt completo
+            prefix: Parte fixa do início do prompt, usada para agrupar as métricas de avaliação
+            options: Opções que substituem as padrão
+            cancel: Evento de cancelamento; sem streaming só é verificado antes da chamada
+        """
+        if self.stream:
+            return self._call_ollama_stream(prompt, prefix, options, cancel)
+        if cancel is not None and cancel.is_set():
+            return ""
+
+        logger.debug("Chamando API do Ollama com o modelo %s", self.model_name)
         payload = {
             "model": self.model_name,
             "prompt": prompt,
             "stream": False,
-            "options": {"temperature": 0.3}
+            "keep_alive": self.keep_alive,
+            "options": self._options(options)
         }
         
         try:
-            response = requests.post(self.base_url, json=payload)
-            response.raise_for_status()
-            return response.json()["response"]
+            with self.http.post(self.base_url, payload) as response:
+                data = response.json()
+            self._record_metrics(prefix, data)
+            return data["response"]
         except Exception as e:
-            print(f"Erro ao chamar Ollama: {e}")
-            return ""
\ No newline at end of file
+            logger.error(f"Erro ao chamar Ollama: {e}")
+            return ""
+
+    def _call_ollama_stream(self, prompt: str, prefix: str = "", options: Optional[Dict[str, Any]] = None,
+                            cancel: Optional[threading.Event] = None) -> str:
+        """
+        Chama a API do Ollama em modo streaming e interrompe a geração assim que
+        uma instrução SQL completa (bloco de código fechado ou ';') é emitida ou
+        quando `cancel` é sinalizado (retorna "")
+
+        Fechar a conexão faz o Ollama abortar a geração e liberar o slot do modelo.
+        Como a interrupção acontece antes do último chunk (o único com
+        prompt_eval_duration), o tempo até o primeiro token é registrado no
+        lugar: ele é dominado pela avaliação do prompt.
+        """
+        logger.debug("Chamando API do Ollama (streaming) com o modelo %s", self.model_name)
+        payload = {
+            "model": self.model_name,
+            "prompt": prompt,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+            "options": self._options(options)
+        }
+
+        start = time.perf_counter()
+        first_token = None
+        text = ""
+        try:
+            with self.http.post(self.base_url, payload, stream=True) as response:
+                for line in response.iter_lines():
+                    if cancel is not None and cancel.is_set():
+                        logger.debug("Geração cancelada após %.2fs", time.perf_counter() - start)
+                        return ""
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    if first_token is None:
+                        first_token = (time.perf_counter() - start) * 1000
+                    text += chunk.get("response", "")
+                    if chunk.get("done"):
+                        self._record_metrics(prefix, chunk, first_token)
+                        first_token = None
+                    end = find_sql_end(text)
+                    if end is not None:
+                        logger.debug("SQL completo após %.2fs; geração interrompida.", time.perf_counter() - start)
+                        return text[:end]
+                    if chunk.get("done"):
+                        break
+            logger.debug("Geração concluída em %.2fs", time.perf_counter() - start)
+            return text
+        except Exception as e:
+            logger.error(f"Erro ao chamar Ollama: {e}")
+            return ""
+        finally:
+            if first_token is not None:
+                # Interrompida antes do último chunk: sem as métricas do Ollama
+                tracer.set(ttft_ms=round(first_token, 3), early_stop=True)
+                tracer.observe("ollama.ttft_ms", first_token)
+                self._record_prompt_eval(prefix, first_token, None)
+
+    def _record_metrics(self, prefix: str, data: Dict[str, Any], first_token: Optional[float] = None):
+        """
+        Registra as métricas da resposta final do Ollama (durações em ns) no span
+        ativo e nos histogramas: tokens e tempo de avaliação do prompt e da geração
+        """
+        metrics: Dict[str, Any] = {}
+        if first_token is not None:
+            metrics["ttft_ms"] = round(first_token, 3)
+            tracer.observe("ollama.ttft_ms", first_token)
+        for field in ("prompt_eval_count", "eval_count"):
+            if field in data:
+                metrics[field] = data[field]
+                tracer.observe(f"ollama.{field}", data[field])
+        for field in ("load_duration", "prompt_eval_duration", "eval_duration", "total_duration"):
+            if field in data:
+                name = field.replace("_duration", "_ms")
+                metrics[name] = round(data[field] / 1e6, 3)
+                tracer.observe(f"ollama.{name}", metrics[name])
+        tracer.set(**metrics)
+        if "prompt_eval_ms" in metrics:
+            self._record_prompt_eval(prefix, metrics["prompt_eval_ms"], data.get("prompt_eval_count"))
+        elif first_token is not None:
+            self._record_prompt_eval(prefix, first_token, None)
+
+    def _record_prompt_eval(self, prefix: str, elapsed_ms: float, tokens: Optional[int]):
+        """
+        Registra o tempo de avaliação do prompt agrupado pelo hash do prefixo
+
+        Sem `tokens`, `elapsed_ms` é o tempo até o primeiro token (streaming interrompido).
+        Com o prefixo no cache KV do Ollama, as chamadas seguintes avaliam só a
+        parte variável: prompt_eval_count e o tempo caem em relação à primeira.
+        """
+        key = hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:10] if prefix else "-"
+        with self._stats_lock:
+            stats = self._prefix_stats.pop(key, None)
+            if stats is None:
+                stats = {"calls": 0, "first_ms": elapsed_ms, "repeat_ms": 0.0}
+            else:
+                stats["repeat_ms"] += elapsed_ms
+            stats["calls"] += 1
+            self._prefix_stats[key] = stats
+            while len(self._prefix_stats) > 256:
+                self._prefix_stats.popitem(last=False)
+            calls = stats["calls"]
+        if tokens is not None:
+            logger.debug("Prompt (prefixo %s, chamada %d): %s tokens avaliados em %.0fms", key, calls, tokens, elapsed_ms)
+        else:
+            logger.debug("Prompt (prefixo %s, chamada %d): primeiro token em %.0fms", key, calls, elapsed_ms)
+
+    def prompt_cache_stats(self) -> Dict[str, Any]:
+        """Tempo médio de avaliação do prompt na primeira chamada de cada prefixo e nas repetições"""
+        with self._stats_lock:
+            values = list(self._prefix_stats.values())
+        repeats = sum(s["calls"] - 1 for s in values)
+        return {
+            "prefixes": len(values),
+            "calls": sum(s["calls"] for s in values),
+            "first_ms_avg": round(sum(s["first_ms"] for s in values) / len(values), 1) if values else 0.0,
+            "repeat_ms_avg": round(sum(s["repeat_ms"] for s in values) / repeats, 1) if repeats else 0.0,
+        }
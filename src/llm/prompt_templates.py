@@ -1,4 +1,4 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 class PromptTemplates:
     @staticmethod
@@ -156,49 +156,137 @@ class PromptTemplates:
         Consulta corrigida:
         """
     
+    MULTI_TABLE_RULES = """### Regras:
+1. Use JOINs apropriados baseados nos relacionamentos fornecidos
+2. Inclua apenas as colunas necessárias
+3. Use aliases de tabela para evitar ambiguidade
+4. Retorne APENAS o SQL, sem explicações
+5. Use apenas o esquema fornecido - NÃO INVENTE COLUNAS
+6. Verifique cuidadosamente os nomes das colunas
+7. Para agregações, use GROUP BY quando necessário
+8. Mantenha a consulta eficiente e bem formatada"""
+
     @staticmethod
-    def multi_table_prompt(nl_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict]) -> str:
+    def multi_table_prefix(schemas: Dict[str, List[Dict]], relationships: List[Dict]) -> str:
         """
-        Template para consultas envolvendo múltiplas tabelas
-        
+        Parte fixa dos prompts multi-tabela: instruções, regras, esquemas e relacionamentos
+
+        O texto é idêntico byte a byte para o mesmo conjunto de tabelas, colunas e
+        relacionamentos (tabelas e relacionamentos em ordem estável), e a pergunta
+        vem só depois dele. Assim o Ollama reaproveita o cache KV do prefixo já
+        avaliado e só processa os tokens da pergunta. Colunas marcadas com "hint"
+        (escolhidas pela pergunta, ver ColumnPruner) ficam fora do prefixo e são
+        listadas por multi_table_hints.
+
         Args:
-            nl_query: Consulta em linguagem natural
             schemas: Dicionário com esquemas de todas as tabelas relevantes
             relationships: Lista de relacionamentos entre tabelas
-            
+
         Returns:
-            Prompt formatado para o LLM
+            Prefixo do prompt
         """
         schema_sections = []
-        for table_name, columns in schemas.items():
-            cols = "\n".join([f"- {col['name']} ({col['type']})" for col in columns])
+        for table_name in sorted(schemas, key=str.lower):
+            cols = "\n".join([f"- {col['name']} ({col['type']})" for col in schemas[table_name]
+                              if not col.get("hint")])
             schema_sections.append(f"### Tabela {table_name}:\n{cols}")
-        
+
         rel_section = ""
         if relationships:
-            rels = "\n".join([f"{rel['source_table']}.{rel['source_column']} → {rel['target_table']}.{rel['target_column']}" 
-                            for rel in relationships])
-            rel_section = f"\n### Relacionamentos:\n{rels}"
+            rels = sorted({f"{rel['source_table']}.{rel['source_column']} → {rel['target_table']}.{rel['target_column']}"
+                           for rel in relationships})
+            rel_section = "\n\n### Relacionamentos:\n" + "\n".join(rels)
+
+        return (
+            "Você é um especialista em SQL Server. Converta a solicitação do final em uma consulta SQL válida\n"
+            "usando as tabelas e relacionamentos abaixo.\n\n"
+            f"{PromptTemplates.MULTI_TABLE_RULES}\n\n"
+            + "\n\n".join(schema_sections)
+            + rel_section
+            + "\n\n"
+        )
+
+    @staticmethod
+    def multi_table_prompt(nl_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                           examples: Optional[List[Dict]] = None) -> str:
+        """
+        Template para consultas envolvendo múltiplas tabelas
         
-        return f"""
-        Você é um especialista em SQL Server. Converta a solicitação abaixo em uma consulta SQL válida
-        usando as seguintes tabelas e seus relacionamentos:
+        Args:
+            nl_query: Consulta em linguagem natural
+            schemas: Dicionário com esquemas de todas as tabelas relevantes
+            relationships: Lista de relacionamentos entre tabelas
+            examples: Exemplos de NL->SQL (opcional)
+            
+        Returns:
+            Prompt formatado para o LLM (prefixo fixo + solicitação)
+        """
+        return (PromptTemplates.multi_table_prefix(schemas, relationships)
+                + PromptTemplates.multi_table_question(nl_query, examples, schemas))
 
-        {''.join(schema_sections)}
-        {rel_section}
+    @staticmethod
+    def multi_table_hints(schemas: Optional[Dict[str, List[Dict]]]) -> str:
+        """Colunas escolhidas pela pergunta (marcadas com "hint"), fora do prefixo fixo"""
+        if not schemas:
+            return ""
+        hints = [f"- {table_name}.{col['name']} ({col['type']})"
+                 for table_name in sorted(schemas, key=str.lower)
+                 for col in schemas[table_name] if col.get("hint")]
+        if not hints:
+            return ""
+        return "### Colunas relevantes para a solicitação:\n" + "\n".join(hints) + "\n\n"
 
-        ### Solicitação:
-        {nl_query}
+    @staticmethod
+    def multi_table_question(nl_query: str, examples: Optional[List[Dict]] = None,
+                             schemas: Optional[Dict[str, List[Dict]]] = None) -> str:
+        """
+        Parte variável do prompt multi-tabela, acrescentada após multi_table_prefix
 
-        ### Regras:
-        1. Use JOINs apropriados baseados nos relacionamentos fornecidos
-        2. Inclua apenas as colunas necessárias
-        3. Use aliases de tabela para evitar ambiguidade
-        4. Retorne APENAS o SQL, sem explicações
-        5. Use apenas o esquema fornecido - NÃO INVENTE COLUNAS
-        6. Verifique cuidadosamente os nomes das colunas
-        7. Para agregações, use GROUP BY quando necessário
-        58 Mantenha a consulta eficiente e bem formatada
+        As colunas escolhidas pela pergunta e os exemplos mudam a cada pergunta e
+        por isso vêm depois do prefixo fixo; os exemplos seguem o formato de
+        advanced_sql_generation.
+        """
+        examples_section = ""
+        if examples:
+            examples_section = "### Exemplos:\n" + "\n\n".join(
+                [f"NL: {ex['nl']}\nSQL: {ex['sql']}" for ex in examples]
+            ) + "\n\n"
+        return (f"{PromptTemplates.multi_table_hints(schemas)}{examples_section}"
+                f"### Solicitação:\n{nl_query}\n\n### SQL:\n")
 
-        ### SQL:
+    @staticmethod
+    def multi_table_error_correction_prompt(bad_sql: str, error_msg: str, schemas: Dict[str, List[Dict]],
+                                            relationships: List[Dict]) -> str:
+        """
+        Template para correção de SQL multi-tabela com base no erro do banco
+
+        Começa pelo mesmo prefixo de multi_table_prompt para reaproveitar o cache do Ollama.
+        
+        Args:
+            bad_sql: Consulta SQL com erro
+            error_msg: Mensagem de erro do banco de dados (validação ou execução)
+            schemas: Dicionário com esquemas de todas as tabelas relevantes
+            relationships: Lista de relacionamentos entre tabelas
+            
+        Returns:
+            Prompt para correção de SQL
         """
+        prefix = PromptTemplates.multi_table_prefix(schemas, relationships)
+        return prefix + PromptTemplates.multi_table_hints(schemas) + f"""### Consulta com erro:
+{bad_sql}
+
+### Erro do SQL Server:
+{error_msg}
+
+Corrija a consulta SQL seguindo estas regras:
+1. Mantenha a intenção original da consulta
+2. Corrija apenas o necessário para resolver o erro
+3. Verifique especialmente:
+   - Nomes de colunas e a tabela a que pertencem
+   - Condições de JOIN de acordo com os relacionamentos
+   - Tipos de dados
+   - Sintaxe SQL Server
+4. Retorne APENAS a consulta corrigida, sem explicações
+
+### Consulta corrigida:
+"""
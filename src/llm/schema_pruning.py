@@ -0,0 +1,170 @@
+import json
+import math
+from collections import Counter
+from typing import List, Dict, Optional, Set
+from src.config.settings import settings
+from src.utils.text_utils import tokenize, split_identifier, estimate_tokens
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def load_annotations(path: Optional[str]) -> Dict[str, Dict[str, Dict]]:
+    """
+    Carrega apelidos e descrições opcionais de colunas
+
+    Formato do arquivo JSON:
+        {"st": {"ref": {"aliases": ["referencia", "artigo"], "description": "Referência do artigo"}}}
+
+    Returns:
+        Dicionário tabela (minúsculas) -> coluna (minúsculas) -> anotação
+    """
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Não foi possível carregar as anotações de esquema de {path}: {e}")
+        return {}
+    return {table.lower(): {col.lower(): ann for col, ann in cols.items()}
+            for table, cols in data.items()}
+
+
+def _column_line(col: Dict) -> str:
+    # Mesmo formato usado pelos templates de prompt
+    return f"- {col['name']} ({col['type']})"
+
+
+class ColumnPruner:
+    """
+    Seleciona as colunas mais relevantes para a pergunta antes de montar o prompt.
+
+    As colunas são pontuadas com BM25 sobre os termos do nome (snake_case e
+    camelCase quebrados, com stemming), apelidos e descrições opcionais.
+    Colunas de chave primária e estrangeira são sempre mantidas. Cada tabela
+    fica com no máximo `top_k` colunas e o bloco de esquema respeita
+    `token_budget` tokens estimados.
+
+    A seleção tem uma base que não depende da pergunta (chaves e as primeiras
+    `min_columns` colunas de cada tabela), usada no prefixo fixo do prompt, e
+    as colunas escolhidas pela pergunta, marcadas com "hint" para entrarem
+    depois do prefixo sem invalidar o cache do Ollama.
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, top_k: Optional[int] = None, token_budget: Optional[int] = None,
+                 min_columns: Optional[int] = None, annotations: Optional[Dict[str, Dict[str, Dict]]] = None):
+        self.top_k = top_k if top_k is not None else settings.PROMPT_COLUMNS_TOP_K
+        self.token_budget = token_budget if token_budget is not None else settings.PROMPT_TOKEN_BUDGET
+        self.min_columns = min_columns if min_columns is not None else settings.PROMPT_MIN_COLUMNS
+        self.annotations = (annotations if annotations is not None
+                            else load_annotations(settings.SCHEMA_ANNOTATIONS_PATH))
+
+    def _column_terms(self, table: str, col: Dict) -> List[str]:
+        terms = split_identifier(col["name"])
+        ann = self.annotations.get(table.lower(), {}).get(col["name"].lower())
+        if ann:
+            for alias in ann.get("aliases", []):
+                terms.extend(tokenize(alias))
+            terms.extend(tokenize(ann.get("description", "")))
+        return terms
+
+    def score_columns(self, question: str, schemas: Dict[str, List[Dict]]) -> Dict[str, List[float]]:
+        """Pontuação BM25 de cada coluna em relação à pergunta"""
+        query = set(tokenize(question))
+        docs = {table: [Counter(self._column_terms(table, col)) for col in columns]
+                for table, columns in schemas.items()}
+
+        all_docs = [doc for table_docs in docs.values() for doc in table_docs]
+        if not all_docs or not query:
+            return {table: [0.0] * len(columns) for table, columns in schemas.items()}
+        avg_len = sum(sum(d.values()) for d in all_docs) / len(all_docs) or 1.0
+        df = Counter(term for d in all_docs for term in d if term in query)
+        n = len(all_docs)
+        idf = {t: math.log(1 + (n - df[t] + 0.5) / (df[t] + 0.5)) for t in df}
+
+        scores = {}
+        for table, table_docs in docs.items():
+            table_scores = []
+            for doc in table_docs:
+                length = sum(doc.values()) or 1
+                score = 0.0
+                for term, weight in idf.items():
+                    tf = doc.get(term, 0)
+                    if tf:
+                        score += weight * tf * (self.K1 + 1) / (
+                            tf + self.K1 * (1 - self.B + self.B * length / avg_len))
+                table_scores.append(score)
+            scores[table] = table_scores
+        return scores
+
+    def prune(self, question: str, schemas: Dict[str, List[Dict]],
+              relationships: List[Dict]) -> Dict[str, List[Dict]]:
+        """
+        Reduz o esquema às colunas relevantes para a pergunta
+
+        Args:
+            question: Pergunta em linguagem natural
+            schemas: Esquemas completos por tabela
+            relationships: Relacionamentos (suas colunas são sempre mantidas)
+
+        Returns:
+            Esquemas podados, preservando a ordem original das colunas; as colunas
+            escolhidas pela pergunta (fora da base fixa) são cópias com "hint": True
+        """
+        key_columns: Dict[str, Set[str]] = {}
+        for rel in relationships:
+            key_columns.setdefault(rel["source_table"].lower(), set()).add(rel["source_column"].lower())
+            key_columns.setdefault(rel["target_table"].lower(), set()).add(rel["target_column"].lower())
+
+        scores = self.score_columns(question, schemas)
+        # (tabela, índice) -> (obrigatória, base fixa, pontuação)
+        kept: Dict[str, Dict[int, tuple]] = {}
+        for table, columns in schemas.items():
+            keys = key_columns.get(table.lower(), set())
+            mandatory = {i for i, col in enumerate(columns)
+                         if col.get("primary_key") or col["name"].lower() in keys}
+            if not self.top_k or len(columns) <= self.top_k:
+                base = set(range(len(columns)))
+                chosen = set(base)
+            else:
+                # Base independente da pergunta: chaves e as primeiras colunas, para dar contexto ao modelo
+                base = set(mandatory)
+                for i in range(len(columns)):
+                    if len(base) >= max(self.min_columns, len(mandatory)):
+                        break
+                    base.add(i)
+                ranked = sorted((i for i in range(len(columns)) if i not in base and scores[table][i] > 0),
+                                key=lambda i: -scores[table][i])
+                chosen = base | set(ranked[:max(0, self.top_k - len(base))])
+            kept[table] = {i: (i in mandatory, i in base, scores[table][i]) for i in chosen}
+
+        if self.token_budget:
+            self._apply_budget(schemas, kept)
+
+        return {table: [col if kept[table][i][1] else dict(col, hint=True)
+                        for i, col in enumerate(columns) if i in kept[table]]
+                for table, columns in schemas.items()}
+
+    def _apply_budget(self, schemas: Dict[str, List[Dict]], kept: Dict[str, Dict[int, tuple]]):
+        """
+        Remove colunas opcionais até caber no orçamento de tokens: primeiro as
+        escolhidas pela pergunta, da menor pontuação para a maior, e depois as
+        da base pela posição (do fim para o início), para que a base continue
+        independente da pergunta
+        """
+        cost = {(t, i): estimate_tokens(_column_line(schemas[t][i])) + 1 for t in kept for i in kept[t]}
+        total = sum(cost.values())
+        if total <= self.token_budget:
+            return
+        optional = sorted(((base, score if not base else -i, t, i)
+                           for t in kept for i, (mandatory, base, score) in kept[t].items()
+                           if not mandatory), key=lambda x: (x[0], x[1]))
+        for _, _, table, i in optional:
+            if total <= self.token_budget:
+                break
+            del kept[table][i]
+            total -= cost[(table, i)]
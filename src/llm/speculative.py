@@ -0,0 +1,153 @@
+"""
+Geração especulativa de SQL
+
+Dispara várias gerações do mesmo prompt em paralelo, com temperaturas e
+sementes diferentes, verifica cada candidato assim que chega (sintaxe,
+validação no banco e plano estimado) e fica com o primeiro aprovado; as
+gerações restantes são canceladas (a conexão de streaming é fechada e o
+Ollama libera o slot).
+
+O prompt é o mesmo em todas as variantes: o prefixo estável continua no
+cache KV do Ollama e só a amostragem muda. Cada candidato ocupa um slot do
+modelo, por isso o número de candidatos não deve passar de
+OLLAMA_NUM_PARALLEL.
+"""
+import contextvars
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from src.config.settings import settings
+from src.utils.logger import get_logger
+from src.utils.tracing import tracer
+
+logger = get_logger(__name__)
+
+
+def speculative_variants(count: int, temperatures: List[float]) -> List[Dict[str, Any]]:
+    """
+    Variantes de amostragem dos candidatos
+
+    As primeiras usam as temperaturas sem semente (a primeira equivale à
+    geração normal); as seguintes repetem as temperaturas com sementes fixas.
+    """
+    variants = []
+    for i in range(count):
+        temperature = temperatures[i % len(temperatures)]
+        options: Dict[str, Any] = {"temperature": temperature}
+        name = f"t{temperature:g}"
+        if i >= len(temperatures):
+            options["seed"] = i
+            name += f"-s{i}"
+        variants.append({"name": name, "options": options})
+    return variants
+
+
+class SpeculativeGenerator:
+    """
+    Gera candidatos em paralelo e retorna o primeiro aprovado pela verificação
+
+    Args:
+        llm: Cliente do modelo (OllamaClient)
+        variants: Lista de {"name", "options"} (padrão: SPECULATIVE_CANDIDATES / SPECULATIVE_TEMPERATURES)
+    """
+
+    def __init__(self, llm, variants: Optional[List[Dict[str, Any]]] = None):
+        self.llm = llm
+        self.variants = variants or speculative_variants(settings.SPECULATIVE_CANDIDATES,
+                                                         settings.SPECULATIVE_TEMPERATURES)
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Counter] = {v["name"]: Counter() for v in self.variants}
+        self._rounds = Counter()
+
+    def generate(self, nl_query: str, schemas: Dict[str, List[Dict]], relationships: List[Dict],
+                 check: Callable[[str], Optional[str]], llm=None,
+                 examples: Optional[List[Dict]] = None) -> Tuple[str, bool]:
+        """
+        Dispara as variantes e aguarda o primeiro candidato aprovado
+
+        Args:
+            check: Verificação do candidato; retorna a mensagem de erro ou None se aprovado
+            llm: Cliente usado nesta geração (padrão: self.llm), ex: o modelo escolhido pelo roteador
+            examples: Exemplos few-shot repassados a todos os candidatos
+
+        Returns:
+            (SQL, True) com o vencedor, ou (primeiro candidato não vazio, False) se
+            nenhum foi aprovado, para seguir o fluxo normal de correção
+        """
+        cancel = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(self.variants), thread_name_prefix="speculative")
+        futures = {}
+        for variant in self.variants:
+            self._count(variant["name"], "launched")
+            # Cada candidato roda em uma cópia do contexto: seus spans ficam sob a etapa atual
+            context = contextvars.copy_context()
+            future = executor.submit(context.run, self._candidate, llm or self.llm, variant, nl_query,
+                                     schemas, relationships, check, cancel, examples)
+            futures[future] = variant["name"]
+
+        winner: Optional[Tuple[str, str]] = None
+        fallback = ""
+        try:
+            for future in as_completed(futures):
+                try:
+                    sql_query, error = future.result()
+                except Exception as e:
+                    logger.warning(f"Candidato {futures[future]} falhou: {e}")
+                    continue
+                if error is None:
+                    winner = (futures[future], sql_query)
+                    break
+                fallback = fallback or sql_query
+        finally:
+            cancel.set()
+            # Candidatos ainda na fila não chegam a rodar (cancel_futures exige Python 3.9)
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+        with self._lock:
+            self._rounds["rounds"] += 1
+            if winner:
+                self._stats[winner[0]]["won"] += 1
+            else:
+                self._rounds["no_winner"] += 1
+        if winner:
+            logger.info(f"Candidato vencedor: {winner[0]}")
+            tracer.set(winner=winner[0], candidates=len(self.variants))
+            return winner[1], True
+        logger.info("Nenhum candidato aprovado; seguindo com a correção do primeiro.")
+        tracer.set(winner=None, candidates=len(self.variants))
+        return fallback, False
+
+    def _candidate(self, llm, variant: Dict[str, Any], nl_query: str, schemas: Dict[str, List[Dict]],
+                   relationships: List[Dict], check: Callable[[str], Optional[str]],
+                   cancel: threading.Event, examples: Optional[List[Dict]] = None) -> Tuple[str, Optional[str]]:
+        """Gera e verifica um candidato; retorna (SQL, erro)"""
+        name = variant["name"]
+        with tracer.span("candidate", variant=name) as span:
+            sql_query = llm.generate_sql_multi_table(nl_query, schemas, relationships,
+                                                     options=variant["options"], cancel=cancel, examples=examples)
+            if cancel.is_set():
+                # Outro candidato já venceu: não vale verificar
+                span.set(cancelled=True)
+                self._count(name, "cancelled")
+                return sql_query, "cancelado"
+            error = check(sql_query) if sql_query else "resposta vazia"
+            span.set(passed=error is None)
+            self._count(name, "passed" if error is None else "failed")
+            return sql_query, error
+
+    def _count(self, name: str, outcome: str):
+        with self._lock:
+            self._stats[name][outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Rodadas, rodadas sem vencedor e, por variante, candidatos e taxa de vitória"""
+        with self._lock:
+            rounds = dict(self._rounds)
+            variants = {name: dict(counter) for name, counter in self._stats.items()}
+        for counter in variants.values():
+            launched = counter.get("launched", 0)
+            counter["win_rate"] = round(counter.get("won", 0) / launched, 3) if launched else 0.0
+        return {"rounds": rounds.get("rounds", 0), "no_winner": rounds.get("no_winner", 0), "variants": variants}
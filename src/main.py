@@ -1,8 +1,13 @@
 from src.core.assistant import SQLAIAssistant
 from src.config.settings import settings
 import os
+import queue
 import sys
+import threading
+import time
 from src.config.config_env import env_manager
+from src.utils.logger import configure_logging
+from src.utils.tracing import configure_tracing, tracer
 
 def get_environment_config(env_name: str) -> dict:
     """
@@ -47,12 +52,87 @@ def get_environment_config(env_name: str) -> dict:
     })
 
 
+def get_db_config() -> dict:
+    """Configuração do banco de dados a partir das variáveis de ambiente"""
+    if not os.getenv("DB_SERVER"):
+        print("Variáveis de ambiente do banco de dados não encontradas. Usando valores padrão.")
+    return {
+        "server": os.getenv("DB_SERVER", "127.0.0.1,1433"),
+        "database": os.getenv("DB_NAME", "inovprod"),
+        "username": os.getenv("DB_USER", "sa"),
+        "password": os.getenv("DB_PASSWORD", "AFM1234rtb")
+    }
+
+
+def print_rows(assistant: SQLAIAssistant, question: str, table_names: list) -> int:
+    """
+    Imprime as linhas à medida que chegam do banco; Ctrl+C cancela a consulta
+
+    A solicitação roda em uma thread separada porque o driver ODBC bloqueia a
+    thread que executa a instrução: a thread principal continua livre para
+    receber o Ctrl+C e cancelar a instrução no servidor.
+
+    Returns:
+        Número de linhas impressas
+    """
+    rows: queue.Queue = queue.Queue(maxsize=settings.DB_FETCH_BATCH_SIZE)
+    cancel = threading.Event()
+    done = object()
+
+    def produce():
+        results = assistant.iter_nl_request(question, table_names, cancel=cancel)
+        try:
+            for row in results:
+                while not cancel.is_set():
+                    try:
+                        rows.put(row, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if cancel.is_set():
+                    break
+        finally:
+            results.close()
+            rows.put(done)
+
+    worker = threading.Thread(target=produce, name="repl-query", daemon=True)
+    worker.start()
+    row_count = 0
+    try:
+        while True:
+            try:
+                # Espera com timeout para que o Ctrl+C seja atendido
+                row = rows.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if row is done:
+                break
+            print(row)
+            row_count += 1
+    except KeyboardInterrupt:
+        cancel.set()
+        cancelled = assistant.db.cancel_running()
+        print(f"\nCancelando solicitação ({cancelled} consulta(s) em execução)...")
+        # Esvazia a fila para liberar a thread e aguarda o encerramento
+        while worker.is_alive():
+            try:
+                rows.get(timeout=0.2)
+            except queue.Empty:
+                pass
+    worker.join()
+    return row_count
+
+
 def main():
 
     env_name = os.getenv("APP_ENV", "dev")
     if len(sys.argv) > 1:
         env_name = sys.argv[1]
+    env_start = time.perf_counter()
     env_manager.load_environment(env_name)
+    configure_logging()
+    configure_tracing()
+    env_elapsed = time.perf_counter() - env_start
 
     # Obter configuração do ambiente
     env_config = get_environment_config(env_name)
@@ -71,39 +151,58 @@ def main():
 
 
     # Configuração do banco de dados
-    if not os.getenv("DB_SERVER"):
-        print("Variáveis de ambiente do banco de dados não encontradas. Usando valores padrão.")
-    db_config = {
-        "server": os.getenv("DB_SERVER", "127.0.0.1,1433"),
-        "database": os.getenv("DB_NAME", "inovprod"),
-        "username": os.getenv("DB_USER", "sa"),
-        "password": os.getenv("DB_PASSWORD", "AFM1234rtb")
-    }
+    db_config = get_db_config()
     
     assistant = SQLAIAssistant(db_config, model_name=os.getenv("LLM_MODEL", "llama3.2"))
     
-    if assistant.db.connect():
-        try:
-            while True:
-                question = input("\nDigite sua pergunta (ou 'sair' para encerrar):\n")
-                if question.strip().lower() in ["sair", "exit", "quit"]:
-                    print("Encerrando assistente.")
-                    break
+    # Banco, catálogo de esquema e modelo são preparados em paralelo
+    try:
+        timings = assistant.start()
+    except ConnectionError as e:
+        print(f"Erro na inicialização: {e}")
+        return
+    timings = {"ambiente": env_elapsed, **timings}
+    print("Tempos de inicialização: " + ", ".join(f"{phase}={elapsed:.2f}s" for phase, elapsed in timings.items()))
 
-                tabelas = input("Indique as tabelas (ex: Produto, Lote) separadas por vírgula:\n")
-                table_names = [t.strip() for t in tabelas.split(",") if t.strip()]
-                if not table_names:
-                    print("Nenhuma tabela informada. Usando configuração padrão.")
-                    table_names = env_config["table_names"]
-
-                results = assistant.process_nl_request(
-                    question,
-                    table_names
-                )
-                for row in results:
-                    print(row)
-        finally:
-            assistant.db.close()
+    try:
+        while True:
+            question = input("\nDigite sua pergunta (ou 'sair' para encerrar):\n")
+            if question.strip().lower() in ["sair", "exit", "quit"]:
+                print("Encerrando assistente.")
+                break
+
+            tabelas = input("Indique as tabelas (ex: Produto, Lote) separadas por vírgula, ou Enter para seleção automática:\n")
+            table_names = [t.strip() for t in tabelas.split(",") if t.strip()]
+            if not table_names:
+                print("Nenhuma tabela informada. Selecionando tabelas automaticamente.")
+                table_names = assistant.suggest_tables(question)
+            if not table_names:
+                print("Nenhuma tabela encontrada para a pergunta. Usando configuração padrão.")
+                table_names = env_config["table_names"]
+
+            row_count = print_rows(assistant, question, table_names)
+            print(f"{row_count} linha(s) retornada(s).")
+    finally:
+        print(f"Estatísticas do pool de conexões: {assistant.db.pool_stats()}")
+        if assistant.guard:
+            print(f"Estatísticas do guarda de consultas: {assistant.guard.stats()}")
+        if assistant.db.result_cache:
+            print(f"Estatísticas do cache de resultados: {assistant.db.result_cache.stats()}")
+        if assistant.generation_cache:
+            print(f"Estatísticas do cache de geração: {assistant.generation_cache.stats()}")
+        if assistant.examples:
+            print(f"Índice de exemplos: {assistant.examples.stats()}")
+        if assistant.speculative:
+            print(f"Geração especulativa: {assistant.speculative.stats()}")
+        if assistant.router:
+            print(f"Roteador de modelos: {assistant.router.stats()}")
+            assistant.router.save()
+        print(f"Avaliação do prompt no Ollama: {assistant.llm.prompt_cache_stats()}")
+        print("Latência por etapa (ms):")
+        for stage, summary in tracer.stats().items():
+            print(f"  {stage}: {summary}")
+        assistant.db.close()
+        tracer.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,296 @@
+"""
+Modo servidor HTTP do assistente
+
+Uso:
+    python -m src.server [ambiente]
+
+Todas as solicitações compartilham um único SQLAIAssistant: o mesmo pool de
+conexões, o mesmo catálogo de esquema e os mesmos caches.
+
+Endpoints:
+    POST /query   {"question": "...", "tables": ["st", "se"], "stream": false}
+                  -> {"rows": [...], "row_count": n, "elapsed": s}
+                  Com "stream": true, as linhas são enviadas como NDJSON à
+                  medida que chegam do banco; erros antes da primeira linha
+                  têm status próprio (422, 504, 500) e, depois dela, vão na
+                  última linha como {"error": "..."}.
+    GET  /health  Estado do servidor e do pool de conexões
+    GET  /stats   Vazão, latências (p50/p95/p99) por solicitação e por etapa e
+                  estatísticas de pool e caches
+"""
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional
+from flask import Flask, Response, jsonify, request
+from werkzeug.serving import make_server
+from src.config.settings import settings
+from src.config.config_env import env_manager
+from src.core.assistant import SQLAIAssistant
+from src.main import get_db_config
+from src.utils.json_utils import json_default
+from src.utils.logger import configure_logging, get_logger
+from src.utils.tracing import configure_tracing, percentile, tracer
+
+logger = get_logger(__name__)
+
+_NO_ROWS = object()
+
+
+class RequestLimiter:
+    """
+    Limita as solicitações simultâneas e mede vazão e latência.
+
+    Quando todas as vagas estão ocupadas a solicitação aguarda até
+    `queue_timeout` segundos e depois é recusada (429), para que a fila não
+    cresça sem limite atrás do Ollama e do banco.
+    """
+
+    def __init__(self, max_concurrent: int, queue_timeout: float, window: int = 1000):
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._lock = threading.Condition()
+        self._in_flight = 0
+        self._draining = False
+        self._started = time.time()
+        self._latencies = deque(maxlen=window)
+        self._counts = {"accepted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def acquire(self) -> bool:
+        """Reserva uma vaga; False se o servidor estiver saturado ou encerrando"""
+        if self._draining:
+            return False
+        if self.queue_timeout > 0:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        with self._lock:
+            if not acquired or self._draining:
+                if acquired:
+                    self._slots.release()
+                self._counts["rejected"] += 1
+                return False
+            self._in_flight += 1
+            self._counts["accepted"] += 1
+        return True
+
+    def release(self, elapsed: float, failed: bool = False):
+        with self._lock:
+            self._in_flight -= 1
+            self._counts["failed" if failed else "completed"] += 1
+            self._latencies.append(elapsed)
+            self._lock.notify_all()
+        self._slots.release()
+
+    def drain(self, timeout: float) -> bool:
+        """Recusa novas solicitações e aguarda as em andamento; False se o tempo esgotar"""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            self._draining = True
+            while self._in_flight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    @property
+    def draining(self) -> bool:
+        return self._draining
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = list(self._latencies)
+            stats: Dict[str, Any] = dict(self._counts)
+            stats["in_flight"] = self._in_flight
+        uptime = time.time() - self._started
+        stats.update(
+            max_concurrent=self.max_concurrent,
+            uptime=round(uptime, 1),
+            throughput=round(stats["completed"] / uptime, 3) if uptime else 0.0,
+            latency_p50=round(percentile(latencies, 0.50), 3),
+            latency_p95=round(percentile(latencies, 0.95), 3),
+            latency_p99=round(percentile(latencies, 0.99), 3),
+        )
+        return stats
+
+
+def _error_status(error: Exception) -> int:
+    """Status HTTP de uma solicitação que falhou antes de enviar a resposta"""
+    if isinstance(error, TimeoutError):
+        return 504
+    if isinstance(error, ValueError):
+        # Consulta rejeitada pelo guarda, inválida após as correções ou sem tabelas identificadas
+        return 422
+    return 500
+
+
+def create_app(assistant: SQLAIAssistant, limiter: Optional[RequestLimiter] = None) -> Flask:
+    """
+    Cria a aplicação Flask que atende as solicitações com o assistente compartilhado
+
+    Args:
+        assistant: Assistente já iniciado (start())
+        limiter: Limitador de concorrência (padrão: SERVER_MAX_CONCURRENT / SERVER_QUEUE_TIMEOUT)
+    """
+    app = Flask(__name__)
+    limiter = limiter or RequestLimiter(settings.SERVER_MAX_CONCURRENT, settings.SERVER_QUEUE_TIMEOUT)
+    app.config["limiter"] = limiter
+
+    def dumps(value) -> str:
+        return json.dumps(value, default=json_default, ensure_ascii=False)
+
+    @app.post("/query")
+    def query():
+        payload = request.get_json(silent=True) or {}
+        question = str(payload.get("question", "")).strip()
+        tables = payload.get("tables") or []
+        if isinstance(tables, str):
+            tables = [t.strip() for t in tables.split(",") if t.strip()]
+        if not question:
+            return jsonify(error="Campo 'question' é obrigatório"), 400
+        if not isinstance(tables, list):
+            return jsonify(error="Campo 'tables' deve ser uma lista"), 400
+        if not all(isinstance(t, str) and t.strip() for t in tables):
+            return jsonify(error="Campo 'tables' deve conter apenas nomes de tabela não vazios"), 400
+        tables = [t.strip() for t in tables]
+
+        if not limiter.acquire():
+            status = 503 if limiter.draining else 429
+            response = jsonify(error="Servidor ocupado, tente novamente" if status == 429
+                               else "Servidor em encerramento")
+            response.headers["Retry-After"] = "1"
+            return response, status
+
+        start = time.perf_counter()
+        if payload.get("stream"):
+            state = {"failed": False}
+            rows = assistant.stream_nl_request(question, tables)
+            try:
+                # Geração e execução até a primeira linha: erros até aqui ainda têm status HTTP próprio
+                first = next(rows, _NO_ROWS)
+            except Exception as e:
+                limiter.release(time.perf_counter() - start, failed=True)
+                return jsonify(error=str(e)), _error_status(e)
+            except BaseException:
+                rows.close()
+                limiter.release(time.perf_counter() - start, failed=True)
+                raise
+
+            def generate():
+                if first is _NO_ROWS:
+                    return
+                try:
+                    yield dumps(first) + "\n"
+                    for row in rows:
+                        yield dumps(row) + "\n"
+                except Exception as e:
+                    # O status HTTP já foi enviado: o erro vai na última linha
+                    state["failed"] = True
+                    yield dumps({"error": str(e)}) + "\n"
+
+            def on_close():
+                # Chamado pelo servidor ao fim da resposta, inclusive se o cliente desconectar
+                rows.close()
+                limiter.release(time.perf_counter() - start, state["failed"])
+
+            response = Response(generate(), mimetype="application/x-ndjson")
+            response.call_on_close(on_close)
+            return response
+
+        try:
+            result = list(assistant.stream_nl_request(question, tables))
+        except Exception as e:
+            limiter.release(time.perf_counter() - start, failed=True)
+            return jsonify(error=str(e)), _error_status(e)
+        elapsed = time.perf_counter() - start
+        limiter.release(elapsed)
+        body = dumps({"rows": result, "row_count": len(result), "elapsed": round(elapsed, 3)})
+        return Response(body, mimetype="application/json")
+
+    @app.get("/health")
+    def health():
+        status = "draining" if limiter.draining else "ok"
+        return jsonify(status=status, pool=assistant.db.pool_stats()), (503 if limiter.draining else 200)
+
+    @app.get("/stats")
+    def stats():
+        body: Dict[str, Any] = {"server": limiter.stats(), "pool": assistant.db.pool_stats(),
+                                "prompt_cache": assistant.llm.prompt_cache_stats(), "stages": tracer.stats()}
+        if assistant.generation_cache:
+            body["generation_cache"] = assistant.generation_cache.stats()
+        if assistant.examples:
+            body["examples"] = assistant.examples.stats()
+        if assistant.db.result_cache:
+            body["result_cache"] = assistant.db.result_cache.stats()
+        if assistant.guard:
+            body["query_guard"] = assistant.guard.stats()
+        if assistant.flights:
+            body["single_flight"] = assistant.flights.stats()
+        if assistant.speculative:
+            body["speculative"] = assistant.speculative.stats()
+        if assistant.router:
+            body["model_router"] = assistant.router.stats()
+        return Response(dumps(body), mimetype="application/json")
+
+    return app
+
+
+def serve(assistant: SQLAIAssistant, host: Optional[str] = None, port: Optional[int] = None):
+    """
+    Atende as solicitações até SIGTERM/SIGINT e encerra de forma ordenada:
+    para de aceitar conexões, aguarda as solicitações em andamento (até
+    SERVER_SHUTDOWN_TIMEOUT), cancela as consultas restantes e fecha o pool
+    """
+    app = create_app(assistant)
+    limiter: RequestLimiter = app.config["limiter"]
+    server = make_server(host or settings.SERVER_HOST, port or settings.SERVER_PORT, app, threaded=True)
+
+    def request_shutdown(signum, frame):
+        logger.info(f"Sinal {signum} recebido. Encerrando servidor...")
+        # shutdown() bloqueia até serve_forever terminar: precisa rodar em outra thread
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, request_shutdown)
+    signal.signal(signal.SIGINT, request_shutdown)
+
+    logger.info(f"Servidor ouvindo em http://{server.host}:{server.port} "
+                f"(até {limiter.max_concurrent} solicitações simultâneas)")
+    try:
+        server.serve_forever()
+    finally:
+        if not limiter.drain(settings.SERVER_SHUTDOWN_TIMEOUT):
+            logger.warning(f"Cancelando {assistant.db.cancel_running()} consulta(s) em andamento.")
+        server.server_close()
+        logger.info(f"Estatísticas do servidor: {limiter.stats()}")
+        if assistant.router:
+            assistant.router.save()
+        assistant.db.close()
+        tracer.close()
+
+
+def main():
+    env_name = os.getenv("APP_ENV", "dev")
+    if len(sys.argv) > 1:
+        env_name = sys.argv[1]
+    env_manager.load_environment(env_name)
+    configure_logging()
+    configure_tracing()
+
+    assistant = SQLAIAssistant(get_db_config(), model_name=os.getenv("LLM_MODEL", "llama3.2"))
+    try:
+        timings = assistant.start()
+    except ConnectionError as e:
+        logger.error(f"Erro na inicialização: {e}")
+        return
+    logger.info("Tempos de inicialização: " + ", ".join(f"{phase}={elapsed:.2f}s" for phase, elapsed in timings.items()))
+    serve(assistant)
+
+
+if __name__ == "__main__":
+    main()
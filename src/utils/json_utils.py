@@ -0,0 +1,16 @@
+import datetime
+import decimal
+import uuid
+
+
+def json_default(value):
+    """Serializa os tipos retornados pelo pyodbc que o json não conhece"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return str(value)
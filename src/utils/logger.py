@@ -0,0 +1,35 @@
+import logging
+import sys
+from src.config.settings import settings
+
+# Todos os módulos usam loggers filhos de "src" (logging.getLogger(__name__))
+_ROOT = "src"
+_handler = None
+
+
+def configure_logging(level: str = None):
+    """
+    Configura o nível e o formato das mensagens do assistente
+
+    Pode ser chamada novamente após carregar o .env do ambiente para
+    aplicar LOG_LEVEL / LOG_FORMAT definidos nele.
+
+    Args:
+        level: Nível (padrão: settings.LOG_LEVEL)
+    """
+    global _handler
+    root = logging.getLogger(_ROOT)
+    if _handler is None:
+        _handler = logging.StreamHandler(sys.stderr)
+        root.addHandler(_handler)
+        root.propagate = False
+    _handler.setFormatter(logging.Formatter(settings.LOG_FORMAT))
+    level = (level or settings.LOG_LEVEL).upper()
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger do módulo, configurado com LOG_LEVEL na primeira chamada"""
+    if _handler is None:
+        configure_logging()
+    return logging.getLogger(name)
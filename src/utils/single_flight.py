@@ -0,0 +1,115 @@
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "abandoned", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.abandoned = False
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas idênticas simultâneas: apenas a primeira (líder) executa
+    e as demais aguardam e recebem o mesmo resultado ou a mesma exceção.
+
+    Não é um cache: a chave sai do grupo assim que o líder termina. Se o
+    líder desistir sem resultado (cancelamento, consumidor que parou de ler),
+    um dos que aguardam assume como novo líder.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "failures": 0, "abandoned": 0}
+
+    def begin(self, key: Hashable) -> Tuple[_Call, bool]:
+        """
+        Entra no grupo da chave
+
+        Returns:
+            (chamada, True se o chamador é o líder e deve executar e chamar finish())
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._stats["coalesced"] += 1
+                return call, False
+            call = self._calls[key] = _Call()
+            self._stats["leaders"] += 1
+            return call, True
+
+    def finish(self, key: Hashable, call: _Call, result: Any = None, error: Optional[BaseException] = None,
+               abandoned: bool = False):
+        """Publica o resultado do líder (ou o erro, ou a desistência) e libera os que aguardam"""
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            if error is not None:
+                self._stats["failures"] += 1
+            if abandoned:
+                self._stats["abandoned"] += 1
+        call.result, call.error, call.abandoned = result, error, abandoned
+        call.done.set()
+
+    def wait(self, call: _Call, cancel: Optional[threading.Event] = None) -> Tuple[Any, bool]:
+        """
+        Aguarda o líder
+
+        Returns:
+            (resultado, False) ou (None, True) se o líder desistiu e a chamada deve ser refeita
+
+        Raises:
+            A exceção do líder, ou InterruptedError se `cancel` for acionado durante a espera
+        """
+        while not call.done.wait(0.2):
+            if cancel is not None and cancel.is_set():
+                raise InterruptedError("Solicitação cancelada")
+        if call.abandoned:
+            return None, True
+        if call.error is not None:
+            raise call.error
+        return call.result, False
+
+    def do(self, key: Hashable, func: Callable[[], Any], cancel: Optional[threading.Event] = None) -> Tuple[Any, bool]:
+        """
+        Executa `func` uma única vez por chave entre chamadas simultâneas
+
+        Returns:
+            (resultado, True se o resultado veio de outra chamada)
+        """
+        while True:
+            call, leader = self.begin(key)
+            if not leader:
+                result, retry = self.wait(call, cancel)
+                if retry:
+                    continue
+                return result, True
+            try:
+                result = func()
+            except InterruptedError:
+                # Cancelamento do líder não é erro dos demais: um deles refaz a chamada
+                self.finish(key, call, abandoned=True)
+                raise
+            except Exception as e:
+                self.finish(key, call, error=e)
+                raise
+            except BaseException:
+                # KeyboardInterrupt, GeneratorExit...
+                self.finish(key, call, abandoned=True)
+                raise
+            self.finish(key, call, result=result)
+            return result, False
+
+    def stats(self) -> Dict[str, int]:
+        """Líderes, chamadas agrupadas, falhas propagadas e desistências"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+            return stats
@@ -0,0 +1,156 @@
+import re
+from typing import List, NamedTuple, Iterator
+
+# Um único padrão compilado: cada posição do texto casa exatamente um grupo,
+# na ordem abaixo, e finditer percorre a consulta uma única vez.
+_MASTER = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>N?'(?:[^']|'')*')
+  | (?P<quoted>\[(?:[^\]]|\]\])*\]|"(?:[^"]|"")*")
+  | (?P<number>0x[0-9A-Fa-f]*|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<variable>@@?[\w@#$]+)
+  | (?P<word>\#{0,2}[^\W\d][\w@#$]*)
+  | (?P<operator><>|!=|<=|>=|!<|!>|::|[-+*/%&|^=<>~!.,;()])
+  | (?P<unterminated>N?'.*|\[.*|".*|/\*.*)
+  | (?P<error>.)
+""", re.VERBOSE | re.DOTALL)
+
+TRIVIA = ("ws", "comment")
+
+# Palavras que iniciam uma nova instrução quando aparecem fora de parênteses
+STATEMENT_KEYWORDS = frozenset({
+    "SELECT", "INSERT", "UPDATE", "DELETE", "MERGE", "DROP", "CREATE", "ALTER", "TRUNCATE",
+    "EXEC", "EXECUTE", "DECLARE", "SET", "USE", "GRANT", "REVOKE", "DENY", "BACKUP", "RESTORE",
+    "DBCC", "KILL", "SHUTDOWN", "WAITFOR", "PRINT", "IF", "WHILE", "BEGIN", "RAISERROR", "THROW",
+    "RETURN", "GO",
+})
+
+# Cláusulas de nível superior de uma consulta
+CLAUSE_KEYWORDS = frozenset({
+    "WITH", "SELECT", "INTO", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT",
+    "INTERSECT", "OPTION", "OFFSET", "FETCH",
+})
+
+_SET_OPERATORS = frozenset({"UNION", "ALL", "EXCEPT", "INTERSECT"})
+
+
+class Token(NamedTuple):
+    type: str       # ws, comment, string, quoted, number, variable, word, operator, unterminated, error
+    value: str
+    start: int
+    depth: int      # profundidade de parênteses (o par de parênteses fica na profundidade externa)
+
+    @property
+    def upper(self) -> str:
+        return self.value.upper()
+
+    def is_word(self, *words: str) -> bool:
+        return self.type == "word" and self.value.upper() in words
+
+
+class Clause(NamedTuple):
+    keyword: str            # palavra-chave da cláusula (ex: "SELECT", "GROUP")
+    tokens: List[Token]     # tokens da cláusula, incluindo a palavra-chave
+
+
+class Statement(NamedTuple):
+    kind: str               # primeira palavra da instrução em maiúsculas (ex: "SELECT", "WITH")
+    tokens: List[Token]     # tokens significativos (sem espaços e comentários)
+    clauses: List[Clause]   # cláusulas de nível superior, na ordem em que aparecem
+
+
+def iter_tokens(query: str) -> Iterator[Token]:
+    """Percorre a consulta uma única vez produzindo os tokens com a profundidade de parênteses"""
+    depth = 0
+    for match in _MASTER.finditer(query):
+        kind = match.lastgroup
+        value = match.group()
+        if value == ")" and kind == "operator":
+            depth = max(0, depth - 1)
+        yield Token(kind, value, match.start(), depth)
+        if value == "(" and kind == "operator":
+            depth += 1
+
+
+def tokenize_sql(query: str, skip_trivia: bool = False) -> List[Token]:
+    """
+    Divide a consulta T-SQL em tokens
+
+    Args:
+        query: Texto SQL
+        skip_trivia: Se True, omite espaços e comentários
+
+    Returns:
+        Lista de tokens na ordem do texto
+    """
+    if skip_trivia:
+        return [token for token in iter_tokens(query) if token.type not in TRIVIA]
+    return list(iter_tokens(query))
+
+
+def parse_statements(query: str) -> List[Statement]:
+    """
+    Agrupa os tokens em instruções e cláusulas de nível superior
+
+    Uma nova instrução começa em ';' ou, fora de parênteses, em uma palavra de
+    STATEMENT_KEYWORDS (um segundo SELECT só conta se não vier após
+    UNION/EXCEPT/INTERSECT; SET continua um UPDATE).
+    """
+    statements: List[Statement] = []
+    tokens: List[Token] = []
+    has_select = False
+
+    def flush():
+        if tokens:
+            statements.append(_build_statement(tokens))
+
+    for token in iter_tokens(query):
+        if token.type in TRIVIA:
+            continue
+        if token.value == ";" and token.depth == 0:
+            flush()
+            tokens, has_select = [], False
+            continue
+        if token.type == "word" and token.depth == 0 and tokens:
+            word = token.upper
+            kind = tokens[0].upper
+            if word == "SELECT":
+                previous = tokens[-1]
+                new_statement = has_select and not previous.is_word(*_SET_OPERATORS)
+            elif word == "SET":
+                new_statement = kind not in ("UPDATE", "MERGE")
+            else:
+                new_statement = word in STATEMENT_KEYWORDS
+            if new_statement:
+                flush()
+                tokens, has_select = [], False
+        if token.depth == 0 and token.is_word("SELECT"):
+            has_select = True
+        tokens.append(token)
+    flush()
+    return statements
+
+
+def _build_statement(tokens: List[Token]) -> Statement:
+    clauses: List[Clause] = []
+    for token in tokens:
+        if token.depth == 0 and token.type == "word" and token.upper in CLAUSE_KEYWORDS:
+            if not (token.upper == "WITH" and clauses):   # WITH TIES / WITH ROLLUP / dicas de tabela
+                clauses.append(Clause(token.upper, [token]))
+                continue
+        if clauses:
+            clauses[-1].tokens.append(token)
+        else:
+            clauses.append(Clause(token.upper if token.type == "word" else "", [token]))
+    kind = tokens[0].upper if tokens[0].type == "word" else ""
+    return Statement(kind, tokens, clauses)
+
+
+def unquote_identifier(value: str) -> str:
+    """Remove os delimitadores [..] ou ".." de um identificador"""
+    if len(value) >= 2 and value[0] == "[" and value[-1] == "]":
+        return value[1:-1].replace("]]", "]")
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('""', '"')
+    return value
@@ -1,6 +1,7 @@
-from typing import Optional
+from typing import Optional, List
 import re
 from src.config.settings import settings  # Importa configurações
+from src.utils.sql_lexer import iter_tokens, parse_statements, tokenize_sql, unquote_identifier, TRIVIA
 
 def clean_sql_query(sql_query: str) -> str:
     """Limpa a consulta SQL gerada"""
@@ -10,35 +11,247 @@ def clean_sql_query(sql_query: str) -> str:
         sql_query = sql_query.split("```")[1].split("```")[0]
     return sql_query.strip()
 
+_SQL_START = re.compile(r"\b(SELECT|WITH)\b", re.IGNORECASE)
+
+def find_sql_end(text: str) -> Optional[int]:
+    """
+    Detecta se um texto gerado parcialmente já contém uma instrução SQL completa
+
+    A instrução é considerada completa quando o bloco de código (```) é fechado
+    ou, sem bloco de código, no primeiro ';' fora de strings e comentários.
+
+    Args:
+        text: Texto acumulado da geração
+
+    Returns:
+        Posição logo após o fim da instrução, ou None se ainda estiver incompleta
+    """
+    fence = text.find("```")
+    if fence != -1:
+        closing = text.find("```", fence + 3)
+        return closing + 3 if closing != -1 else None
+
+    match = _SQL_START.search(text)
+    if not match:
+        return None
+    i, n = match.start(), len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "'":
+            # Strings SQL escapam aspas duplicando-as ('')
+            end = text.find("'", i + 1)
+            while end != -1 and text.startswith("''", end):
+                end = text.find("'", end + 2)
+            if end == -1:
+                return None
+            i = end + 1
+            continue
+        if text.startswith("--", i):
+            end = text.find("\n", i)
+            if end == -1:
+                return None
+            i = end + 1
+            continue
+        if text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            if end == -1:
+                return None
+            i = end + 2
+            continue
+        if ch == ";":
+            return i + 1
+        i += 1
+    return None
+
+def normalize_sql(query: str) -> str:
+    """
+    Forma canônica do texto SQL para uso como chave de cache
+
+    Remove comentários, colapsa espaços e o ';' final, preservando o conteúdo das strings.
+    """
+    parts = []
+    gap = False
+    for token in iter_tokens(query):
+        if token.type in TRIVIA:
+            gap = True
+            continue
+        if gap and parts:
+            parts.append(" ")
+        gap = False
+        parts.append(token.value)
+    while parts and parts[-1] in (";", " "):
+        parts.pop()
+    return "".join(parts)
+
+def inject_top(query: str, limit: int) -> str:
+    """
+    Limita a consulta a `limit` linhas com TOP quando ela ainda não tem limite
+
+    Consultas com TOP/OFFSET ou com UNION/EXCEPT/INTERSECT no nível principal
+    são mantidas como estão. Em consultas com CTE o TOP vai no SELECT final.
+    """
+    if limit <= 0:
+        return query
+    statements = parse_statements(query)
+    if len(statements) != 1:
+        return query
+    insert_at = None
+    tokens = statements[0].tokens
+    for i, token in enumerate(tokens):
+        if token.depth != 0 or token.type != "word":
+            continue
+        if token.upper in ("TOP", "OFFSET", "UNION", "EXCEPT", "INTERSECT"):
+            return query
+        if token.upper == "SELECT":
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            anchor = following if following is not None and following.is_word("DISTINCT", "ALL") else token
+            insert_at = anchor.start + len(anchor.value)
+    if insert_at is None:
+        return query
+    return f"{query[:insert_at]} TOP ({limit}){query[insert_at:]}"
+
+def add_query_option(query: str, option: str) -> str:
+    """Acrescenta OPTION (...) ao fim da consulta, se ela ainda não tiver uma cláusula OPTION"""
+    tokens = tokenize_sql(query, skip_trivia=True)
+    if any(token.depth == 0 and token.is_word("OPTION") for token in tokens):
+        return query
+    end = len(query)
+    while tokens and tokens[-1].value == ";":
+        end = tokens.pop().start
+    # Em nova linha para não cair dentro de um comentário -- final
+    return f"{query[:end].rstrip()}\nOPTION ({option})"
+
+# Além de settings.FORBIDDEN_SQL_KEYWORDS: funções que acessam fontes externas
+_FORBIDDEN_FUNCTIONS = frozenset({"OPENROWSET", "OPENQUERY", "OPENDATASOURCE", "OPENXML"})
+
+def check_sql(query: str) -> Optional[str]:
+    """
+    Verifica se a consulta é uma única instrução de leitura (SELECT ou WITH ... SELECT)
+
+    As palavras proibidas são comparadas token a token, então colunas como
+    CREATED_AT ou UPDATED_BY, strings e comentários não causam rejeição.
+
+    Returns:
+        None se a consulta é aceita, ou o motivo da rejeição
+    """
+    statements = parse_statements(query)
+    if not statements:
+        return "Consulta SQL vazia"
+    if len(statements) > 1:
+        return f"Apenas uma instrução é permitida (encontradas {len(statements)})"
+    statement = statements[0]
+    if statement.kind not in ("SELECT", "WITH"):
+        return f"Apenas consultas SELECT são permitidas (instrução {statement.kind or statement.tokens[0].value})"
+
+    forbidden = set(settings.FORBIDDEN_SQL_KEYWORDS) | _FORBIDDEN_FUNCTIONS
+    for token in statement.tokens:
+        if token.type in ("unterminated", "error"):
+            return f"Trecho SQL inválido perto de: {token.value[:30]}"
+        if token.type == "word" and token.upper in forbidden:
+            return f"Palavra-chave não permitida: {token.upper}"
+        if token.type == "word" and token.depth == 0 and token.upper == "INTO":
+            return "SELECT ... INTO não é permitido"
+    if not any(token.depth == 0 and token.is_word("SELECT") for token in statement.tokens):
+        return "A consulta não contém um SELECT principal"
+    return None
+
 def validate_sql(query: str) -> bool:
-    """Validação básica de segurança para consultas SQL"""
-    forbidden_keywords = ["DROP", "DELETE", "TRUNCATE", "UPDATE", "INSERT", "ALTER", "CREATE", "EXEC"]
-    query_upper = query.upper()
-    
-    # Permitir apenas SELECT para este exemplo
-    if not query_upper.startswith("SELECT"):
-        return False
-        
-    for keyword in forbidden_keywords:
-        if keyword in query_upper:
-            return False
-            
-    return True
+    """Validação de segurança para consultas SQL: apenas uma instrução de leitura"""
+    return check_sql(query) is None
+
+# Palavras que encerram a lista de tabelas de um FROM (não são apelidos)
+_NOT_ALIAS = frozenset({
+    "WHERE", "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "ON", "GROUP", "ORDER",
+    "HAVING", "UNION", "EXCEPT", "INTERSECT", "OPTION", "WITH", "APPLY", "PIVOT", "UNPIVOT", "FOR",
+    "OFFSET", "FETCH", "WINDOW", "SELECT",
+})
 
-def extract_tables_from_query(query: str) -> list[str]:
+# Palavras que encerram a lista de tabelas de um FROM no mesmo nível de parênteses
+_FROM_END = frozenset({
+    "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT", "OPTION", "SELECT", "FOR", "WINDOW",
+})
+
+def _read_name(tokens, i: int):
+    """Lê um nome com partes separadas por '.' a partir de tokens[i]; retorna (partes, próximo índice)"""
+    parts = []
+    while i < len(tokens) and tokens[i].type in ("word", "quoted"):
+        parts.append(unquote_identifier(tokens[i].value))
+        if i + 1 < len(tokens) and tokens[i + 1].value == ".":
+            i += 2
+            # server..tabela: parte de esquema omitida
+            while i < len(tokens) and tokens[i].value == ".":
+                i += 1
+            continue
+        i += 1
+        break
+    return parts, i
+
+def extract_tables_from_query(query: str) -> List[str]:
     """
     Extrai os nomes das tabelas mencionadas em uma consulta SQL
-    
+
+    Considera FROM (incluindo listas separadas por vírgula, também depois de
+    JOIN ... ON) e JOIN em qualquer nível, nomes com esquema (dbo.Tabela) e delimitados ([Tabela 1]). CTEs,
+    subconsultas, funções com valor de tabela e variáveis não são incluídas.
+
     Args:
         query: Consulta SQL
-        
+
     Returns:
-        Lista de nomes de tabelas encontrados
+        Lista de nomes de tabelas, sem delimitadores, na ordem em que aparecem
     """
-    # Implementação simplificada - pode ser aprimorada
-    tables = re.findall(r'FROM\s+([\w]+)', query, re.IGNORECASE)
-    tables += re.findall(r'JOIN\s+([\w]+)', query, re.IGNORECASE)
-    return list(set(tables))  # Remove duplicados
+    tokens = tokenize_sql(query, skip_trivia=True)
+    n = len(tokens)
+
+    ctes = set()
+    if tokens and tokens[0].is_word("WITH"):
+        for i in range(1, n):
+            token = tokens[i]
+            if token.depth == 0 and token.is_word("SELECT"):
+                break
+            previous = tokens[i - 1]
+            if token.depth == 0 and token.type in ("word", "quoted") and (
+                    previous.is_word("WITH") or previous.value == ","):
+                ctes.add(unquote_identifier(token.value).lower())
+
+    tables: List[str] = []
+    seen = set()
+    # Níveis de parênteses que estão na lista de tabelas de um FROM: ali, uma
+    # vírgula sempre separa tabelas (as de ON, dicas e funções ficam em parênteses)
+    in_from = set()
+    for i, token in enumerate(tokens):
+        if token.type == "word" and token.upper in _FROM_END:
+            in_from.discard(token.depth)
+            continue
+        if token.is_word("FROM"):
+            in_from.add(token.depth)
+        elif not (token.is_word("JOIN") or (token.value == "," and token.depth in in_from)):
+            continue
+        parts, end = _read_name(tokens, i + 1)
+        if not parts or parts[-1].upper() in _NOT_ALIAS:
+            continue
+        is_function = end < n and tokens[end].value == "("
+        name = ".".join(parts)
+        if not is_function and not (len(parts) == 1 and name.lower() in ctes) and name.lower() not in seen:
+            seen.add(name.lower())
+            tables.append(name)
+    return tables
+
+# Palavras que iniciam uma nova linha na formatação
+_LINE_KEYWORDS = frozenset({
+    "SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "UNION", "EXCEPT", "INTERSECT", "OPTION",
+    "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "OFFSET", "WITH",
+})
+_JOIN_MODIFIERS = frozenset({"INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER"})
+# Palavras seguidas de espaço antes de '(' (nas demais, o '(' é uma chamada de função)
+_SPACE_BEFORE_PAREN = _LINE_KEYWORDS | {"IN", "AS", "ON", "AND", "OR", "NOT", "EXISTS", "OVER", "BY", "APPLY"}
+
+def _needs_space(previous, token) -> bool:
+    if token.value in (",", ")", ".", ";") or previous.value in ("(", "."):
+        return False
+    if token.value == "(" and previous.type in ("word", "quoted"):
+        return previous.upper in _SPACE_BEFORE_PAREN
+    return True
 
 def format_sql(query: str) -> str:
     """
@@ -48,12 +261,25 @@ def format_sql(query: str) -> str:
         query: Consulta SQL crua
         
     Returns:
-        Consulta formatada com indentação consistente
-    """
-    # Implementação básica - considerar usar uma lib como sqlparse
-    query = re.sub(r'(?i)SELECT', '\nSELECT', query)
-    query = re.sub(r'(?i)FROM', '\nFROM', query)
-    query = re.sub(r'(?i)WHERE', '\nWHERE', query)
-    query = re.sub(r'(?i)GROUP BY', '\nGROUP BY', query)
-    query = re.sub(r'(?i)ORDER BY', '\nORDER BY', query)
-    return query
\ No newline at end of file
+        Consulta formatada com uma cláusula por linha, indentada pela profundidade de parênteses
+    """
+    out: List[str] = []
+    previous = None
+    for token in iter_tokens(query):
+        if token.type == "ws":
+            continue
+        word = token.upper if token.type == "word" else None
+        new_line = previous is not None and previous.type == "comment" and previous.value.startswith("--")
+        if word in _LINE_KEYWORDS and previous is not None:
+            follows_modifier = previous.type == "word" and previous.upper in _JOIN_MODIFIERS
+            if word == "WITH":
+                new_line = new_line or previous.value == ";"
+            elif not (word in ("JOIN", "OUTER", "APPLY") and follows_modifier):
+                new_line = True
+        if new_line:
+            out.append("\n" + "    " * token.depth)
+        elif previous is not None and _needs_space(previous, token):
+            out.append(" ")
+        out.append(token.value)
+        previous = token
+    return "".join(out)
@@ -0,0 +1,82 @@
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fold_accents(text: str) -> str:
+    """Remove acentos e cedilhas (ex: 'produção' -> 'producao')"""
+    normalized = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in normalized if not unicodedata.combining(ch))
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza uma pergunta para comparação: minúsculas, sem acentos,
+    espaços colapsados e sem pontuação final
+
+    Args:
+        question: Pergunta em linguagem natural
+
+    Returns:
+        Pergunta normalizada
+    """
+    text = fold_accents(question).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip("?!. ")
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+_IDENTIFIER_PARTS = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+# Sufixos de plural tratados pelo stemmer leve (ordem importa: mais longos primeiro)
+_PLURAL_SUFFIXES = (
+    ("coes", "cao"), ("oes", "ao"), ("aes", "ao"), ("ais", "al"),
+    ("eis", "el"), ("ois", "ol"), ("ns", "m"), ("res", "r"), ("zes", "z"), ("s", ""),
+)
+
+STOPWORDS_PT = frozenset("""
+a ao aos as com como da das de do dos e em esta este foi for ha isso lista
+mais me meu minha na nas no nos o os ou para pela pelas pelo pelos por qual
+quais quando que quem se sem ser seu sua tem todo todos um uma umas uns
+""".split())
+
+
+def stem_pt(word: str) -> str:
+    """
+    Stemmer leve para português (palavras já sem acento e em minúsculas):
+    remove plurais e a vogal temática final, o suficiente para casar
+    'lotes' com 'lote' ou 'armazens' com 'armazem'
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, replacement in _PLURAL_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)] + replacement
+            break
+    if len(word) > 4 and word[-1] in "aeo":
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str, stem: bool = True) -> list:
+    """Quebra um texto em palavras minúsculas sem acento, sem stopwords (opcionalmente com stemming)"""
+    words = [w for w in _WORD.findall(fold_accents(text).lower()) if w not in STOPWORDS_PT]
+    return [stem_pt(w) for w in words] if stem else words
+
+
+def split_identifier(name: str, stem: bool = True) -> list:
+    """
+    Quebra um identificador SQL em palavras (snake_case, camelCase e dígitos)
+
+    Ex: 'id_lote' -> ['id', 'lote'], 'DataProducao' -> ['data', 'produca']
+    """
+    parts = []
+    for chunk in re.split(r"[^A-Za-z0-9]+", fold_accents(name)):
+        parts.extend(p.lower() for p in _IDENTIFIER_PARTS.findall(chunk))
+    return [stem_pt(p) for p in parts] if stem else parts
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa rápida de tokens de LLM (~4 caracteres por token)"""
+    return max(1, len(text) // 4)
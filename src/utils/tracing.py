@@ -0,0 +1,334 @@
+"""
+Rastreamento das etapas de uma solicitação
+
+Cada etapa é medida com `tracer.span("nome")`; spans abertos dentro de outro
+span viram seus filhos (via contextvars, por thread). Quando o span raiz
+termina, a árvore inteira é enviada aos exportadores (ex: uma linha JSON por
+solicitação) e a duração de cada etapa alimenta um histograma com p50/p95/p99.
+
+    with tracer.span("request", question=question):
+        with tracer.span("generation") as span:
+            ...
+            span.set(prompt_eval_count=120)
+
+Em geradores, um span ativo vazaria para o consumidor a cada yield; use
+`tracer.detached_span()`, que não fica ativo, e `tracer.iterate()` para
+ativá-lo apenas enquanto o próximo item é produzido:
+
+    with tracer.detached_span("execution") as span:
+        for row in tracer.iterate(span, db.iter_query(sql)):
+            yield row
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from src.config.settings import settings
+from src.utils.json_utils import json_default
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentil `q` (0-1) pelo método do vizinho mais próximo"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Span:
+    """Uma etapa medida: nome, duração, atributos e o span pai"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start", "duration", "attributes", "_trace", "_started")
+
+    def __init__(self, name: str, parent: Optional["Span"] = None, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:8]
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        # Spans concluídos da mesma solicitação, compartilhados a partir da raiz
+        self._trace: List["Span"] = parent._trace if parent else []
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        """Define atributos do span (ex: contagem de tokens, linhas)"""
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float = 1):
+        """Soma `amount` a um atributo numérico (ex: bytes lidos por lote)"""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self):
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._started
+            self._trace.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "start": round(self.start, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Span usado quando o rastreamento está desativado"""
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, key: str, amount: float = 1):
+        pass
+
+
+_NOOP = _NoopSpan()
+_current: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Histogram:
+    """Janela das medições mais recentes com contagem total e percentis"""
+
+    def __init__(self, window: int):
+        self._values = deque(maxlen=window)
+        self._count = 0
+        self._total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._values.append(value)
+            self._count += 1
+            self._total += value
+
+    def summary(self) -> Dict[str, float]:
+        with self._lock:
+            values = list(self._values)
+            count, total = self._count, self._total
+        return {
+            "count": count,
+            "mean": round(total / count, 3) if count else 0.0,
+            "p50": round(percentile(values, 0.50), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "p99": round(percentile(values, 0.99), 3),
+            "max": round(max(values), 3) if values else 0.0,
+        }
+
+
+class Exporter(ABC):
+    """Destino dos rastros concluídos; subclasses implementam export()"""
+
+    @abstractmethod
+    def export(self, trace: Dict[str, Any]):
+        """Recebe o rastro de uma solicitação concluída (raiz e spans filhos)"""
+
+    def close(self):
+        pass
+
+
+class JsonlExporter(Exporter):
+    """Acrescenta uma linha JSON por solicitação ao arquivo `path`"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def export(self, trace: Dict[str, Any]):
+        line = json.dumps(trace, default=json_default, ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class LogExporter(Exporter):
+    """Resume cada solicitação em uma mensagem DEBUG (duração por etapa)"""
+
+    def export(self, trace: Dict[str, Any]):
+        stages = ", ".join(f"{span['name']}={span['duration_ms']:.0f}ms" for span in trace["spans"])
+        logger.debug(f"Rastro {trace['trace_id']}: {stages}")
+
+
+class Tracer:
+    """
+    Cria spans, mantém um histograma por etapa (em ms) e envia cada
+    solicitação concluída aos exportadores
+    """
+
+    def __init__(self, enabled: bool = True, window: int = 1000, exporters: Optional[List[Exporter]] = None):
+        self.enabled = enabled
+        self.window = window
+        self.exporters: List[Exporter] = list(exporters or [])
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter: Exporter):
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Mede o bloco como uma etapa; sem span ativo, inicia uma nova solicitação (raiz)
+
+        Exceções são registradas no atributo "error" e propagadas. Não use em
+        blocos com yield (ver detached_span()).
+        """
+        if not self.enabled:
+            yield _NOOP
+            return
+        span = Span(name, _current.get(), attributes)
+        try:
+            with self.activate(span):
+                yield span
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            self._end(span)
+
+    @contextmanager
+    def detached_span(self, name: str, **attributes) -> Iterator[Span]:
+        """
+        Como span(), mas sem tornar o span ativo: para blocos com yield, em que
+        o contexto do consumidor não deve herdar o span entre um item e outro.
+        Filhos são criados apenas dentro de activate() / iterate().
+        """
+        if not self.enabled:
+            yield _NOOP
+            return
+        span = Span(name, _current.get(), attributes)
+        try:
+            yield span
+        except GeneratorExit:
+            # O consumidor parou de ler antes do fim
+            span.set(stopped=True)
+            raise
+        except BaseException as e:
+            span.set(error=type(e).__name__)
+            raise
+        finally:
+            self._end(span)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """Torna `span` o pai dos spans abertos no bloco (que não deve conter yield)"""
+        if not isinstance(span, Span):
+            yield span
+            return
+        token = _current.set(span)
+        try:
+            yield span
+        finally:
+            _current.reset(token)
+
+    def iterate(self, span: Span, iterable: Iterable) -> Iterator:
+        """Percorre `iterable` com `span` ativo apenas enquanto cada item é produzido"""
+        iterator = iter(iterable)
+        try:
+            while True:
+                with self.activate(span):
+                    try:
+                        item = next(iterator)
+                    except StopIteration:
+                        return
+                yield item
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                with self.activate(span):
+                    close()
+
+    def _end(self, span: Span):
+        span.end()
+        self.observe(span.name, span.duration * 1000)
+        if span.parent is None:
+            self._export(span)
+
+    def current(self) -> Optional[Span]:
+        """Span ativo no contexto atual"""
+        return _current.get()
+
+    def set(self, **attributes):
+        """Define atributos no span ativo, se houver"""
+        span = _current.get()
+        if span is not None:
+            span.set(**attributes)
+
+    def observe(self, name: str, value: float):
+        """Registra uma medição no histograma `name` (ex: "ollama.prompt_eval_ms")"""
+        if not self.enabled:
+            return
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(name, Histogram(self.window))
+        histogram.observe(value)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Resumo (count, mean, p50, p95, p99, max) de cada histograma"""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {name: histograms[name].summary() for name in sorted(histograms)}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+    def _export(self, root: Span):
+        if not self.exporters:
+            return
+        trace = {
+            "trace_id": root.trace_id,
+            "name": root.name,
+            "start": round(root.start, 6),
+            "duration_ms": round(root.duration * 1000, 3),
+            "attributes": root.attributes,
+            "spans": [span.to_dict() for span in root._trace if span is not root],
+        }
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace)
+            except Exception as e:
+                logger.warning(f"Erro ao exportar rastro para {type(exporter).__name__}: {e}")
+
+
+tracer = Tracer(settings.TRACE_ENABLED, settings.TRACE_HISTOGRAM_WINDOW)
+
+
+def configure_tracing():
+    """
+    Aplica TRACE_ENABLED / TRACE_LOG_PATH / TRACE_HISTOGRAM_WINDOW ao tracer
+    global (chamada após carregar o .env do ambiente)
+    """
+    tracer.close()
+    tracer.enabled = settings.TRACE_ENABLED
+    tracer.window = settings.TRACE_HISTOGRAM_WINDOW
+    tracer.exporters = [LogExporter()]
+    if settings.TRACE_LOG_PATH:
+        tracer.add_exporter(JsonlExporter(settings.TRACE_LOG_PATH))
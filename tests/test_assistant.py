@@ -0,0 +1,274 @@
+# Testes para src/core/assistant.py
+import pytest
+
+from src.core.assistant import SQLAIAssistant
+from src.llm.model_router import ModelRouter
+
+SCHEMAS = {"st": [{"name": "ref", "type": "varchar"}, {"name": "design", "type": "varchar"}]}
+
+
+class FakeDatabase:
+    """Executa consultas a partir de um mapa SQL -> linhas ou exceção"""
+
+    def __init__(self, results, cached=()):
+        self.results = results
+        self.cached = set(cached)
+        self.executed = []
+
+    def iter_query(self, sql, before_execute=None):
+        if before_execute and sql not in self.cached:
+            before_execute()
+        self.executed.append(sql)
+        result = self.results[sql]
+        if isinstance(result, Exception):
+            raise result
+        for row in result:
+            yield dict(row)
+
+    def query_columnar(self, sql, as_numpy=False, before_execute=None):
+        if before_execute:
+            before_execute()
+        self.executed.append(sql)
+        result = self.results[sql]
+        if isinstance(result, Exception):
+            raise result
+        return {column: [row[column] for row in result] for column in result[0]}
+
+    def validate_query(self, sql):
+        return None
+
+    def get_multiple_table_schemas(self, table_names):
+        return {name: SCHEMAS[name] for name in table_names}
+
+
+class FakeLLM:
+    def __init__(self, model_name="large", generated="SELECT ref FROM st", corrections=None):
+        self.model_name = model_name
+        self.generated = generated
+        self.corrections = dict(corrections or {})
+        self.corrected = []
+
+    def generate_sql_multi_table(self, nl_query, schemas, relationships, examples=None, **kwargs):
+        if isinstance(self.generated, Exception):
+            raise self.generated
+        return self.generated
+
+    def correct_sql_multi_table(self, bad_sql, error_msg, schemas, relationships):
+        self.corrected.append((bad_sql, error_msg))
+        return self.corrections[bad_sql]
+
+
+class FakeJoinGraph:
+    def connect(self, table_names):
+        return [], []
+
+
+class FakePruner:
+    def prune(self, nl_request, schemas, relationships):
+        return schemas
+
+
+class FakeExamples:
+    def __init__(self):
+        self.added = []
+        self.discarded = []
+
+    def search(self, question, table_names):
+        return []
+
+    def add(self, question, table_names, sql):
+        self.added.append((question, sorted(table_names), sql))
+
+    def discard_sql(self, sql):
+        self.discarded.append(sql)
+
+
+def make_assistant(db, llm, router=None):
+    assistant = SQLAIAssistant.__new__(SQLAIAssistant)
+    assistant.db, assistant.llm, assistant.router = db, llm, router
+    assistant.join_graph, assistant.pruner = FakeJoinGraph(), FakePruner()
+    assistant.guard = assistant.flights = assistant.speculative = None
+    assistant.generation_cache = assistant.examples = None
+    return assistant
+
+
+def make_router(*clients):
+    return ModelRouter(list(clients), min_samples=100, path="")
+
+
+def tier_stats(router):
+    return {model: {k: v for k, v in counter.items() if k in ("successes", "failures", "abandoned", "escalations")}
+            for model, counter in router.stats()["tiers"].items()}
+
+
+def test_execute_prepared_finishes_route_on_success():
+    small, large = FakeLLM("small"), FakeLLM("large")
+    router = make_router(small, large)
+    assistant = make_assistant(FakeDatabase({"SELECT ref FROM st": [{"ref": "A"}]}), large, router)
+    route = router.route("lista de artigos", ["st"])
+    rows = list(assistant.execute_prepared("SELECT ref FROM st", SCHEMAS, [], route=route))
+    assert rows == [{"ref": "A"}]
+    assert tier_stats(router)["small"] == {"successes": 1}
+
+
+def test_execute_prepared_escalates_correction_to_next_model():
+    bad, good = "SELECT refx FROM st", "SELECT ref FROM st"
+    small, large = FakeLLM("small"), FakeLLM("large", corrections={bad: good})
+    router = make_router(small, large)
+    db = FakeDatabase({bad: RuntimeError("Invalid column name 'refx'"), good: [{"ref": "A"}]})
+    assistant = make_assistant(db, large, router)
+    route = router.route("lista de artigos", ["st"])
+    assert list(assistant.execute_prepared(bad, SCHEMAS, [], route=route)) == [{"ref": "A"}]
+    assert small.corrected == [] and large.corrected[0][0] == bad
+    assert tier_stats(router) == {"small": {"escalations": 1}, "large": {"successes": 1}}
+
+
+@pytest.mark.parametrize("error", [TimeoutError("tempo esgotado"), InterruptedError("Consulta cancelada")])
+def test_execute_prepared_timeout_is_not_a_model_failure(error):
+    large = FakeLLM("large")
+    router = make_router(large)
+    assistant = make_assistant(FakeDatabase({"SELECT ref FROM st": error}), large, router)
+    discarded = []
+    assistant._discard_cached = discarded.append
+    route = router.route("lista de artigos", ["st"])
+    with pytest.raises(type(error)):
+        list(assistant.execute_prepared("SELECT ref FROM st", SCHEMAS, [], route=route))
+    assert tier_stats(router)["large"] == {"abandoned": 1}
+    assert discarded == [] and large.corrected == []
+
+
+def test_execute_prepared_finishes_route_when_consumer_stops():
+    large = FakeLLM("large")
+    router = make_router(large)
+    assistant = make_assistant(FakeDatabase({"SELECT ref FROM st": [{"ref": "A"}, {"ref": "B"}]}), large, router)
+    route = router.route("lista de artigos", ["st"])
+    rows = assistant.execute_prepared("SELECT ref FROM st", SCHEMAS, [], route=route)
+    assert next(rows) == {"ref": "A"}
+    rows.close()
+    assert tier_stats(router)["large"] == {"successes": 1}
+
+
+def test_generate_finishes_route_when_the_model_fails():
+    large = FakeLLM("large", generated=ConnectionError("Ollama indisponível"))
+    router = make_router(large)
+    assistant = make_assistant(FakeDatabase({}), large, router)
+    with pytest.raises(ConnectionError):
+        assistant._generate("lista de artigos", ["st"])
+    assert tier_stats(router)["large"] == {"failures": 1}
+
+
+def test_generate_finishes_route_on_invalid_sql():
+    large = FakeLLM("large", generated="DELETE FROM st", corrections={"DELETE FROM st": "DELETE FROM st"})
+    router = make_router(large)
+    assistant = make_assistant(FakeDatabase({}), large, router)
+    with pytest.raises(ValueError):
+        assistant._generate("lista de artigos", ["st"])
+    assert tier_stats(router)["large"] == {"failures": 1}
+
+
+def test_execution_error_is_corrected_and_discarded():
+    bad, good = "SELECT refx FROM st", "SELECT ref FROM st"
+    llm = FakeLLM(corrections={bad: good})
+    db = FakeDatabase({bad: RuntimeError("Invalid column name 'refx'"), good: [{"ref": "A"}]})
+    assistant = make_assistant(db, llm)
+    discarded = []
+    assistant._discard_cached = discarded.append
+    assert list(assistant.execute_prepared(bad, SCHEMAS, [])) == [{"ref": "A"}]
+    assert llm.corrected == [(bad, "Invalid column name 'refx'")]
+    assert db.executed == [bad, good] and discarded == [bad]
+
+
+def test_corrections_stop_at_the_limit(monkeypatch):
+    monkeypatch.setenv("SQL_MAX_CORRECTIONS", "2")
+    queries = ["SELECT a FROM st", "SELECT b FROM st", "SELECT c FROM st"]
+    llm = FakeLLM(corrections=dict(zip(queries, queries[1:])))
+    db = FakeDatabase({sql: RuntimeError(f"erro em {sql}") for sql in queries})
+    assistant = make_assistant(db, llm)
+    with pytest.raises(RuntimeError, match="SELECT c"):
+        list(assistant.execute_prepared(queries[0], SCHEMAS, []))
+    assert db.executed == queries and len(llm.corrected) == 2
+
+
+def test_error_after_the_first_row_is_not_corrected():
+    def rows(sql):
+        yield {"ref": "A"}
+        raise RuntimeError("conexão perdida")
+
+    llm = FakeLLM()
+    assistant = make_assistant(FakeDatabase({}), llm)
+    assistant._execute = lambda sql, cancel=None: rows(sql)
+    stream = assistant.execute_prepared("SELECT ref FROM st", SCHEMAS, [])
+    assert next(stream) == {"ref": "A"}
+    with pytest.raises(RuntimeError):
+        next(stream)
+    assert llm.corrected == []
+
+
+def test_columnar_result_uses_the_correction_loop():
+    bad, good = "SELECT refx FROM st", "SELECT ref FROM st"
+    llm = FakeLLM(generated=bad, corrections={bad: good})
+    db = FakeDatabase({bad: RuntimeError("Invalid column name 'refx'"), good: [{"ref": "A"}, {"ref": "B"}]})
+    assistant = make_assistant(db, llm)
+    assert assistant._run_columnar("lista de artigos", ["st"], "numpy") == {"ref": ["A", "B"]}
+    assert llm.corrected == [(bad, "Invalid column name 'refx'")]
+
+
+def test_example_is_added_only_after_successful_execution():
+    bad, good = "SELECT refx FROM st", "SELECT ref FROM st"
+    llm = FakeLLM(generated=bad, corrections={bad: good})
+    db = FakeDatabase({bad: RuntimeError("Invalid column name 'refx'"), good: [{"ref": "A"}]})
+    assistant = make_assistant(db, llm)
+    assistant.examples = FakeExamples()
+    stream = assistant.stream_nl_request("lista de artigos", ["st"])
+    assert next(stream) == {"ref": "A"}
+    # Ainda executando: nada registrado
+    assert assistant.examples.added == []
+    assert list(stream) == []
+    assert assistant.examples.added == [("lista de artigos", ["st"], good)]
+
+
+def test_failed_execution_adds_no_example():
+    llm = FakeLLM()
+    assistant = make_assistant(FakeDatabase({"SELECT ref FROM st": TimeoutError("tempo esgotado")}), llm)
+    assistant.examples = FakeExamples()
+    with pytest.raises(TimeoutError):
+        list(assistant.stream_nl_request("lista de artigos", ["st"]))
+    assert assistant.examples.added == []
+
+
+def test_columnar_result_adds_example():
+    llm = FakeLLM()
+    assistant = make_assistant(FakeDatabase({"SELECT ref FROM st": [{"ref": "A"}]}), llm)
+    assistant.examples = FakeExamples()
+    assistant._run_columnar("lista de artigos", ["st"], "numpy")
+    assert assistant.examples.added == [("lista de artigos", ["st"], "SELECT ref FROM st")]
+
+
+class FakeGuard:
+    def __init__(self):
+        self.prepared = []
+        self.recorded = []
+
+    def rewrite(self, sql):
+        return sql + " OPTION (MAXDOP 1)"
+
+    def prepare(self, sql):
+        self.prepared.append(sql)
+        return {"sql": self.rewrite(sql), "estimated_cost": 0.1, "estimated_rows": 1}
+
+    def record_execution(self, record, actual_rows, elapsed, status="completed", error=None):
+        self.recorded.append((record["sql"], actual_rows, status))
+
+
+def test_guard_is_skipped_when_the_result_is_cached():
+    guarded = "SELECT ref FROM st OPTION (MAXDOP 1)"
+    db = FakeDatabase({guarded: [{"ref": "A"}]}, cached={guarded})
+    assistant = make_assistant(db, FakeLLM())
+    assistant.guard = FakeGuard()
+    assert list(assistant._execute("SELECT ref FROM st")) == [{"ref": "A"}]
+    assert assistant.guard.prepared == [] and assistant.guard.recorded == []
+
+    db.cached.clear()
+    assert list(assistant._execute("SELECT ref FROM st")) == [{"ref": "A"}]
+    assert assistant.guard.prepared == ["SELECT ref FROM st"]
+    assert assistant.guard.recorded == [(guarded, 1, "completed")]
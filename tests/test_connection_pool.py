@@ -0,0 +1,119 @@
+# Testes para src/core/connection_pool.py
+import threading
+import time
+
+import pytest
+
+from src.core.connection_pool import ConnectionPool
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query):
+        if self.conn.broken:
+            raise ConnectionError("conexão perdida")
+
+    def fetchall(self):
+        return [(1,)]
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, number):
+        self.number = number
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        opened.append(FakeConnection(len(opened)))
+        return opened[-1]
+
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_checkout_and_return_reuses_connection():
+    pool, opened = make_pool(max_size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(opened) == 1
+    stats = pool.stats()
+    assert stats["checkouts"] == 2 and stats["in_use"] == 1 and stats["idle"] == 0
+
+
+def test_broken_connection_is_discarded_after_error():
+    pool, opened = make_pool(max_size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.broken = True
+            raise RuntimeError("falha na consulta")
+    assert conn.closed
+    assert pool.stats()["discarded"] == 1
+    assert pool.acquire() is not conn
+    assert len(opened) == 2
+
+
+def test_healthy_connection_is_rolled_back_after_error():
+    pool, _ = make_pool(max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as conn:
+            raise ValueError("erro de SQL")
+    assert conn.rollbacks == 1 and not conn.closed
+    assert pool.acquire() is conn
+
+
+def test_stale_connection_is_replaced_on_checkout():
+    pool, opened = make_pool(max_size=1, health_check_after=0)
+    conn = pool.acquire()
+    conn.broken = True
+    pool.release(conn)
+    replacement = pool.acquire()
+    assert replacement is not conn and conn.closed
+    assert pool.stats()["reconnects"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_acquire_times_out_when_pool_is_full():
+    pool, _ = make_pool(max_size=1)
+    pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_waiting_acquire_gets_released_connection():
+    pool, _ = make_pool(max_size=1)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+    assert pool.acquire(timeout=2) is conn
+    assert pool.stats()["waits"] == 1
+
+
+def test_closed_pool_rejects_acquire():
+    pool, _ = make_pool(max_size=1)
+    conn = pool.acquire()
+    pool.release(conn)
+    pool.close()
+    assert conn.closed
+    with pytest.raises(RuntimeError):
+        pool.acquire()
@@ -0,0 +1,70 @@
+# Testes para src/llm/example_index.py
+from src.llm.example_index import ExampleIndex
+
+
+def make_index(tmp_path, **kwargs):
+    kwargs.setdefault("max_entries", 100)
+    kwargs.setdefault("top_k", 3)
+    kwargs.setdefault("min_similarity", 0.3)
+    return ExampleIndex(str(tmp_path / "examples.sqlite3"), **kwargs)
+
+
+def test_ranking_prefers_closest_question(tmp_path):
+    index = make_index(tmp_path)
+    index.add("total de vendas por artigo", ["fi", "st"], "SQL_VENDAS")
+    index.add("stock atual por armazem", ["sa"], "SQL_STOCK")
+    index.add("total de compras por fornecedor", ["fo"], "SQL_COMPRAS")
+    results = index.search("total das vendas de cada artigo", ["fi", "st", "sa", "fo"])
+    assert results[0]["sql"] == "SQL_VENDAS"
+    assert [r["score"] for r in results] == sorted((r["score"] for r in results), reverse=True)
+
+
+def test_search_tolerates_inflections_and_accents(tmp_path):
+    index = make_index(tmp_path)
+    index.add("produção por lote", ["lotes"], "SQL_LOTES")
+    assert index.search("producao dos lotes", ["lotes"])[0]["sql"] == "SQL_LOTES"
+
+
+def test_only_examples_within_prompt_tables(tmp_path):
+    index = make_index(tmp_path)
+    index.add("total de vendas por artigo", ["fi", "st"], "SQL_JOIN")
+    index.add("total de vendas", ["fi"], "SQL_FI")
+    assert [r["sql"] for r in index.search("total de vendas por artigo", ["FI"])] == ["SQL_FI"]
+    assert index.search("total de vendas", ["cl"]) == []
+
+
+def test_min_similarity_filters_unrelated_questions(tmp_path):
+    index = make_index(tmp_path, min_similarity=0.5)
+    index.add("total de vendas por artigo", ["fi"], "SQL_FI")
+    assert index.search("clientes inativos", ["fi"]) == []
+
+
+def test_eviction_removes_oldest_and_persists(tmp_path):
+    index = make_index(tmp_path, max_entries=2)
+    index.add("vendas de janeiro", ["fi"], "SQL_1")
+    index.add("vendas de fevereiro", ["fi"], "SQL_2")
+    index.add("vendas de marco", ["fi"], "SQL_3")
+    assert index.stats()["examples"] == 2
+    index.close()
+    reopened = make_index(tmp_path, max_entries=2)
+    sqls = {r["sql"] for r in reopened.search("vendas de janeiro", ["fi"], k=5)}
+    assert sqls == {"SQL_2", "SQL_3"}
+
+
+def test_discard_and_invalidate(tmp_path):
+    index = make_index(tmp_path)
+    index.add("vendas por artigo", ["fi", "st"], "SQL_A")
+    index.add("vendas por cliente", ["fi", "cl"], "SQL_B")
+    index.add("clientes ativos", ["cl"], "SQL_C")
+    index.discard_sql("SQL_A")
+    assert index.invalidate_tables(["CL"]) == 2
+    assert index.stats()["examples"] == 0
+
+
+def test_adding_the_same_sql_keeps_the_entry(tmp_path):
+    index = make_index(tmp_path)
+    index.add("total de vendas", ["fi"], "SQL_FI")
+    index.add("Total de vendas", ["FI"], "SQL_FI")
+    index.add("total de vendas", ["fi"], "SQL_FI_2")
+    assert index.stats()["examples"] == 1
+    assert [r["sql"] for r in index.search("total de vendas", ["fi"])] == ["SQL_FI_2"]
@@ -0,0 +1,55 @@
+# Testes para src/llm/generation_cache.py
+import time
+
+from src.llm.generation_cache import GenerationCache
+
+SCHEMAS = {"st": [{"name": "ref", "type": "varchar"}], "fi": [{"name": "ref", "type": "varchar"}]}
+RELATIONSHIPS = [{"source_table": "fi", "source_column": "ref", "target_table": "st", "target_column": "ref"}]
+
+
+def make_cache(tmp_path, **kwargs):
+    kwargs.setdefault("ttl", 0)
+    kwargs.setdefault("max_entries", 100)
+    return GenerationCache(str(tmp_path / "generation.sqlite3"), **kwargs)
+
+
+def test_hit_ignores_case_accents_and_spaces(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("Quantos artigos há?", SCHEMAS, RELATIONSHIPS, "llama3.2", "SELECT COUNT(*) FROM st")
+    assert cache.get("quantos  ARTIGOS ha?", SCHEMAS, RELATIONSHIPS, "llama3.2") == "SELECT COUNT(*) FROM st"
+    assert cache.get("quantos artigos ha?", SCHEMAS, RELATIONSHIPS, "outro") is None
+
+
+def test_schema_change_changes_key(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("lista artigos", SCHEMAS, RELATIONSHIPS, "m", "SELECT ref FROM st")
+    changed = dict(SCHEMAS, st=SCHEMAS["st"] + [{"name": "design", "type": "varchar"}])
+    assert cache.get("lista artigos", changed, RELATIONSHIPS, "m") is None
+
+
+def test_entries_expire_after_ttl(tmp_path):
+    cache = make_cache(tmp_path, ttl=0.05)
+    cache.put("lista artigos", SCHEMAS, RELATIONSHIPS, "m", "SELECT ref FROM st")
+    time.sleep(0.1)
+    assert cache.get("lista artigos", SCHEMAS, RELATIONSHIPS, "m") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidate_tables_matches_whole_names(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("lista artigos", {"st": SCHEMAS["st"]}, [], "m", "SELECT ref FROM st")
+    cache.put("lista stocks", {"st_x": SCHEMAS["st"]}, [], "m", "SELECT ref FROM st_x")
+    cache.put("faturas", SCHEMAS, RELATIONSHIPS, "m", "SELECT ref FROM fi")
+    assert cache.invalidate_tables(["ST"]) == 2
+    assert cache.get("lista stocks", {"st_x": SCHEMAS["st"]}, [], "m") == "SELECT ref FROM st_x"
+
+
+def test_lru_limit_and_persistence(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    for i in range(3):
+        cache.put(f"pergunta {i}", SCHEMAS, RELATIONSHIPS, "m", f"SELECT {i}")
+        time.sleep(0.01)
+    cache.close()
+    reopened = make_cache(tmp_path, max_entries=2)
+    assert reopened.get("pergunta 0", SCHEMAS, RELATIONSHIPS, "m") is None
+    assert reopened.get("pergunta 2", SCHEMAS, RELATIONSHIPS, "m") == "SELECT 2"
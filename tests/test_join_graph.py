@@ -0,0 +1,72 @@
+# Testes para src/core/join_graph.py
+from src.core.join_graph import JoinGraph
+
+
+class FakeCatalog:
+    version = 1
+
+    def __init__(self, edges):
+        self.edges = edges
+
+    def ensure_fresh(self):
+        pass
+
+    def all_foreign_keys(self):
+        return [{"source_table": a, "source_column": f"{b}_id", "target_table": b, "target_column": "id"}
+                for a, b in self.edges]
+
+
+def pairs(relationships):
+    return sorted((rel["source_table"], rel["target_table"]) for rel in relationships)
+
+
+def test_connect_direct_edges():
+    graph = JoinGraph(FakeCatalog([("B", "C"), ("C", "D")]), max_hops=0)
+    bridges, relationships = graph.connect(["B", "D", "C"])
+    assert bridges == []
+    assert pairs(relationships) == [("B", "C"), ("C", "D")]
+
+
+def test_connect_adds_bridge_tables():
+    graph = JoinGraph(FakeCatalog([("B", "X"), ("X", "D")]))
+    bridges, relationships = graph.connect(["B", "D"])
+    assert bridges == ["X"]
+    assert pairs(relationships) == [("B", "X"), ("X", "D")]
+
+
+def test_connect_isolated_first_table_keeps_other_joins():
+    graph = JoinGraph(FakeCatalog([("B", "C"), ("C", "D")]))
+    bridges, relationships = graph.connect(["A", "B", "C", "D"])
+    assert bridges == []
+    assert pairs(relationships) == [("B", "C"), ("C", "D")]
+
+
+def test_connect_separate_components():
+    graph = JoinGraph(FakeCatalog([("A", "B"), ("C", "D")]))
+    _, relationships = graph.connect(["A", "C", "B", "D"])
+    assert pairs(relationships) == [("A", "B"), ("C", "D")]
+
+
+def test_connect_normalizes_names():
+    graph = JoinGraph(FakeCatalog([("B", "C")]))
+    _, relationships = graph.connect(["[dbo].[b]", "dbo.C", "c"])
+    assert pairs(relationships) == [("B", "C")]
+
+
+def test_connect_ignores_paths_longer_than_max_hops():
+    chain = [("A", "X1"), ("X1", "X2"), ("X2", "X3"), ("X3", "B")]
+    bridges, relationships = JoinGraph(FakeCatalog(chain), max_hops=3).connect(["A", "B"])
+    assert (bridges, relationships) == ([], [])
+    bridges, relationships = JoinGraph(FakeCatalog(chain), max_hops=4).connect(["A", "B"])
+    assert bridges == ["X1", "X2", "X3"] and len(relationships) == 4
+
+
+def test_connect_max_hops_keeps_short_joins():
+    edges = [("A", "B"), ("B", "X1"), ("X1", "X2"), ("X2", "C")]
+    _, relationships = JoinGraph(FakeCatalog(edges), max_hops=2).connect(["A", "B", "C"])
+    assert pairs(relationships) == [("A", "B")]
+
+
+def test_connect_single_table():
+    graph = JoinGraph(FakeCatalog([("B", "C")]))
+    assert graph.connect(["B"]) == ([], [])
@@ -0,0 +1,74 @@
+# Testes para src/llm/model_router.py
+from src.llm.model_router import ModelRouter
+
+
+class FakeClient:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+
+def make_router(**kwargs):
+    kwargs.setdefault("threshold", 0.6)
+    kwargs.setdefault("min_samples", 3)
+    kwargs.setdefault("min_success", 0.5)
+    return ModelRouter([FakeClient("small"), FakeClient("medium"), FakeClient("large")], path="", **kwargs)
+
+
+def test_simple_question_starts_at_smallest_model():
+    router = make_router()
+    route = router.route("lista de artigos", ["st"])
+    assert route.tier == 0
+
+
+def test_complex_question_skips_smallest_model():
+    router = make_router()
+    route = router.route("total de vendas por mês entre clientes e artigos", ["ft", "fi", "st"])
+    assert route.tier == 1
+
+
+def test_escalate_records_failure_and_moves_up():
+    router = make_router()
+    route = router.route("lista de artigos", ["st"])
+    assert router.escalate(route, "erro")
+    assert router.escalate(route, "erro")
+    assert route.tier == router.last_tier and route.escalations == 2
+    assert not router.escalate(route, "erro")
+    router.finish(route, True)
+    tiers = router.stats()["tiers"]
+    assert tiers["small"]["escalations"] == 1 and tiers["medium"]["escalations"] == 1
+    assert tiers["large"]["successes"] == 1
+
+
+def test_finish_counts_once():
+    router = make_router()
+    route = router.route("lista de artigos", ["st"])
+    router.finish(route, False)
+    router.finish(route, True)
+    tiers = router.stats()["tiers"]
+    assert tiers["small"]["failures"] == 1 and "successes" not in tiers["small"]
+
+
+def test_abandoned_route_does_not_affect_shape_history():
+    router = make_router(min_samples=1)
+    for _ in range(3):
+        router.finish(router.route("lista de artigos", ["st"]), None)
+    assert router.stats()["tiers"]["small"]["abandoned"] == 3
+    assert router.route("lista de artigos", ["st"]).tier == 0
+
+
+def test_failing_shape_starts_at_next_model():
+    router = make_router()
+    for _ in range(3):
+        router.finish(router.route("lista de artigos", ["st"]), False)
+    assert router.route("lista de artigos", ["st"]).tier == 1
+    # Outro formato de pergunta continua no menor modelo
+    assert router.route("lista de clientes", ["cl"]).tier == 0
+
+
+def test_state_is_persisted(tmp_path):
+    path = str(tmp_path / "router.json")
+    router = ModelRouter([FakeClient("small"), FakeClient("large")], min_samples=1, min_success=0.5, path=path)
+    router.finish(router.route("lista de artigos", ["st"]), False)
+    router.save()
+    restored = ModelRouter([FakeClient("small"), FakeClient("large")], min_samples=1, min_success=0.5, path=path)
+    assert restored.route("lista de artigos", ["st"]).tier == 1
@@ -0,0 +1,49 @@
+# Testes para src/llm/prompt_templates.py (prefixo fixo dos prompts multi-tabela)
+from src.llm.prompt_templates import PromptTemplates
+from src.llm.schema_pruning import ColumnPruner
+
+ST = ([{"name": "ref", "type": "varchar", "primary_key": True}]
+      + [{"name": f"campo{i}", "type": "int"} for i in range(30)]
+      + [{"name": "preco_venda", "type": "numeric"}, {"name": "familia", "type": "varchar"}])
+FI = ([{"name": "fistamp", "type": "char", "primary_key": True}]
+      + [{"name": f"outro{i}", "type": "int"} for i in range(30)]
+      + [{"name": "ref", "type": "varchar"}, {"name": "qtt", "type": "numeric"}])
+SCHEMAS = {"st": ST, "fi": FI}
+RELATIONSHIPS = [{"source_table": "fi", "source_column": "ref", "target_table": "st", "target_column": "ref"}]
+
+
+def make_pruner():
+    return ColumnPruner(top_k=8, token_budget=0, min_columns=3, annotations={})
+
+
+def test_relevant_columns_are_marked_as_hints():
+    pruned = make_pruner().prune("preço de venda por família", SCHEMAS, RELATIONSHIPS)
+    hints = {col["name"] for col in pruned["st"] if col.get("hint")}
+    assert hints == {"preco_venda", "familia"}
+    assert len(pruned["st"]) <= 8
+
+
+def test_base_columns_do_not_depend_on_question():
+    pruner = make_pruner()
+    first = pruner.prune("preço de venda", SCHEMAS, RELATIONSHIPS)
+    second = pruner.prune("quantidade faturada", SCHEMAS, RELATIONSHIPS)
+    for table in SCHEMAS:
+        assert ([c for c in first[table] if not c.get("hint")]
+                == [c for c in second[table] if not c.get("hint")])
+
+
+def test_prefix_is_identical_across_questions():
+    pruner = make_pruner()
+    first = pruner.prune("preço de venda", SCHEMAS, RELATIONSHIPS)
+    second = pruner.prune("quantidade faturada", SCHEMAS, RELATIONSHIPS)
+    assert (PromptTemplates.multi_table_prefix(first, RELATIONSHIPS)
+            == PromptTemplates.multi_table_prefix(second, RELATIONSHIPS))
+
+
+def test_hints_follow_the_prefix():
+    pruned = make_pruner().prune("preço de venda", SCHEMAS, RELATIONSHIPS)
+    prefix = PromptTemplates.multi_table_prefix(pruned, RELATIONSHIPS)
+    prompt = PromptTemplates.multi_table_prompt("preço de venda", pruned, RELATIONSHIPS)
+    assert prompt.startswith(prefix)
+    assert "preco_venda" not in prefix
+    assert "- st.preco_venda (numeric)" in prompt[len(prefix):]
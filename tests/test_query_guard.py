@@ -0,0 +1,53 @@
+# Testes para src/core/query_guard.py
+import json
+
+from src.core.query_guard import QueryGuard
+
+
+def record(i):
+    return {"sql": f"SELECT {i}", "estimated_cost": 0.1, "estimated_rows": 1.0, "pad": "x" * 40}
+
+
+def test_log_rotates_and_keeps_backups(tmp_path):
+    path = tmp_path / "guard.jsonl"
+    guard = QueryGuard(None, log_path=str(path), log_max_bytes=300, log_backups=2)
+    for i in range(40):
+        guard.record_execution(record(i), actual_rows=1, elapsed=0.01)
+
+    files = {p.name for p in tmp_path.iterdir()}
+    assert {"guard.jsonl.1", "guard.jsonl.2"} <= files <= {"guard.jsonl", "guard.jsonl.1", "guard.jsonl.2"}
+    assert all(p.stat().st_size < 300 + 200 for p in tmp_path.iterdir())
+    # O registro mais recente fica no arquivo atual (ou no .1, logo após uma rotação)
+    current = path if path.exists() else tmp_path / "guard.jsonl.1"
+    last = json.loads(current.read_text(encoding="utf-8").splitlines()[-1])
+    assert last["sql"] == "SELECT 39" and last["status"] == "completed"
+    assert guard.stats() == {"completed": 40}
+
+
+def test_log_without_backups_is_truncated(tmp_path):
+    path = tmp_path / "guard.jsonl"
+    guard = QueryGuard(None, log_path=str(path), log_max_bytes=300, log_backups=0)
+    for i in range(20):
+        guard.record_execution(record(i), actual_rows=1, elapsed=0.01)
+    assert sorted(p.name for p in tmp_path.iterdir()) in (["guard.jsonl"], [])
+    assert not path.exists() or path.stat().st_size < 300
+
+
+def test_log_without_limit_grows(tmp_path):
+    path = tmp_path / "guard.jsonl"
+    guard = QueryGuard(None, log_path=str(path), log_max_bytes=0, log_backups=2)
+    for i in range(20):
+        guard.record_execution(record(i), actual_rows=1, elapsed=0.01)
+    assert [p.name for p in tmp_path.iterdir()] == ["guard.jsonl"]
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 20
+
+
+def test_rewrite_matches_prepared_sql():
+    class NoPlan:
+        def estimated_plan(self, sql):
+            raise PermissionError("SHOWPLAN")
+
+    guard = QueryGuard(NoPlan(), top_rows=100, maxdop=2, log_path="")
+    record = guard.prepare("SELECT ref FROM st")
+    assert record["sql"] == guard.rewrite("SELECT ref FROM st")
+    assert "TOP (100)" in record["sql"] and record["sql"].endswith("OPTION (MAXDOP 2)")
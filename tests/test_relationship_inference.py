@@ -0,0 +1,59 @@
+# Testes para src/core/relationship_inference.py
+import time
+
+from src.core.relationship_inference import RelationshipInferer
+
+
+class FakeCatalog:
+    tables = {
+        "A": [{"name": "id", "type": "int", "primary_key": True}],
+        "B": [{"name": "a_id", "type": "int"}],
+        "C": [{"name": "a_id", "type": "int"}],
+    }
+
+    def table_names(self):
+        return list(self.tables)
+
+    def get_table_schema(self, table):
+        return self.tables[table]
+
+    def schema_of(self, table):
+        return "dbo"
+
+    def all_foreign_keys(self):
+        return []
+
+
+def make_inferer(tmp_path, delay=0.0, budget=0):
+    queries = []
+
+    def fetch(query, params, timeout=None):
+        queries.append(query)
+        time.sleep(delay)
+        return [(i,) for i in range(20)]
+
+    inferer = RelationshipInferer(FakeCatalog(), fetch, "db", cache_path=str(tmp_path / "rels.json"),
+                                  override_path="", min_score=0.5, budget=budget)
+    return inferer, queries
+
+
+def test_run_accepts_overlapping_columns(tmp_path):
+    inferer, _ = make_inferer(tmp_path)
+    inferer.run()
+    assert len(inferer.relationships()) == 3
+    assert inferer.pending() == 0
+
+
+def test_budget_exhaustion_persists_and_resumes_pending(tmp_path):
+    inferer, _ = make_inferer(tmp_path, delay=0.05, budget=0.01)
+    inferer.run()
+    assert len(inferer.relationships()) == 1
+    assert inferer.pending() == 2
+
+    # Nova instância (próximo start): os pendentes são retomados sem reavaliar o resto
+    resumed, queries = make_inferer(tmp_path)
+    assert resumed.load() and resumed.pending() == 2
+    resumed.run([])
+    assert resumed.pending() == 0
+    assert len(resumed.relationships()) == 3
+    assert len(queries) <= 4
@@ -0,0 +1,120 @@
+# Testes para src/core/result_cache.py
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from src.core.database import DatabaseManager
+from src.core.query_guard import QueryRejectedError
+from src.core.result_cache import ResultCache
+
+DESCRIPTION = (("ref", str), ("qtt", int))
+ROWS = [("A1", 2), ("B2", 5)]
+
+
+def make_cache(versions=None, **kwargs):
+    """Cache cujas versões de tabela vêm do dicionário `versions` (tabela -> última alteração)"""
+    versions = {} if versions is None else versions
+    kwargs.setdefault("max_bytes", 10_000)
+    kwargs.setdefault("ttl", 0)
+    kwargs.setdefault("check_interval", 0)
+    return ResultCache(lambda query: list(versions.items()), **kwargs)
+
+
+def store(cache, query, size=100):
+    cache.put(query, DESCRIPTION, ROWS, size, cache.table_versions(cache.tables(query)))
+
+
+def test_hit_uses_normalized_sql():
+    cache = make_cache()
+    store(cache, "SELECT ref, qtt FROM st")
+    assert cache.get("SELECT ref, qtt  FROM st -- comentário") == (DESCRIPTION, ROWS)
+
+
+def test_entries_expire_after_ttl():
+    cache = make_cache(ttl=0.05)
+    store(cache, "SELECT ref FROM st")
+    assert cache.get("SELECT ref FROM st") is not None
+    time.sleep(0.1)
+    assert cache.get("SELECT ref FROM st") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_tables_removes_only_affected_entries():
+    cache = make_cache()
+    store(cache, "SELECT ref FROM st JOIN fi ON fi.ref = st.ref")
+    store(cache, "SELECT no FROM cl")
+    cache.invalidate_tables(["dbo.FI"])
+    assert cache.get("SELECT ref FROM st JOIN fi ON fi.ref = st.ref") is None
+    assert cache.get("SELECT no FROM cl") is not None
+
+
+def test_table_write_invalidates_entry():
+    versions = {"st": "2024-01-01"}
+    cache = make_cache(versions)
+    store(cache, "SELECT ref FROM st")
+    assert cache.get("SELECT ref FROM st") is not None
+    versions["st"] = "2024-01-02"
+    assert cache.get("SELECT ref FROM st") is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_lru_eviction_by_memory_budget():
+    cache = make_cache(max_bytes=250)
+    store(cache, "SELECT a FROM t1")
+    store(cache, "SELECT a FROM t2")
+    cache.get("SELECT a FROM t1")
+    store(cache, "SELECT a FROM t3")
+    assert cache.get("SELECT a FROM t2") is None
+    assert cache.get("SELECT a FROM t1") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+class FakeCursor:
+    description = DESCRIPTION
+
+    def __init__(self, executed):
+        self.executed = executed
+        self.rows = list(ROWS)
+
+    def execute(self, query):
+        self.executed.append(query)
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+
+def make_database(cache):
+    db = DatabaseManager.__new__(DatabaseManager)
+    db.result_cache = cache
+    db.executed = []
+
+    @contextmanager
+    def query_cursor(timeout):
+        yield FakeCursor(db.executed)
+
+    db._query_cursor = query_cursor
+    return db
+
+
+def test_before_execute_runs_only_on_cache_miss():
+    db = make_database(make_cache())
+    checks = []
+    assert list(db.iter_query("SELECT ref, qtt FROM st", before_execute=lambda: checks.append(1))) == \
+        [{"ref": "A1", "qtt": 2}, {"ref": "B2", "qtt": 5}]
+    assert checks == [1] and len(db.executed) == 1
+    # Segunda vez: resultado do cache, sem verificação nem execução
+    list(db.iter_query("SELECT ref, qtt FROM st", before_execute=lambda: checks.append(2)))
+    assert checks == [1] and len(db.executed) == 1
+
+
+def test_before_execute_error_stops_the_query():
+    db = make_database(make_cache())
+
+    def reject():
+        raise QueryRejectedError("custo alto")
+
+    with pytest.raises(QueryRejectedError):
+        list(db.iter_query("SELECT ref, qtt FROM st", before_execute=reject))
+    assert db.executed == []
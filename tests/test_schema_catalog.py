@@ -0,0 +1,86 @@
+# Testes para src/core/schema_catalog.py
+import threading
+
+from src.core.schema_catalog import _COLUMNS_QUERY, _FOREIGN_KEYS_QUERY, _MODIFY_DATES_QUERY, SchemaCatalog
+
+COLUMNS = [
+    ("dbo", "st", "ref", "varchar", 18, 1),
+    ("dbo", "fi", "fistamp", "char", 25, 1),
+    ("dbo", "fi", "ref", "varchar", 18, 0),
+    ("vendas", "fi", "id", "int", None, 1),
+]
+FOREIGN_KEYS = [("dbo", "fi", "ref", "dbo", "st", "ref")]
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.modify_dates = [("dbo", "st", "2024-01-01"), ("dbo", "fi", "2024-01-01"), ("vendas", "fi", "2024-01-01")]
+        self.queries = []
+
+    def fetch(self, query, params=()):
+        self.queries.append((query, params))
+        if query.startswith(_MODIFY_DATES_QUERY):
+            return list(self.modify_dates)
+        if query.startswith(_COLUMNS_QUERY):
+            wanted = {p.lower() for p in params}
+            return [row for row in COLUMNS if not wanted or f"{row[0]}.{row[1]}".lower() in wanted]
+        if query.startswith(_FOREIGN_KEYS_QUERY):
+            return list(FOREIGN_KEYS)
+        raise AssertionError(f"consulta inesperada: {query}")
+
+
+def make_catalog(tmp_path, db, schemas=None):
+    return SchemaCatalog(db.fetch, "erp", cache_path=str(tmp_path / "schema.json"),
+                         schemas=schemas if schemas is not None else [], refresh_interval=3600)
+
+
+def test_foreign_keys_resolve_qualified_and_bracketed_names(tmp_path):
+    catalog = make_catalog(tmp_path, FakeDatabase())
+    expected = [{"source_table": "fi", "source_column": "ref", "target_table": "st", "target_column": "ref"}]
+    for name in ("st", "ST", "dbo.st", "[dbo].[st]", "[st]"):
+        assert catalog.get_foreign_keys(name) == expected
+    assert catalog.get_foreign_keys("dbo.fi") == expected
+    assert catalog.get_foreign_keys("nao_existe") == []
+
+
+def test_foreign_keys_are_kept_per_schema(tmp_path):
+    catalog = make_catalog(tmp_path, FakeDatabase())
+    assert catalog.get_foreign_keys("vendas.fi") == []
+    assert [c["name"] for c in catalog.get_table_schema("vendas.fi")] == ["id"]
+
+
+def test_foreign_keys_filtered_by_schemas(tmp_path):
+    db = FakeDatabase()
+    make_catalog(tmp_path, db, schemas=["dbo"]).ensure_fresh()
+    fk_queries = [(q, p) for q, p in db.queries if q.startswith(_FOREIGN_KEYS_QUERY)]
+    assert fk_queries and all("OBJECT_SCHEMA_NAME" in q.split("WHERE")[-1] for q, _ in fk_queries)
+    assert all(p == ("dbo", "dbo") for _, p in fk_queries)
+
+
+def test_listeners_receive_changed_tables_outside_lock(tmp_path):
+    db = FakeDatabase()
+    catalog = make_catalog(tmp_path, db)
+    catalog.ensure_fresh()
+    seen = []
+
+    def listener(tables):
+        # Outra thread consegue o lock enquanto o ouvinte executa
+        free = []
+        thread = threading.Thread(target=lambda: free.append(catalog._lock.acquire(timeout=1)
+                                                             and catalog._lock.release() is None))
+        thread.start()
+        thread.join()
+        seen.append((tables, free == [True]))
+
+    catalog.add_listener(listener)
+    db.modify_dates[0] = ("dbo", "st", "2024-02-01")
+    assert catalog.refresh() == ["dbo.st"]
+    assert seen == [(["st"], True)]
+
+
+def test_reload_from_cache_file(tmp_path):
+    make_catalog(tmp_path, FakeDatabase()).ensure_fresh()
+    db = FakeDatabase()
+    catalog = make_catalog(tmp_path, db)
+    assert catalog.get_foreign_keys("dbo.st")
+    assert not any(q.startswith(_COLUMNS_QUERY) for q, _ in db.queries)
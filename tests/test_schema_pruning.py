@@ -0,0 +1,45 @@
+# Testes para src/llm/schema_pruning.py
+from src.llm.schema_pruning import ColumnPruner
+
+ST = ([{"name": "ref", "type": "varchar", "primary_key": True}]
+      + [{"name": f"campo{i}", "type": "int"} for i in range(30)]
+      + [{"name": "preco_venda", "type": "numeric"}, {"name": "familia", "type": "varchar"}])
+FI = ([{"name": "fistamp", "type": "char", "primary_key": True}]
+      + [{"name": f"outro{i}", "type": "int"} for i in range(30)]
+      + [{"name": "ref", "type": "varchar"}, {"name": "qtt", "type": "numeric"}])
+SCHEMAS = {"st": ST, "fi": FI}
+RELATIONSHIPS = [{"source_table": "fi", "source_column": "ref", "target_table": "st", "target_column": "ref"}]
+
+
+def make_pruner(**kwargs):
+    kwargs.setdefault("top_k", 8)
+    kwargs.setdefault("token_budget", 0)
+    kwargs.setdefault("min_columns", 3)
+    return ColumnPruner(annotations=kwargs.pop("annotations", {}), **kwargs)
+
+
+def names(columns):
+    return [col["name"] for col in columns]
+
+
+def test_keeps_primary_and_foreign_key_columns():
+    pruned = make_pruner().prune("preço de venda por família", SCHEMAS, RELATIONSHIPS)
+    assert "ref" in names(pruned["st"])
+    assert {"fistamp", "ref"} <= set(names(pruned["fi"]))
+
+
+def test_keeps_key_columns_under_tight_token_budget():
+    pruned = make_pruner(token_budget=10).prune("preço de venda", SCHEMAS, RELATIONSHIPS)
+    assert names(pruned["st"]) == ["ref"]
+    assert names(pruned["fi"]) == ["fistamp", "ref"]
+
+
+def test_annotations_match_aliases():
+    annotations = {"fi": {"qtt": {"aliases": ["quantidade"], "description": "Quantidade faturada"}}}
+    pruned = make_pruner(annotations=annotations).prune("quantidade faturada", SCHEMAS, RELATIONSHIPS)
+    assert "qtt" in names(pruned["fi"])
+
+
+def test_small_tables_are_kept_whole():
+    schemas = {"cl": [{"name": "no", "type": "int"}, {"name": "nome", "type": "varchar"}]}
+    assert make_pruner().prune("clientes", schemas, []) == schemas
@@ -0,0 +1,99 @@
+# Testes para src/server.py
+import json
+
+from src.server import RequestLimiter, create_app
+
+
+class FakeAssistant:
+    """Responde conforme a pergunta: "invalida", "lenta", "meio" ou linhas normais"""
+
+    def __init__(self):
+        self.closed = 0
+
+    def stream_nl_request(self, question, tables):
+        try:
+            if question == "invalida":
+                raise ValueError("Consulta SQL inválida")
+            if question == "lenta":
+                raise TimeoutError("Tempo limite da consulta excedido")
+            yield {"ref": "A"}
+            if question == "meio":
+                raise RuntimeError("conexão perdida")
+            yield {"ref": "B"}
+        finally:
+            self.closed += 1
+
+
+def make_client(max_concurrent=2):
+    assistant = FakeAssistant()
+    limiter = RequestLimiter(max_concurrent, queue_timeout=0)
+    app = create_app(assistant, limiter)
+    return app.test_client(), limiter, assistant
+
+
+def post(client, **payload):
+    response = client.post("/query", json=payload)
+    body = response.get_data(as_text=True)
+    response.close()
+    return response.status_code, body
+
+
+def test_query_returns_rows():
+    client, limiter, _ = make_client()
+    status, body = post(client, question="artigos", tables=["st"])
+    assert status == 200 and json.loads(body)["rows"] == [{"ref": "A"}, {"ref": "B"}]
+    assert limiter.stats()["in_flight"] == 0
+
+
+def test_invalid_payload_is_rejected():
+    client, limiter, _ = make_client()
+    assert post(client, tables=["st"])[0] == 400
+    assert post(client, question="artigos", tables=["st", ""])[0] == 400
+    assert post(client, question="artigos", tables={"st": 1})[0] == 400
+    assert limiter.stats()["accepted"] == 0
+
+
+def test_saturated_server_returns_429():
+    client, limiter, _ = make_client(max_concurrent=1)
+    assert limiter.acquire()
+    response = client.post("/query", json={"question": "artigos", "tables": ["st"]})
+    assert response.status_code == 429 and response.headers["Retry-After"] == "1"
+    limiter.release(0.0)
+    assert post(client, question="artigos", tables=["st"])[0] == 200
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_stream_returns_ndjson():
+    client, limiter, assistant = make_client()
+    status, body = post(client, question="artigos", tables=["st"], stream=True)
+    assert status == 200
+    assert [json.loads(line) for line in body.splitlines()] == [{"ref": "A"}, {"ref": "B"}]
+    assert limiter.stats()["in_flight"] == 0 and limiter.stats()["completed"] == 1
+    assert assistant.closed == 1
+
+
+def test_stream_error_before_first_row_has_http_status():
+    client, limiter, _ = make_client()
+    status, body = post(client, question="invalida", tables=["st"], stream=True)
+    assert status == 422 and "inválida" in json.loads(body)["error"]
+    assert post(client, question="lenta", tables=["st"], stream=True)[0] == 504
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0 and stats["failed"] == 2
+
+
+def test_stream_error_after_first_row_goes_in_the_last_line():
+    client, limiter, _ = make_client()
+    status, body = post(client, question="meio", tables=["st"], stream=True)
+    lines = [json.loads(line) for line in body.splitlines()]
+    assert status == 200 and lines == [{"ref": "A"}, {"error": "conexão perdida"}]
+    stats = limiter.stats()
+    assert stats["in_flight"] == 0 and stats["failed"] == 1
+
+
+def test_stream_closed_by_client_releases_the_slot():
+    client, limiter, assistant = make_client(max_concurrent=1)
+    response = client.post("/query", json={"question": "artigos", "tables": ["st"], "stream": True})
+    next(response.response)
+    response.close()
+    assert limiter.stats()["in_flight"] == 0 and assistant.closed == 1
+    assert post(client, question="artigos", tables=["st"])[0] == 200
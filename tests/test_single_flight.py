@@ -0,0 +1,102 @@
+# Testes para src/utils/single_flight.py
+import threading
+
+import pytest
+
+from src.utils.single_flight import SingleFlight
+
+
+def run_followers(flights, key, count, func):
+    """Inicia `count` chamadas que aguardam o líder; retorna (threads, resultados)"""
+    results = []
+
+    def follower():
+        try:
+            results.append(flights.do(key, func))
+        except Exception as e:
+            results.append(e)
+
+    threads = [threading.Thread(target=follower) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def wait_for_followers(flights, count):
+    while flights.stats()["coalesced"] < count:
+        threading.Event().wait(0.01)
+
+
+def test_followers_share_leader_result():
+    flights = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def leader_work():
+        calls.append(1)
+        release.wait(2)
+        return 42
+
+    leader = threading.Thread(target=lambda: flights.do("k", leader_work))
+    leader.start()
+    while not calls:
+        threading.Event().wait(0.01)
+    threads, results = run_followers(flights, "k", 3, leader_work)
+    wait_for_followers(flights, 3)
+    release.set()
+    for thread in threads + [leader]:
+        thread.join(2)
+    assert calls == [1]
+    assert results == [(42, True)] * 3
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_leader_error_propagates_to_followers():
+    flights = SingleFlight()
+    release = threading.Event()
+    started = threading.Event()
+    leader_result = []
+
+    def failing():
+        started.set()
+        release.wait(2)
+        raise ValueError("consulta inválida")
+
+    def leader():
+        try:
+            flights.do("k", failing)
+        except ValueError as e:
+            leader_result.append(e)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(2)
+    threads, results = run_followers(flights, "k", 2, failing)
+    wait_for_followers(flights, 2)
+    release.set()
+    for t in threads + [thread]:
+        t.join(2)
+    assert len(leader_result) == 1
+    assert len(results) == 2 and all(r is leader_result[0] for r in results)
+    assert flights.stats()["failures"] == 1
+
+
+def test_key_is_released_after_completion():
+    flights = SingleFlight()
+    assert flights.do("k", lambda: 1) == (1, False)
+    assert flights.do("k", lambda: 2) == (2, False)
+
+
+def test_cancelled_leader_hands_over_to_follower():
+    flights = SingleFlight()
+    call, leader = flights.begin("k")
+    assert leader
+    flights.finish("k", call, abandoned=True)
+    assert flights.wait(call) == (None, True)
+
+    def cancelled():
+        raise InterruptedError("cancelada")
+
+    with pytest.raises(InterruptedError):
+        flights.do("x", cancelled)
+    assert flights.stats()["abandoned"] == 2
@@ -0,0 +1,68 @@
+# Testes para src/utils/sql_lexer.py e src/utils/sql_utils.py
+from src.utils.sql_lexer import parse_statements, tokenize_sql, unquote_identifier
+from src.utils.sql_utils import (add_query_option, check_sql, extract_tables_from_query, find_sql_end,
+                                 inject_top, normalize_sql)
+
+
+def test_tokenize_skips_comments():
+    tokens = tokenize_sql("SELECT a -- FROM x\n/* ; DROP TABLE t */ FROM t", skip_trivia=True)
+    assert [t.value for t in tokens] == ["SELECT", "a", "FROM", "t"]
+
+
+def test_tokenize_strings_keep_delimiters_inside():
+    tokens = tokenize_sql("SELECT 'x;--y', N'it''s' FROM t", skip_trivia=True)
+    strings = [t.value for t in tokens if t.type == "string"]
+    assert strings == ["'x;--y'", "N'it''s'"]
+
+
+def test_tokenize_bracketed_identifiers():
+    tokens = tokenize_sql("SELECT [a]]b] FROM [dbo].[Minha Tabela]", skip_trivia=True)
+    quoted = [t.value for t in tokens if t.type == "quoted"]
+    assert quoted == ["[a]]b]", "[dbo]", "[Minha Tabela]"]
+    assert unquote_identifier("[a]]b]") == "a]b"
+
+
+def test_parse_statements_ignores_semicolon_in_string_and_comment():
+    assert len(parse_statements("SELECT ';' FROM t -- ; DROP TABLE t")) == 1
+    statements = parse_statements("SELECT 1; DROP TABLE x")
+    assert [s.kind for s in statements] == ["SELECT", "DROP"]
+
+
+def test_check_sql():
+    assert check_sql("SELECT a FROM t WHERE b = 'x;y' -- ; DELETE FROM t") is None
+    assert check_sql("SELECT 1; DROP TABLE x") is not None
+    assert check_sql("SELECT 'abc") is not None
+
+
+def test_extract_tables_ignores_comments():
+    query = ("SELECT * FROM [dbo].[st] s JOIN fi ON fi.ref = s.ref -- JOIN zz\n"
+             "WHERE x IN (SELECT 1 FROM [Outra Tab])")
+    assert extract_tables_from_query(query) == ["dbo.st", "fi", "Outra Tab"]
+
+
+def test_extract_tables_after_join_comma_list():
+    assert extract_tables_from_query("SELECT * FROM a JOIN b ON a.x=b.x, c") == ["a", "b", "c"]
+    query = ("SELECT * FROM a WITH (NOLOCK, INDEX(i)), b AS y JOIN c ON c.k IN (1, 2), d "
+             "WHERE z IN (SELECT q FROM e, f) ORDER BY a.x, b.y")
+    assert extract_tables_from_query(query) == ["a", "b", "c", "d", "e", "f"]
+    assert extract_tables_from_query("SELECT a, b FROM s1 UNION SELECT c, d FROM s2") == ["s1", "s2"]
+
+
+def test_inject_top():
+    assert inject_top("SELECT a FROM t -- TOP 5", 10) == "SELECT TOP (10) a FROM t -- TOP 5"
+    assert inject_top("SELECT TOP 5 a FROM t", 10) == "SELECT TOP 5 a FROM t"
+    assert inject_top("SELECT DISTINCT a FROM t", 10) == "SELECT DISTINCT TOP (10) a FROM t"
+
+
+def test_add_query_option():
+    assert add_query_option("SELECT a FROM t", "MAXDOP 2").endswith("OPTION (MAXDOP 2)")
+
+
+def test_find_sql_end():
+    assert find_sql_end("SELECT ';' FROM t; resto") == len("SELECT ';' FROM t;")
+    assert find_sql_end("SELECT a -- ;") is None
+    assert find_sql_end("```sql\nSELECT 1\n``` fim") == len("```sql\nSELECT 1\n```")
+
+
+def test_normalize_sql_keeps_strings():
+    assert normalize_sql("select  A from T -- c\n where x = 'A  B'") == "select A from T where x = 'A  B'"
@@ -0,0 +1,150 @@
+# Testes para src/utils/tracing.py
+import json
+import threading
+
+import pytest
+
+from src.utils.tracing import Exporter, JsonlExporter, Tracer, percentile
+
+
+class ListExporter(Exporter):
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace):
+        self.traces.append(trace)
+
+
+def make_tracer():
+    exporter = ListExporter()
+    return Tracer(exporters=[exporter]), exporter
+
+
+def parents(trace):
+    ids = {span["span_id"]: span["name"] for span in trace["spans"]}
+    return {span["name"]: ids.get(span["parent_id"], trace["name"]) for span in trace["spans"]}
+
+
+def test_nested_spans_are_exported_with_the_root():
+    tracer, exporter = make_tracer()
+    with tracer.span("request", question="q"):
+        with tracer.span("generation") as span:
+            span.set(tokens=10)
+        with tracer.span("execution"):
+            pass
+    assert tracer.current() is None
+    [trace] = exporter.traces
+    assert trace["name"] == "request" and trace["attributes"] == {"question": "q"}
+    assert parents(trace) == {"generation": "request", "execution": "request"}
+    assert set(tracer.stats()) == {"request", "generation", "execution"}
+
+
+def test_span_records_error():
+    tracer, exporter = make_tracer()
+    with pytest.raises(ValueError):
+        with tracer.span("request"):
+            raise ValueError("x")
+    assert exporter.traces[0]["attributes"]["error"] == "ValueError"
+
+
+def test_disabled_tracer_exports_nothing():
+    exporter = ListExporter()
+    tracer = Tracer(enabled=False, exporters=[exporter])
+    with tracer.span("request") as span:
+        span.set(rows=1)
+    assert list(tracer.iterate(span, [1, 2])) == [1, 2]
+    assert exporter.traces == [] and tracer.stats() == {}
+
+
+def test_exporter_requires_export():
+    with pytest.raises(TypeError):
+        Exporter()
+
+
+def test_failing_exporter_does_not_break_request():
+    class Broken(Exporter):
+        def export(self, trace):
+            raise OSError("disco cheio")
+
+    exporter = ListExporter()
+    tracer = Tracer(exporters=[Broken(), exporter])
+    with tracer.span("request"):
+        pass
+    assert len(exporter.traces) == 1
+
+
+def test_jsonl_exporter_appends_one_line_per_trace(tmp_path):
+    path = tmp_path / "traces" / "trace.jsonl"
+    exporter = JsonlExporter(str(path))
+    tracer = Tracer(exporters=[exporter])
+    for _ in range(2):
+        with tracer.span("request"):
+            with tracer.span("execution"):
+                pass
+    tracer.close()
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    assert [span["name"] for span in json.loads(lines[0])["spans"]] == ["execution"]
+
+
+def rows(tracer):
+    with tracer.detached_span("request") as span:
+        for row in tracer.iterate(span, inner(tracer)):
+            yield row
+
+
+def inner(tracer):
+    for i in range(3):
+        with tracer.span("fetch"):
+            pass
+        yield i
+
+
+def test_generator_span_does_not_leak_to_consumer():
+    tracer, exporter = make_tracer()
+    seen = []
+    for _ in rows(tracer):
+        seen.append(tracer.current())
+        # Span do consumidor entre os itens: rastro próprio, não filho de "request"
+        with tracer.span("consumer"):
+            pass
+    assert seen == [None, None, None]
+    names = sorted(trace["name"] for trace in exporter.traces)
+    assert names == ["consumer"] * 3 + ["request"]
+    request = next(trace for trace in exporter.traces if trace["name"] == "request")
+    assert [span["name"] for span in request["spans"]] == ["fetch"] * 3
+    assert set(parents(request).values()) == {"request"}
+
+
+def test_generator_resumed_in_another_thread():
+    tracer, exporter = make_tracer()
+    stream = rows(tracer)
+    assert next(stream) == 0
+    leaked = []
+
+    def consume():
+        list(stream)
+        leaked.append(tracer.current())
+
+    thread = threading.Thread(target=consume)
+    thread.start()
+    thread.join()
+    assert leaked == [None] and tracer.current() is None
+    request = next(trace for trace in exporter.traces if trace["name"] == "request")
+    assert len(request["spans"]) == 3 and set(parents(request).values()) == {"request"}
+
+
+def test_closed_generator_marks_span_stopped():
+    tracer, exporter = make_tracer()
+    stream = rows(tracer)
+    next(stream)
+    stream.close()
+    [trace] = exporter.traces
+    assert trace["attributes"] == {"stopped": True}
+    assert tracer.current() is None
+
+
+def test_percentile():
+    assert percentile([], 0.5) == 0.0
+    assert percentile([3, 1, 2], 0.5) == 2
+    assert percentile(list(range(101)), 0.99) == 99